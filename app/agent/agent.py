@@ -1,64 +1,287 @@
 # Import required packages
 import os
-import streamlit as st
-
-# Importar pacotes do langchain
-from langchain.prompts import PromptTemplate
-from langchain.chains.retrieval import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains.history_aware_retriever import create_history_aware_retriever
-from langchain_pinecone import PineconeVectorStore
-from langchain_voyageai import VoyageAIEmbeddings
+import logging
+import threading
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
-load_dotenv()
 
-# Importar AI da Groq (Fonte de LLM)
-from langchain_groq import ChatGroq
+from app.rag.tracing import get_tracer
 
-# Import prompts
-from .prompts import retrieval_marketing_agent_initial_prompt, retrieval_marketing_agent_rephrase_prompt
+# LangChain, the provider SDKs and the chain modules are imported on first use (get_pipeline),
+# so importing this module (e.g. from main.py) does not delay the first render
+if TYPE_CHECKING:
+    from .answer_cache import AnswerCache
+    from .conversation import SourceCache
+    from .pipeline import RagPipeline
+    from app.rag.partitions import PartitionRegistry, PartitionRouter
 
-# Import guard rails
-from .guard.retrieval_based_guardrail import RetrievalBasedGuardrail
+logger = logging.getLogger(__name__)
 
-# Definir função para rodar llm RAG
-def run_llm(query, chat_history=[], set_stream_lit_secrets=False):
+# Pipeline compartilhado pelo processo (construído na primeira chamada)
+_pipeline = None
+_pipeline_lock = threading.Lock()
+_answer_cache = None
+_source_cache = None
+_registry = None
+_router = None
+_warmup_thread = None
+
+def get_pipeline() -> "RagPipeline":
+    """Return the process-wide RagPipeline, building it on first use"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                load_dotenv()
+
+                # Import the long-lived RAG pipeline, its guard rails and indexes
+                from .pipeline import RagPipeline
+                from .guard.retrieval_based_guardrail import RetrievalBasedGuardrail
+                from .guard.theme_based_guardrail import ThemeBasedGuardrail
+                from app.rag.embedding_cache import voyage_embeddings
+                from app.rag.index_generation import IndexGeneration
+                from app.rag.lexical_index import DEFAULT_LEXICAL_INDEX_PATH, LexicalIndex, ReloadingLexicalIndex
+
+                embedding = voyage_embeddings(model="voyage-3")
+
+                # Chunks per request; MMR re-ranks RETRIEVAL_FETCH_K candidates ("none" keeps the plain top-k)
+                k = int(os.getenv("RETRIEVAL_K", "4"))
+                mmr_lambda = os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5")
+
+                # Relevance guardrail, enabled by setting its minimum similarity score
+                threshold = os.getenv("RETRIEVAL_GUARDRAIL_THRESHOLD")
+                guardrail = RetrievalBasedGuardrail(similarity_threshold=float(threshold), k=k) if threshold else None
+
+                # Topic guardrail, enabled with THEME_GUARDRAIL=true (requires a calibrated THEME_GUARDRAIL_BAND)
+                theme_guardrail = None
+                if os.getenv("THEME_GUARDRAIL", "").lower() == "true":
+                    theme_guardrail = ThemeBasedGuardrail(embedding=embedding)
+
+                # Hybrid BM25 + vector retrieval when the indexer built a lexical index
+                # (reloaded whenever a new indexing run bumps the index generation)
+                lexical_path = os.getenv("LEXICAL_INDEX_PATH", DEFAULT_LEXICAL_INDEX_PATH)
+                lexical_index = None
+                if LexicalIndex.exists(lexical_path):
+                    lexical_index = ReloadingLexicalIndex(lexical_path, IndexGeneration.for_index(os.getenv("INDEX_NAME")))
+
+                _pipeline = RagPipeline(
+                    embedding=embedding,
+                    guardrail=guardrail,
+                    theme_guardrail=theme_guardrail,
+                    lexical_index=lexical_index,
+                    k=k,
+                    fetch_k=int(os.getenv("RETRIEVAL_FETCH_K", "20")),
+                    mmr_lambda=None if mmr_lambda.lower() == "none" else float(mmr_lambda),
+                )
+    return _pipeline
+
+def start_warmup() -> threading.Thread:
+    """
+    Build the pipeline in a background thread (once per process)
+
+    Lets the page render while the SDKs are imported and the clients are created;
+    the first request then finds the pipeline ready (or waits for the warm-up to finish).
+    """
+    global _warmup_thread
+    with _pipeline_lock:
+        if _warmup_thread is None:
+            def warm_up():
+                try:
+                    get_answer_cache(get_pipeline())
+                except Exception:
+                    # The first request builds the pipeline again and surfaces the error
+                    logger.warning("Pipeline warm-up failed", exc_info=True)
+
+            _warmup_thread = threading.Thread(target=warm_up, name="pipeline-warmup", daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+def get_answer_cache(pipeline: "RagPipeline") -> "AnswerCache":
+    """
+    Return the process-wide AnswerCache, building it on first use
+
+    Configured by ANSWER_CACHE_SIZE (0 disables the cache), ANSWER_CACHE_TTL (seconds)
+    and ANSWER_CACHE_THRESHOLD (cosine similarity of a semantic hit; unset or "none": exact matches only).
+    """
+    global _answer_cache
+    if _answer_cache is None:
+        with _pipeline_lock:
+            if _answer_cache is None:
+                from .answer_cache import AnswerCache
+                from app.rag.index_generation import IndexGeneration
+
+                threshold = os.getenv("ANSWER_CACHE_THRESHOLD", "none")
+                _answer_cache = AnswerCache(
+                    embedding=pipeline.embedding,
+                    similarity_threshold=None if threshold.lower() == "none" else float(threshold),
+                    ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+                    max_size=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+                    generation=IndexGeneration.for_index(pipeline.index_name),
+                    history_max_tokens=pipeline.history_max_tokens,
+                    history_max_messages=pipeline.history_max_messages,
+                )
+    return _answer_cache if _answer_cache.max_size > 0 else None
+
+def get_source_cache(pipeline: "RagPipeline") -> "SourceCache":
+    """Return the process-wide SourceCache (texts of the sources shown by every session)"""
+    global _source_cache
+    if _source_cache is None:
+        with _pipeline_lock:
+            if _source_cache is None:
+                from .conversation import SourceCache
+
+                _source_cache = SourceCache(fetch=pipeline.get_chunks, max_size=int(os.getenv("SOURCE_CACHE_SIZE", "2048")))
+    return _source_cache
+
+def get_registry() -> "PartitionRegistry":
+    """Return the partition registry written by the indexer (PARTITIONS_PATH, defaults to data/partitions.json)"""
+    global _registry
+    if _registry is None:
+        with _pipeline_lock:
+            if _registry is None:
+                from app.rag.partitions import DEFAULT_PARTITIONS_PATH, PartitionRegistry
+
+                _registry = PartitionRegistry(os.getenv("PARTITIONS_PATH", DEFAULT_PARTITIONS_PATH))
+    return _registry
+
+def get_router() -> "PartitionRouter":
+    """Return the process-wide PartitionRouter, or None when the index has no partitions"""
+    global _router
+    if _router is None:
+        registry = get_registry()
+        with _pipeline_lock:
+            if _router is None:
+                from app.rag.partitions import PartitionRouter
+
+                _router = PartitionRouter.from_registry(registry)
+    return _router if _router.partitions else None
+
+def route(query, category=None, partitions=None):
+    """
+    Partitions a request is scoped to: the explicit selection, else the keyword match of
+    the router (not for requests already restricted to a category); None searches everything
+
+    The keyword match is off unless PARTITION_ROUTING=true (explicit selections always apply):
+    it only makes sense once every vector carries its partition metadata.
+    """
+    if partitions:
+        return sorted(partitions)
+    if category or os.getenv("PARTITION_ROUTING", "false").lower() != "true":
+        return None
+    router = get_router()
+    return router.route(query) if router else None
+
+def set_streamlit_secrets():
+    """Set environment variables from Streamlit secrets"""
+    import streamlit as st
+
+    os.environ["INDEX_NAME"] = st.secrets["INDEX_NAME"]
+    os.environ["VOYAGE_API_KEY"] = st.secrets["VOYAGE_API_KEY"]
+    os.environ["GROQ_API_KEY"] = st.secrets["GROQ_API_KEY"]
+    os.environ["PINECONE_API_KEY"] = st.secrets["PINECONE_API_KEY"]
+
+def _prepare(pipeline, set_stream_lit_secrets: bool) -> "RagPipeline":
+    """Load the Streamlit secrets when asked and return the pipeline (the shared one unless given)"""
     if set_stream_lit_secrets:
-        # Set environment variables from Streamlit secrets
-        os.environ["INDEX_NAME"] = st.secrets["INDEX_NAME"]
-        os.environ["VOYAGE_API_KEY"] = st.secrets["VOYAGE_API_KEY"]
-        os.environ["GROQ_API_KEY"] = st.secrets["GROQ_API_KEY"]
-        os.environ["PINECONE_API_KEY"] = st.secrets["PINECONE_API_KEY"]
-    
-    # Initialize the retriever
-    embedding = VoyageAIEmbeddings(model="voyage-3")
-    docsearch = PineconeVectorStore(index_name=os.environ["INDEX_NAME"], embedding=embedding)
-
-    # Set the LLM model
-    chat = ChatGroq(model="llama-3.3-70b-versatile", temperature=0)
-
-    # Combine prompt with chat
-    stuff_documents_chain = create_stuff_documents_chain(chat, PromptTemplate.from_template(retrieval_marketing_agent_initial_prompt))
-
-    # Use history-aware retriever
-    history_aware_retriever = create_history_aware_retriever(
-        llm=chat, retriever=docsearch.as_retriever(), prompt=PromptTemplate.from_template(retrieval_marketing_agent_rephrase_prompt)
-    )
-
-    # Create the RAG pipeline
-    qa = create_retrieval_chain(
-        history_aware_retriever, combine_docs_chain=stuff_documents_chain,
-    )
-
-    # Invoke the chain with user's query and chat history
-    result = qa.invoke(input={"input": query, "chat_history": chat_history})
-
-    # Return structured response
-    return {
-        "query": result["input"],
-        "result": result["answer"],
-        "source_documents": result["context"]
-    }
+        set_streamlit_secrets()
+    # Reuse the shared pipeline instead of rebuilding clients and chains per call
+    return pipeline or get_pipeline()
+
+def _route(pipeline: "RagPipeline", query, category, partitions, use_cache):
+    """Partitions of the request (annotated on the trace) and the answer cache to use (None: off)"""
+    # Only the partitions of the request are searched (and their answers cached apart)
+    partitions = route(query, category, partitions)
+    get_tracer().annotate(partitions=partitions)
+    return partitions, get_answer_cache(pipeline) if use_cache else None
+
+def _lookup(answer_cache, query, chat_history, category, partitions):
+    """Cached response of the request (None on a miss or without a cache)"""
+    if not answer_cache:
+        return None
+    with get_tracer().span("answer_cache") as span:
+        cached = answer_cache.get(query, chat_history, category, partitions)
+        span.set(cache_hit=cached is not None)
+    return cached
+
+async def _alookup(answer_cache, query, chat_history, category, partitions):
+    """Asynchronous _lookup"""
+    if not answer_cache:
+        return None
+    with get_tracer().span("answer_cache") as span:
+        cached = await answer_cache.aget(query, chat_history, category, partitions)
+        span.set(cache_hit=cached is not None)
+    return cached
+
+def _cacheable(answer_cache, response) -> bool:
+    # Guardrail rejections are not cached: a later index or guardrail change may accept the request
+    return bool(answer_cache) and not response["rejected"]
+
+# Definir função para rodar llm RAG
+def run_llm(query, chat_history=[], set_stream_lit_secrets=False, pipeline=None, category=None, use_cache=True, partitions=None):
+    pipeline = _prepare(pipeline, set_stream_lit_secrets)
+
+    with get_tracer().trace("run_llm", category=category, history_messages=len(chat_history or [])):
+        partitions, answer_cache = _route(pipeline, query, category, partitions, use_cache)
+
+        # Repeated requests are answered from the cache
+        cached = _lookup(answer_cache, query, chat_history, category, partitions)
+        if cached:
+            return cached
+
+        # Invoke the chain with user's query and chat history
+        response = pipeline.invoke(query, chat_history, category=category, partitions=partitions)
+        if _cacheable(answer_cache, response):
+            answer_cache.put(query, response, chat_history, category, partitions)
+        return response
+
+# Definir função assíncrona para rodar llm RAG
+async def arun_llm(query, chat_history=[], set_stream_lit_secrets=False, pipeline=None, category=None, use_cache=True, partitions=None):
+    """
+    Asynchronous run_llm: the guardrail checks overlap with rephrase, query embedding and
+    retrieval, and many sessions can share one event loop instead of a thread each
+    """
+    pipeline = _prepare(pipeline, set_stream_lit_secrets)
+
+    with get_tracer().trace("arun_llm", category=category, history_messages=len(chat_history or [])):
+        partitions, answer_cache = _route(pipeline, query, category, partitions, use_cache)
+
+        cached = await _alookup(answer_cache, query, chat_history, category, partitions)
+        if cached:
+            return cached
+
+        response = await pipeline.ainvoke(query, chat_history, category=category, partitions=partitions)
+        if _cacheable(answer_cache, response):
+            await answer_cache.aput(query, response, chat_history, category, partitions)
+        return response
+
+# Definir função para rodar llm RAG em streaming
+def stream_llm(query, chat_history=[], set_stream_lit_secrets=False, pipeline=None, category=None, use_cache=True, partitions=None):
+    """Yield {"source_documents": [...], "rejected": bool} once retrieval finishes, then {"token": str} per answer chunk"""
+    pipeline = _prepare(pipeline, set_stream_lit_secrets)
+
+    with get_tracer().trace("stream_llm", category=category, history_messages=len(chat_history or [])):
+        partitions, answer_cache = _route(pipeline, query, category, partitions, use_cache)
+
+        # A cached answer is sent as a single chunk
+        cached = _lookup(answer_cache, query, chat_history, category, partitions)
+        if cached:
+            yield {"source_documents": cached["source_documents"], "rejected": False}
+            yield {"token": cached["result"]}
+            return
+
+        response = {"result": "", "source_documents": [], "rejected": False}
+        tokens = []
+        for event in pipeline.stream(query, chat_history, category=category, partitions=partitions):
+            response["source_documents"].extend(event.get("source_documents", []))
+            response["rejected"] = response["rejected"] or event.get("rejected", False)
+            if "token" in event:
+                tokens.append(event["token"])
+            yield event
+
+        # Only fully streamed answers are cached
+        response["result"] = "".join(tokens)
+        if _cacheable(answer_cache, response):
+            answer_cache.put(query, response, chat_history, category, partitions)
 
 # Executar como script
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.rag.index_generation import IndexGeneration
+from app.rag.text_utils import normalize_query
+
+from .history import history_digest, trim_history
+
+_NUMBERS = re.compile(r"\d+")
+
+
+class _Entry:
+    __slots__ = ("scope", "numbers", "vector", "response", "created")
+
+    def __init__(self, scope: str, numbers: Tuple[str, ...], vector: Optional[np.ndarray], response: dict, created: float):
+        self.scope = scope
+        self.numbers = numbers
+        self.vector = vector
+        self.response = response
+        self.created = created
+
+
+class AnswerCache:
+    """
+    Cache of full RAG responses (answer and source documents) in front of run_llm.
+
+    A request is looked up by its normalized text and, when a similarity_threshold is
+    set (off by default), by embedding similarity against the cached requests of the
+    same scope and with the same numbers. Requests differing only in a date, time or
+    course name are near-identical embeddings, so the semantic lookup never matches
+    across numbers and should only be enabled with a threshold tuned on real traffic. The scope is the chat history window
+    sent to the rephrase step plus the category and partitions, so a follow-up is never answered with
+    the response to a different conversation. Entries expire after a TTL, the least
+    recently used are evicted past max_size, and everything is dropped when the index
+    generation changes (VectorStoreHandler bumps it on every write).
+    """
+
+    def __init__(
+        self,
+        embedding=None,
+        similarity_threshold: Optional[float] = None,
+        ttl: float = 3600,
+        max_size: int = 512,
+        generation: IndexGeneration = None,
+        history_max_tokens: int = 1500,
+        history_max_messages: int = 6,
+    ):
+        """
+        Args:
+            embedding: Embeddings instance for the similarity lookup (None disables it).
+            similarity_threshold (float): Minimum cosine similarity of a semantic hit (None: exact matches only).
+            ttl (float): Seconds an answer stays valid.
+            max_size (int): Maximum number of cached answers.
+            generation (IndexGeneration): Stamp of the index the answers were built on.
+            history_max_tokens (int): Token budget of the history window part of the scope.
+            history_max_messages (int): Message budget of the history window part of the scope.
+        """
+        self.embedding = embedding if similarity_threshold is not None else None
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_size = max_size
+        self.generation = generation
+        self.history_max_tokens = history_max_tokens
+        self.history_max_messages = history_max_messages
+
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation_stamp = generation.current() if generation else ""
+        self._counters = {
+            "exact_hits": 0, "semantic_hits": 0, "misses": 0,
+            "expired": 0, "evicted": 0, "invalidations": 0,
+        }
+
+    def _scope(self, chat_history: Optional[list], category: Optional[str], partitions: Optional[List[str]] = None) -> str:
+        history = trim_history(chat_history, self.history_max_tokens, self.history_max_messages)
+        return f"{history_digest(history)}\0{category or ''}\0{','.join(sorted(partitions or ()))}"
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_generation(self):
+        """Drop every entry when the index was written since the last lookup (lock held)"""
+        if self.generation is None:
+            return
+        stamp = self.generation.current()
+        if stamp != self._generation_stamp:
+            if self._entries:
+                self._counters["invalidations"] += 1
+            self._entries.clear()
+            self._generation_stamp = stamp
+
+    def _expire(self, now: float):
+        """Remove entries older than the TTL (lock held)"""
+        for key in [key for key, entry in self._entries.items() if now - entry.created > self.ttl]:
+            del self._entries[key]
+            self._counters["expired"] += 1
+
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        if self.embedding is None:
+            return None
+        return self._normalize(self.embedding.embed_query(query))
+
+    async def _aembed(self, query: str) -> Optional[np.ndarray]:
+        if self.embedding is None:
+            return None
+        return self._normalize(await self.embedding.aembed_query(query))
+
+    def _lookup_exact(self, key: Tuple[str, str], query: str) -> Tuple[Optional[dict], list]:
+        """Exact hit, or the same-scope candidates of the similarity lookup"""
+        with self._lock:
+            self._check_generation()
+            self._expire(time.monotonic())
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters["exact_hits"] += 1
+                return {**entry.response, "query": query}, []
+
+            numbers = tuple(_NUMBERS.findall(query))
+            candidates = [
+                (candidate_key, entry) for candidate_key, entry in self._entries.items()
+                if entry.scope == key[0] and entry.numbers == numbers and entry.vector is not None
+            ]
+            if not candidates or self.embedding is None:
+                self._counters["misses"] += 1
+                return None, []
+            return None, candidates
+
+    def _lookup_similar(self, candidates: list, vector: np.ndarray, query: str) -> Optional[dict]:
+        with self._lock:
+            candidates = [(key, entry) for key, entry in candidates if self._entries.get(key) is entry]
+            if candidates:
+                similarities = np.stack([entry.vector for _, entry in candidates]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    best_key, entry = candidates[best]
+                    self._entries.move_to_end(best_key)
+                    self._counters["semantic_hits"] += 1
+                    return {**entry.response, "query": query}
+            self._counters["misses"] += 1
+            return None
+
+    def get(self, query: str, chat_history: list = None, category: str = None, partitions: List[str] = None) -> Optional[dict]:
+        """Cached response for the request, or None"""
+        key = (self._scope(chat_history, category, partitions), normalize_query(query))
+        hit, candidates = self._lookup_exact(key, query)
+        if hit or not candidates:
+            return hit
+        # Embed outside the lock (the provider call is the slow part)
+        return self._lookup_similar(candidates, self._embed(query), query)
+
+    async def aget(self, query: str, chat_history: list = None, category: str = None, partitions: List[str] = None) -> Optional[dict]:
+        """Asynchronous get"""
+        key = (self._scope(chat_history, category, partitions), normalize_query(query))
+        hit, candidates = self._lookup_exact(key, query)
+        if hit or not candidates:
+            return hit
+        return self._lookup_similar(candidates, await self._aembed(query), query)
+
+    def _insert(self, key: Tuple[str, str], query: str, vector: Optional[np.ndarray], response: dict):
+        entry = _Entry(key[0], tuple(_NUMBERS.findall(query)), vector, {
+            "result": response["result"],
+            "source_documents": list(response.get("source_documents", [])),
+            "rejected": False,
+        }, time.monotonic())
+
+        with self._lock:
+            self._check_generation()
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def put(self, query: str, response: dict, chat_history: list = None, category: str = None, partitions: List[str] = None):
+        """Cache the response ("result" and "source_documents") of a request (never a guardrail rejection)"""
+        key = (self._scope(chat_history, category, partitions), normalize_query(query))
+        self._insert(key, query, self._embed(query), response)
+
+    async def aput(self, query: str, response: dict, chat_history: list = None, category: str = None, partitions: List[str] = None):
+        """Asynchronous put"""
+        key = (self._scope(chat_history, category, partitions), normalize_query(query))
+        self._insert(key, query, await self._aembed(query), response)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and hit rates (to tune similarity_threshold and ttl)"""
+        with self._lock:
+            counters = dict(self._counters)
+            counters["size"] = len(self._entries)
+        lookups = counters["exact_hits"] + counters["semantic_hits"] + counters["misses"]
+        counters["hit_rate"] = (counters["exact_hits"] + counters["semantic_hits"]) / lookups if lookups else 0.0
+        counters["semantic_hit_rate"] = counters["semantic_hits"] / lookups if lookups else 0.0
+        return counters
@@ -0,0 +1,290 @@
+"""
+Bulk content generation: run a CSV/JSONL file of requests through the RAG pipeline.
+
+Every row is one request (e.g. a countdown message per course launch of a spreadsheet):
+    query            the request (or rendered from the row columns with --template)
+    id               optional, stable row key for the checkpoint (defaults to the row number)
+    retrieval_query  optional, what to search for (defaults to the query; rows sharing it,
+                     with the same category and partitions, share a single retrieval)
+    category         optional category (e.g. "Lançamentos > Python") to search in
+    partitions       optional index partitions, a list or a ";"-separated string
+
+Rows run concurrently within the Groq and Voyage request/token budgets (token buckets)
+and each result is appended to a JSONL checkpoint as soon as it is ready: rerunning the
+same command skips the rows already answered. benchmarks/bench_batch.py runs the same
+runner offline against in-process fake providers.
+
+Usage (from the repository root):
+    python -m app.agent.batch lancamentos.csv --template "Gere uma mensagem de contagem regressiva para o curso {curso} que começa em {data}"
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from dotenv import load_dotenv
+
+from app.rag.text_utils import estimate_tokens
+from .prompts import retrieval_marketing_agent_initial_prompt
+from .scheduler import (
+    GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE, VOYAGE_REQUESTS_PER_MINUTE, VOYAGE_TOKENS_PER_MINUTE,
+    ProviderLimiter,
+)
+
+if TYPE_CHECKING:
+    from .pipeline import RagPipeline
+
+PROMPT_TOKENS = estimate_tokens(retrieval_marketing_agent_initial_prompt)
+
+
+def read_requests(path: str, template: str = None, retrieval_template: str = None) -> List[Dict[str, Any]]:
+    """
+    Requests of a .csv (header row) or .jsonl file
+
+    Args:
+        path (str): Input file.
+        template (str): Optional str.format template of the query over the row columns.
+        retrieval_template (str): Optional template of the retrieval query.
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    requests = []
+    for number, row in enumerate(rows, start=1):
+        query = template.format(**row) if template else row.get("query")
+        if not query:
+            raise ValueError(f"Row {number} of {path} has no query (add a query column or use --template)")
+        partitions = row.get("partitions") or None
+        if isinstance(partitions, str):
+            partitions = [partition.strip() for partition in partitions.split(";") if partition.strip()]
+        requests.append({
+            "id": str(row.get("id") or number),
+            "query": query.strip(),
+            "retrieval_query": (retrieval_template.format(**row) if retrieval_template else row.get("retrieval_query") or query).strip(),
+            "category": row.get("category") or None,
+            "partitions": partitions or None,
+        })
+    return requests
+
+
+def read_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """Answered rows of a checkpoint by id (failed rows and a line cut by an interruption are run again)"""
+    done = {}
+    if not Path(path).exists():
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "result" in record:
+                done[record["id"]] = record
+    return done
+
+
+class BatchRunner:
+    """
+    Concurrent batch of requests over one RagPipeline.
+
+    Each request takes its provider budget before calling out: the retrieval one Voyage
+    request (query embedding) and, for the topic check's LLM fallback, one Groq request;
+    the generation one Groq request with the estimated prompt
+    (template + request + assembled context) and max_output_tokens, corrected once the
+    answer is known. Requests sharing a retrieval key await the same retrieval.
+    """
+
+    def __init__(
+        self,
+        pipeline: "RagPipeline",
+        llm_limiter: ProviderLimiter,
+        embedding_limiter: ProviderLimiter,
+        concurrency: int = 8,
+        max_output_tokens: int = 600,
+        max_retries: int = 5,
+        route: Callable = None,
+    ):
+        """
+        Args:
+            pipeline (RagPipeline): Pipeline answering the requests.
+            llm_limiter (ProviderLimiter): Groq budget.
+            embedding_limiter (ProviderLimiter): Voyage budget.
+            concurrency (int): Requests in flight.
+            max_output_tokens (int): Token estimate of an answer, reserved before each generation.
+            max_retries (int): Retries of a call on rate limit errors.
+            route (callable): (query, category, partitions) -> partitions (defaults to agent.route).
+        """
+        self.pipeline = pipeline
+        self.llm_limiter = llm_limiter
+        self.embedding_limiter = embedding_limiter
+        self.concurrency = concurrency
+        self.max_output_tokens = max_output_tokens
+        self.max_retries = max_retries
+        if route is None:
+            from .agent import route
+        self.route = route
+        # The topic check's LLM fallback spends the same Groq budget as the answers
+        if pipeline.theme_guardrail is not None:
+            pipeline.theme_guardrail.llm_limiter = llm_limiter
+        self._retrievals: Dict[tuple, asyncio.Task] = {}
+
+    async def _retrieve(self, query: str, category: Optional[str], partitions: Optional[List[str]]) -> dict:
+        # The theme guardrail embeds the request too
+        requests = 1 + (self.pipeline.theme_guardrail is not None)
+        return await self.embedding_limiter.call(
+            lambda: self.pipeline.aretrieve(query, category=category, partitions=partitions),
+            tokens=estimate_tokens(query) * requests, requests=requests, max_retries=self.max_retries
+        )
+
+    def _shared_retrieval(self, request: Dict[str, Any], partitions: Optional[List[str]]) -> asyncio.Task:
+        """Retrieval of the request, started by the first request with the same key"""
+        key = (request["retrieval_query"].lower(), request["category"], tuple(partitions or ()))
+        if key not in self._retrievals:
+            self._retrievals[key] = asyncio.ensure_future(self._retrieve(request["retrieval_query"], request["category"], partitions))
+        return self._retrievals[key]
+
+    async def _generate(self, request: Dict[str, Any], partitions: Optional[List[str]], retrieval: dict) -> dict:
+        answer = lambda: self.pipeline.ainvoke(
+            request["query"], category=request["category"], partitions=partitions, retrieval=retrieval
+        )
+        if not retrieval["relevant"]:
+            # Rejected requests get the guardrail message without an LLM call
+            return await answer()
+
+        prompt_tokens = PROMPT_TOKENS + estimate_tokens(request["query"]) + sum(
+            estimate_tokens(document.page_content) for document in retrieval["documents"]
+        )
+        response = await self.llm_limiter.call(
+            answer, tokens=prompt_tokens + self.max_output_tokens, max_retries=self.max_retries
+        )
+        self.llm_limiter.adjust(estimate_tokens(response["result"]) - self.max_output_tokens)
+        return response
+
+    async def _run_one(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        record = {"id": request["id"], "query": request["query"]}
+        try:
+            partitions = self.route(request["retrieval_query"], request["category"], request["partitions"])
+            response = await self._generate(request, partitions, await self._shared_retrieval(request, partitions))
+            record.update({
+                "result": response["result"],
+                "relevant": not response["rejected"],
+                "sources": sorted({doc.metadata.get("file_path", "") for doc in response["source_documents"]}),
+                "partitions": partitions,
+            })
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        return record
+
+    async def run(self, requests: Iterable[Dict[str, Any]], checkpoint: str, progress: Callable[[dict], None] = None) -> Dict[str, Any]:
+        """
+        Answer the requests not answered in the checkpoint yet, appending each record as it completes
+
+        Returns:
+            dict: Stats with "requests", "skipped", "answered", "failed", "retrievals", "seconds",
+                  "requests_per_min" and the "groq" / "voyage" budget usage.
+        """
+        requests = list(requests)
+        done = read_checkpoint(checkpoint)
+        pending = [request for request in requests if request["id"] not in done]
+        Path(checkpoint).parent.mkdir(parents=True, exist_ok=True)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        answered = failed = 0
+
+        async def bounded(request):
+            async with semaphore:
+                return await self._run_one(request)
+
+        start = time.perf_counter()
+        with open(checkpoint, "a+b") as f:
+            # Terminate a line cut by an interruption so the next record starts on its own line
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            for future in asyncio.as_completed([bounded(request) for request in pending]):
+                record = await future
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                f.flush()
+                if "error" in record:
+                    failed += 1
+                else:
+                    answered += 1
+                if progress:
+                    progress(record)
+
+        seconds = time.perf_counter() - start
+        return {
+            "requests": len(requests),
+            "skipped": len(requests) - len(pending),
+            "answered": answered,
+            "failed": failed,
+            "retrievals": len(self._retrievals),
+            "seconds": seconds,
+            "requests_per_min": answered / seconds * 60 if seconds > 0 else 0.0,
+            "groq": self.llm_limiter.stats(),
+            "voyage": self.embedding_limiter.stats(),
+        }
+
+
+def limiter(name: str, requests_per_minute: float, tokens_per_minute: float) -> ProviderLimiter:
+    """ProviderLimiter from CLI values (0 disables a bucket)"""
+    return ProviderLimiter(name, requests_per_minute or None, tokens_per_minute or None)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Requests file (.csv or .jsonl)")
+    parser.add_argument("--output", help="JSONL checkpoint / results file (defaults to <input>.results.jsonl)")
+    parser.add_argument("--template", help="Query template over the row columns, e.g. \"... {curso} ... {data}\"")
+    parser.add_argument("--retrieval-template", help="Retrieval query template (rows rendering the same one share a retrieval)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--max-output-tokens", type=int, default=600, help="Tokens reserved per answer before the call")
+    parser.add_argument("--groq-rpm", type=float, default=float(os.getenv("GROQ_RPM", GROQ_REQUESTS_PER_MINUTE)))
+    parser.add_argument("--groq-tpm", type=float, default=float(os.getenv("GROQ_TPM", GROQ_TOKENS_PER_MINUTE)))
+    parser.add_argument("--voyage-rpm", type=float, default=float(os.getenv("VOYAGE_RPM", VOYAGE_REQUESTS_PER_MINUTE)))
+    parser.add_argument("--voyage-tpm", type=float, default=float(os.getenv("VOYAGE_TPM", VOYAGE_TOKENS_PER_MINUTE)))
+    args = parser.parse_args()
+
+    from tqdm import tqdm
+
+    requests = read_requests(args.input, args.template, args.retrieval_template)
+    output = args.output or str(Path(args.input).with_suffix(".results.jsonl"))
+    from .agent import get_pipeline, route
+    pipeline = get_pipeline()
+
+    runner = BatchRunner(
+        pipeline,
+        llm_limiter=limiter("groq", args.groq_rpm, args.groq_tpm),
+        embedding_limiter=limiter("voyage", args.voyage_rpm, args.voyage_tpm),
+        concurrency=args.concurrency,
+        max_output_tokens=args.max_output_tokens,
+        route=route,
+    )
+    with tqdm(total=len(requests) - len(read_checkpoint(output)), desc="Generating", unit="request") as progress_bar:
+        try:
+            stats = asyncio.run(runner.run(requests, output, progress=lambda record: progress_bar.update()))
+        except KeyboardInterrupt:
+            progress_bar.close()
+            print(f"Interrupted: answered requests are in {output}; rerun the same command to resume")
+            raise SystemExit(130)
+
+    print(f"{stats['answered']} answered, {stats['failed']} failed, {stats['skipped']} already in {output} "
+          f"({stats['retrievals']} retrievals for {stats['answered'] + stats['failed']} requests)")
+    print(f"{stats['seconds']:.1f}s, {stats['requests_per_min']:.1f} requests/min")
+    for name in ("groq", "voyage"):
+        usage = stats[name]
+        print(f"{name}: {usage['requests']} requests, {usage['tokens']} tokens, "
+              f"throttled {usage['throttled_seconds']:.1f}s, {usage['retries']} retries on rate limits")
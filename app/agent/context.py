@@ -0,0 +1,156 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.rag.text_utils import estimate_tokens
+
+# Overlap search window between adjacent chunks (DocumentProcessor uses chunk_overlap=50)
+MAX_OVERLAP_CHARS = 200
+# Shortest suffix/prefix match treated as overlap: between adjacent chunks (by chunk_index)
+# and between chunks of the same file without a chunk_index
+MIN_ADJACENT_OVERLAP_CHARS = 4
+MIN_OVERLAP_CHARS = 20
+# A cut chunk is only kept when at least this many tokens of it fit in the budget
+MIN_PARTIAL_TOKENS = 50
+
+_WORDS = re.compile(r"\w+")
+
+
+def _overlap(first: str, second: str, min_overlap: int = 1) -> int:
+    """Length of the longest suffix of first that is also a prefix of second"""
+    for length in range(min(len(first), len(second), MAX_OVERLAP_CHARS), min_overlap - 1, -1):
+        if first.endswith(second[:length]):
+            return length
+    return 0
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORDS.findall(text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def _containment(candidate: set, kept: set) -> float:
+    """Share of the candidate's shingles already present in a kept passage"""
+    return len(candidate & kept) / len(candidate) if candidate else 1.0
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to a token budget at the last paragraph, sentence or word boundary"""
+    limit = max(0, (max_tokens - 1) * 3)
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    for boundary in ("\n\n", ". ", "\n", " "):
+        position = cut.rfind(boundary)
+        if position > limit // 2:
+            return cut[:position + (1 if boundary == ". " else 0)].rstrip()
+    return cut
+
+
+class _Part:
+    """Retrieved chunk (or run of merged chunks) with the best relevance rank it came from"""
+
+    def __init__(self, document: Document, rank: int):
+        self.document = document
+        self.rank = rank
+        self.text = document.page_content
+        self.chunk_ids = [document.metadata.get("chunk_id")]
+        self.last_index = document.metadata.get("chunk_index")
+
+    def absorb(self, other: "_Part", overlap: int):
+        self.text += ("" if overlap else "\n") + other.text[overlap:]
+        self.rank = min(self.rank, other.rank)
+        self.chunk_ids.extend(other.chunk_ids)
+        self.last_index = other.last_index
+
+    def to_document(self) -> Document:
+        metadata = dict(self.document.metadata)
+        if len(self.chunk_ids) > 1:
+            metadata["merged_chunk_ids"] = [id for id in self.chunk_ids if id]
+        return Document(id=self.document.id, page_content=self.text, metadata=metadata)
+
+
+def _merge_adjacent(documents: List[Document]) -> List[_Part]:
+    """Merge adjacent or overlapping chunks of the same file into one passage"""
+    by_file: Dict[str, List[_Part]] = {}
+    unmergeable: List[_Part] = []
+    for rank, document in enumerate(documents):
+        part = _Part(document, rank)
+        file_path = document.metadata.get("file_path")
+        if file_path is None:
+            unmergeable.append(part)
+        else:
+            by_file.setdefault(file_path, []).append(part)
+
+    merged = list(unmergeable)
+    for parts in by_file.values():
+        # Document order within the file (chunk_index from assign_chunk_ids), relevance order otherwise
+        parts.sort(key=lambda part: (part.last_index is None, part.last_index if part.last_index is not None else part.rank))
+        current = parts[0]
+        for part in parts[1:]:
+            first_index = part.document.metadata.get("chunk_index")
+            if current.last_index is not None and first_index is not None:
+                # Positions are known: only consecutive chunks are merged
+                mergeable = first_index - current.last_index == 1
+                overlap = _overlap(current.text, part.text, MIN_ADJACENT_OVERLAP_CHARS) if mergeable else 0
+            else:
+                overlap = _overlap(current.text, part.text, MIN_OVERLAP_CHARS)
+                mergeable = overlap > 0
+            if mergeable:
+                current.absorb(part, overlap)
+            else:
+                merged.append(current)
+                current = part
+        merged.append(current)
+    return merged
+
+
+def assemble_context(
+    documents: List[Document],
+    max_tokens: Optional[int] = 3000,
+    duplicate_threshold: float = 0.85,
+) -> Tuple[List[Document], Dict[str, int]]:
+    """
+    Build the documents pasted into {context}
+
+    1. merge adjacent or overlapping chunks of the same file_path (chunk_overlap repeats text),
+    2. drop near-duplicates (share of word 3-grams already in a more relevant passage >= duplicate_threshold),
+    3. order by relevance (the retriever's order, best first),
+    4. cut to max_tokens (None disables the budget).
+
+    Returns:
+        tuple: (documents, stats) with "chunks_in", "chunks_out", "tokens_in", "tokens_out" and "tokens_saved".
+    """
+    tokens_in = sum(estimate_tokens(document.page_content) for document in documents)
+
+    parts = sorted(_merge_adjacent(documents), key=lambda part: part.rank)
+
+    unique, seen = [], []
+    for part in parts:
+        shingles = _shingles(part.text)
+        if any(_containment(shingles, kept) >= duplicate_threshold for kept in seen):
+            continue
+        unique.append(part)
+        seen.append(shingles)
+
+    context, tokens_out = [], 0
+    for part in unique:
+        tokens = estimate_tokens(part.text)
+        if max_tokens is not None and tokens_out + tokens > max_tokens:
+            remaining = max_tokens - tokens_out
+            if remaining >= MIN_PARTIAL_TOKENS:
+                part.text = _truncate(part.text, remaining)
+                context.append(part.to_document())
+                tokens_out += estimate_tokens(part.text)
+            break
+        context.append(part.to_document())
+        tokens_out += tokens
+
+    return context, {
+        "chunks_in": len(documents),
+        "chunks_out": len(context),
+        "tokens_in": tokens_in,
+        "tokens_out": tokens_out,
+        "tokens_saved": tokens_in - tokens_out,
+    }
@@ -0,0 +1,129 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class Source:
+    """Reference to a source passage: its file and the chunk IDs it was assembled from"""
+
+    __slots__ = ("file_path", "chunk_ids", "text")
+
+    def __init__(self, file_path: str, chunk_ids: Tuple[str, ...], text: Optional[str] = None):
+        self.file_path = file_path
+        self.chunk_ids = chunk_ids
+        # Only kept for documents without chunk IDs (nothing to fetch them by)
+        self.text = text
+
+    @property
+    def key(self) -> str:
+        return "+".join(self.chunk_ids)
+
+    @classmethod
+    def from_document(cls, document) -> "Source":
+        metadata = document.metadata
+        chunk_ids = tuple(metadata.get("merged_chunk_ids") or [id for id in [metadata.get("chunk_id")] if id])
+        return cls(metadata.get("file_path", ""), chunk_ids, None if chunk_ids else document.page_content)
+
+
+class Turn:
+    """One request and its answer; id is a short per-session counter used as a stable widget key"""
+
+    __slots__ = ("id", "prompt", "answer", "sources")
+
+    def __init__(self, id: int, prompt: str, answer: str, sources: Tuple[Source, ...]):
+        self.id = id
+        self.prompt = prompt
+        self.answer = answer
+        self.sources = sources
+
+
+class ConversationStore:
+    """
+    Compact per-session chat state.
+
+    Replaces the parallel prompt/answer/history lists and the copied source passages:
+    each turn keeps its request, its answer and references (chunk IDs) to its sources,
+    whose text is resolved on demand through the process-wide SourceCache.
+    """
+
+    def __init__(self):
+        self.turns: List[Turn] = []
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def add(self, prompt: str, answer: str, source_documents: Iterable = ()) -> Turn:
+        turn = Turn(self._next_id, prompt, answer, tuple(Source.from_document(doc) for doc in source_documents))
+        self._next_id += 1
+        self.turns.append(turn)
+        return turn
+
+    def history(self, max_messages: Optional[int] = None) -> List[Tuple[str, str]]:
+        """Most recent (role, message) pairs, built from the last turns only"""
+        if max_messages is None:
+            max_messages = 2 * len(self.turns)
+        messages = []
+        for turn in self.turns[max(0, len(self.turns) - (max_messages + 1) // 2):]:
+            messages.append(("human", turn.prompt))
+            messages.append(("ai", turn.answer))
+        return messages[len(messages) - min(max_messages, len(messages)):]
+
+    def page(self, number: int, size: int) -> List[Turn]:
+        """Turns of a page, oldest first; page 0 holds the most recent turns"""
+        end = len(self.turns) - number * size
+        return self.turns[max(0, end - size):max(0, end)]
+
+    def pages(self, size: int) -> int:
+        return max(1, -(-len(self.turns) // size))
+
+    @property
+    def latest_sources(self) -> Tuple[Source, ...]:
+        return self.turns[-1].sources if self.turns else ()
+
+
+class SourceCache:
+    """
+    Process-wide LRU of source passage texts, shared by all sessions
+
+    Passages are remembered when an answer is produced. Evicted ones are fetched
+    again from the vector index by chunk ID (the chunks of a merged passage are joined).
+    """
+
+    def __init__(self, fetch: Callable[[List[str]], Dict[str, str]], max_size: int = 2048):
+        """
+        Args:
+            fetch (callable): Returns {chunk_id: text} for a list of chunk IDs (e.g. RagPipeline.get_chunks).
+            max_size (int): Number of passages kept in memory.
+        """
+        self.fetch = fetch
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, documents: Iterable):
+        with self._lock:
+            for document in documents:
+                key = Source.from_document(document).key
+                if key:
+                    self._entries[key] = document.page_content
+                    self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def text(self, source: Source) -> str:
+        if source.text is not None:
+            return source.text
+        with self._lock:
+            text = self._entries.get(source.key)
+            if text is not None:
+                self._entries.move_to_end(source.key)
+                return text
+
+        chunks = self.fetch(list(source.chunk_ids))
+        text = "\n".join(chunks[id] for id in source.chunk_ids if id in chunks)
+        with self._lock:
+            self._entries[source.key] = text
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return text
@@ -1,13 +1,20 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
 class RetrievalBasedGuardrail:
-    def __init__(self, retriever, min_relevant_docs=1, no_docs_message=None, similarity_threshold=None):
+    def __init__(self, retriever=None, min_relevant_docs=1, no_docs_message=None, similarity_threshold=None, k=4):
         """
         Initialize the guardrail with a retriever, minimum relevant documents, and a custom message.
 
         Args:
-            retriever: The retriever object (e.g., PineconeVectorStore retriever).
+            retriever: Vector store with similarity_search_with_score (e.g. PineconeVectorStore).
+                       Defaults to the vector store of the RagPipeline the guardrail is given to.
             min_relevant_docs (int): Minimum number of relevant documents required to proceed.
             no_docs_message (str): Custom message to return when no relevant documents are found.
-            similarity_threshold (float): Optional similarity threshold for filtering documents.
+            similarity_threshold (float): Optional minimum similarity score of a relevant document.
+            k (int): Number of documents retrieved (and handed to the answer chain).
         """
         self.retriever = retriever
         self.min_relevant_docs = min_relevant_docs
@@ -17,53 +24,78 @@ class RetrievalBasedGuardrail:
             "Ou faça uma solicitação diferente."
         )
         self.similarity_threshold = similarity_threshold
+        self.k = k
 
-    def check_relevance(self, query, chat_history=None):
+    def retrieve(self, query, filter=None):
         """
-        Check if the query retrieves enough relevant documents.
+        Run the single scored retrieval of a request.
+
+        Returns:
+            list: (document, score) pairs, best first.
+        """
+        return self._log_scores(self.retriever.similarity_search_with_score(query, k=self.k, filter=filter))
+
+    async def aretrieve(self, query, filter=None):
+        """Asynchronous retrieve"""
+        return self._log_scores(await self.retriever.asimilarity_search_with_score(query, k=self.k, filter=filter))
+
+    def _log_scores(self, scored_docs):
+        # Log document scores for tuning
+        if logger.isEnabledFor(logging.DEBUG):
+            for doc, score in scored_docs:
+                logger.debug("Score: %.4f | Content: %s...", score, doc.page_content[:50])
+        return scored_docs
+
+    def evaluate(self, scored_docs, chat_history=None):
+        """
+        Decide on already retrieved documents, applying the similarity threshold locally.
 
         Args:
-            query (str): The user's query.
+            scored_docs (list): (document, score) pairs returned by retrieve.
             chat_history (list): The previous messages in the conversation.
 
         Returns:
-            dict: A dictionary with two keys:
+            dict: A dictionary with three keys:
                 - "relevant": True if enough relevant documents are found, False otherwise.
                 - "documents": List of relevant documents (if any).
                 - "message": The no-docs message (if no relevant documents are found).
         """
-        # Combine chat history into a contextualized query if available
-        if chat_history:
-            contextual_query = "\n".join([msg['user'] for msg in chat_history[-3:]]) + "\n" + query
+        if self.similarity_threshold is not None:
+            relevant_docs = [doc for doc, score in scored_docs if score >= self.similarity_threshold]
         else:
-            contextual_query = query
+            relevant_docs = [doc for doc, _ in scored_docs]
+
+        if len(relevant_docs) >= self.min_relevant_docs:
+            return {"relevant": True, "documents": relevant_docs, "message": None}
 
-        # Retrieve documents with similarity scores
-        relevant_docs = self.retriever.similarity_search_with_score(contextual_query, k=5)
-
-        # Print document scores for tuning
-        print("\n--- Retrieved Document Scores ---")
-        for doc, score in relevant_docs:
-            print(f"Score: {score:.4f} | Content: {doc.page_content[:50]}...")  # Truncate content for readability
-            
-        # Retrieve documents with optional similarity threshold
-        if self.similarity_threshold:
-            relevant_docs = self.retriever.similarity_search_with_score(
-                contextual_query, k=self.min_relevant_docs, filter={"score": {"$gte": self.similarity_threshold}}
-            )
-        else:
-            relevant_docs = self.retriever.similarity_search(contextual_query, k=self.min_relevant_docs)
-        
         # Allow follow-up queries that rely on previous conversation even if no relevant docs are found
-        if len(relevant_docs) >= self.min_relevant_docs or (chat_history and len(chat_history) > 0):
-            return {
-                "relevant": True,
-                "documents": relevant_docs,
-                "message": None
-            }
+        if chat_history:
+            return {"relevant": True, "documents": [doc for doc, _ in scored_docs], "message": None}
+
+        logger.info("No relevant documents for the request (best score: %s)", scored_docs[0][1] if scored_docs else None)
+        return {"relevant": False, "documents": [], "message": self.no_docs_message}
+
+    def check_relevance(self, query, chat_history=None, filter=None):
+        """
+        Check if the query retrieves enough relevant documents.
+
+        Args:
+            query (str): The user's query.
+            chat_history (list): The previous messages in the conversation.
+            filter (dict): Optional metadata filter of the search.
+
+        Returns:
+            dict: See evaluate.
+        """
+        # Combine the user's recent messages into a contextualized query if available
+        if chat_history:
+            user_messages = [
+                message[1] if isinstance(message, (tuple, list)) else message.content
+                for message in chat_history
+                if (message[0] if isinstance(message, (tuple, list)) else message.type) in ("human", "user")
+            ]
+            contextual_query = "\n".join(user_messages[-3:] + [query])
         else:
-            return {
-                "relevant": False,
-                "documents": [],
-                "message": self.no_docs_message
-            }
+            contextual_query = query
+
+        return self.evaluate(self.retrieve(contextual_query, filter=filter), chat_history)
@@ -1,9 +1,59 @@
-from langchain_groq import ChatGroq
+from collections import OrderedDict
+from typing import Dict, List, Tuple, TYPE_CHECKING
+import threading
 import os
 
+import numpy as np
+
+from app.rag.embedding_cache import voyage_embeddings
+from app.rag.text_utils import estimate_tokens, normalize_query
+from app.rag.tracing import get_tracer
+
+if TYPE_CHECKING:
+    from app.agent.scheduler import ProviderLimiter
+
+# Label of examples that are not about marketing
+OFF_TOPIC = "fora_do_tema"
+
+
 class ThemeBasedGuardrail:
-    def __init__(self):
-        self.llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0)
+    def __init__(self, embedding=None, llm=None, examples: Dict[str, List[str]] = None,
+                 ambiguity_band: Tuple[float, float] = None, cache_size: int = 4096):
+        """
+        Local topic classifier with an LLM fallback for uncertain queries.
+
+        Each theme of temas_de_marketing becomes a centroid (the theme embedding averaged with
+        its labeled examples). Examples labeled with anything else (e.g. OFF_TOPIC) become
+        off-topic centroids. A query scores its best theme similarity minus its best off-topic
+        similarity: above the band it is accepted, below it is rejected, and only scores inside
+        the band are sent to the LLM. Decisions are memoized per normalized query.
+
+        The band depends on the embedding model and the examples, so it has no default: it
+        comes from THEME_GUARDRAIL_BAND ("lower,upper") unless given. Calibrate it with
+        python -m benchmarks.eval_theme_guardrail --embedder voyage --sweep, which reports the
+        scores of a labeled set of requests and the accuracy and LLM share of candidate bands.
+
+        Args:
+            embedding: Embeddings instance (defaults to cached VoyageAI voyage-3).
+            llm: Chat model of the fallback (defaults to ChatGroq llama-3.3-70b-versatile, created on first use).
+            examples (dict): Optional labeled examples, {theme or OFF_TOPIC: [queries]}.
+            ambiguity_band (tuple): (lower, upper) scores sent to the LLM (defaults to THEME_GUARDRAIL_BAND).
+            cache_size (int): Number of memoized decisions.
+        """
+        if ambiguity_band is None:
+            band = os.getenv("THEME_GUARDRAIL_BAND")
+            if not band:
+                raise ValueError(
+                    "Set THEME_GUARDRAIL_BAND (\"lower,upper\"), calibrated for the embedding model with "
+                    "python -m benchmarks.eval_theme_guardrail --embedder voyage --sweep"
+                )
+            ambiguity_band = tuple(float(bound) for bound in band.split(","))
+        self.embedding = embedding or voyage_embeddings(model="voyage-3")
+        self._llm = llm
+        # Optional Groq budget of the asynchronous LLM fallback (set by the batch runner)
+        self.llm_limiter: "ProviderLimiter" = None
+        self.lower, self.upper = ambiguity_band
+        self.cache_size = cache_size
         self.temas_de_marketing = [
             "criação de conteúdo",
             "estratégia de marketing",
@@ -16,30 +66,138 @@ class ThemeBasedGuardrail:
             "marketing digital",
             "estratégia de conteúdo"
         ]
-        
+
         self.validation_prompt = """
         Analise se a seguinte consulta do usuário está relacionada a atividades de marketing/criação de conteúdo.
         Retorne apenas "true" se estiver relacionada a marketing, ou "false" se não estiver.
-        
+
         Consulta: {query}
-        
+
         Resposta (true/false):
         """
-        
+
         self.default_message = {
             "query": "",
             "result": "Desculpe, sou um assistente especializado em marketing e criação de conteúdo. Não posso ajudar com perguntas fora desse contexto. Por favor, faça perguntas relacionadas a marketing, estratégias de comunicação ou criação de conteúdo.",
             "source_documents": []
         }
 
+        self._theme_centroids, self._off_topic_centroids = self._build_centroids(examples or {})
+        self._decisions: "OrderedDict[str, bool]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"cached": 0, "accepted": 0, "rejected": 0, "llm_calls": 0}
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from langchain_groq import ChatGroq
+
+            self._llm = ChatGroq(model="llama-3.3-70b-versatile", temperature=0)
+        return self._llm
+
+    def _build_centroids(self, examples: Dict[str, List[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Embed themes and examples in one call and average them per label"""
+        labels = list(self.temas_de_marketing) + [label for label in examples if label not in self.temas_de_marketing]
+        texts, owners = [], []
+        for i, label in enumerate(labels):
+            if label in self.temas_de_marketing:
+                texts.append(label)
+                owners.append(i)
+            for example in examples.get(label, []):
+                texts.append(example)
+                owners.append(i)
+
+        vectors = self._normalize(np.asarray(self.embedding.embed_documents(texts), dtype=np.float32))
+        centroids = np.zeros((len(labels), vectors.shape[1]), dtype=np.float32)
+        np.add.at(centroids, np.asarray(owners), vectors)
+        centroids = self._normalize(centroids)
+
+        themes = len(self.temas_de_marketing)
+        return centroids[:themes], centroids[themes:]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _score_vector(self, vector) -> float:
+        """Best theme similarity minus best off-topic similarity"""
+        vector = self._normalize(np.asarray(vector, dtype=np.float32))
+        score = float((self._theme_centroids @ vector).max())
+        if len(self._off_topic_centroids):
+            score -= float((self._off_topic_centroids @ vector).max())
+        return score
+
+    def score(self, query: str) -> float:
+        return self._score_vector(self.embedding.embed_query(query))
+
+    async def ascore(self, query: str) -> float:
+        return self._score_vector(await self.embedding.aembed_query(query))
+
+    def _is_certain(self, score: float) -> bool:
+        return not self.lower <= score < self.upper
+
+    def _cached(self, key: str):
+        with self._lock:
+            decision = self._decisions.get(key)
+            if decision is not None:
+                self._decisions.move_to_end(key)
+                self.stats["cached"] += 1
+            return decision
+
+    def _remember(self, key: str, decision: bool) -> bool:
+        with self._lock:
+            self.stats["accepted" if decision else "rejected"] += 1
+            self._decisions[key] = decision
+            while len(self._decisions) > self.cache_size:
+                self._decisions.popitem(last=False)
+        return decision
+
+    def _parse_response(self, response) -> bool:
+        self.stats["llm_calls"] += 1
+        return response.content.strip().lower().startswith("true")
+
     def validate_query(self, query: str) -> bool:
-        response = self.llm.invoke(
-            self.validation_prompt.format(query=query)
-        )
-        return response.strip().lower() == "true"
+        key = normalize_query(query)
+        decision = self._cached(key)
+        get_tracer().annotate(cache_hit=decision is not None)
+        if decision is not None:
+            return decision
+
+        # The LLM is only asked inside the ambiguity band
+        score = self.score(query)
+        get_tracer().annotate(score=round(score, 4), llm_fallback=not self._is_certain(score))
+        if self._is_certain(score):
+            return self._remember(key, score >= self.upper)
+        response = self.llm.invoke(self.validation_prompt.format(query=query))
+        return self._remember(key, self._parse_response(response))
+
+    async def avalidate_query(self, query: str) -> bool:
+        """Asynchronous validate_query (async embedding and LLM calls)"""
+        key = normalize_query(query)
+        decision = self._cached(key)
+        get_tracer().annotate(cache_hit=decision is not None)
+        if decision is not None:
+            return decision
+
+        score = await self.ascore(query)
+        get_tracer().annotate(score=round(score, 4), llm_fallback=not self._is_certain(score))
+        if self._is_certain(score):
+            return self._remember(key, score >= self.upper)
+        prompt = self.validation_prompt.format(query=query)
+        if self.llm_limiter is None:
+            response = await self.llm.ainvoke(prompt)
+        else:
+            # Prompt plus a one-word answer
+            response = await self.llm_limiter.call(lambda: self.llm.ainvoke(prompt), tokens=estimate_tokens(prompt) + 2)
+        return self._remember(key, self._parse_response(response))
 
     def check_query(self, query: str) -> dict:
         if not self.validate_query(query):
-            self.default_message["query"] = query
-            return self.default_message
-        return {"validated": True}
\ No newline at end of file
+            return {**self.default_message, "query": query}
+        return {"validated": True}
+
+    async def acheck_query(self, query: str) -> dict:
+        if not await self.avalidate_query(query):
+            return {**self.default_message, "query": query}
+        return {"validated": True}
@@ -0,0 +1,98 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app.rag.text_utils import estimate_tokens, normalize_query
+
+# Words that make a request depend on the previous turns (accent-folded)
+FOLLOW_UP_WORDS = {
+    # "esta" is left out: accent-folded it is also the verb "está"
+    "isso", "isto", "aquilo", "esse", "essa", "esses", "essas", "este", "estes", "estas",
+    "aquele", "aquela", "dele", "dela", "deles", "delas", "nele", "nela", "desse", "dessa", "deste",
+    "desta", "nesse", "nessa", "neste", "nesta", "ele", "ela", "eles", "elas", "mesmo", "mesma",
+    "anterior", "acima", "novamente", "outra", "outro", "outras", "outros", "versao", "melhore",
+    "reescreva", "reformule", "refaca", "altere", "mude", "troque", "continue", "resuma", "encurte",
+    "aumente", "diminua", "ajuste", "adapte", "traduza", "corrija", "revise",
+}
+
+# Requests shorter than this (in words) are treated as follow-ups
+MIN_STANDALONE_WORDS = 6
+
+_WORDS = re.compile(r"\w+")
+
+
+def message_parts(message) -> Tuple[str, str]:
+    """(role, text) of a chat history entry: ("human", text) tuples or LangChain messages"""
+    if isinstance(message, (tuple, list)):
+        return str(message[0]), str(message[1])
+    return getattr(message, "type", ""), str(getattr(message, "content", message))
+
+
+def trim_history(chat_history: Optional[list], max_tokens: int = 1500, max_messages: int = 6) -> list:
+    """Keep the most recent messages that fit both the message and the token budget"""
+    if not chat_history:
+        return []
+
+    window, tokens = [], 0
+    for message in reversed(chat_history[-max_messages:]):
+        message_tokens = estimate_tokens(message_parts(message)[1])
+        if window and tokens + message_tokens > max_tokens:
+            break
+        window.append(message)
+        tokens += message_tokens
+    return window[::-1]
+
+
+def history_digest(chat_history: list) -> str:
+    """Stable digest of a history window"""
+    digest = hashlib.sha256()
+    for message in chat_history:
+        role, text = message_parts(message)
+        digest.update(f"{role}\0{text}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_standalone(query: str) -> bool:
+    """
+    Cheap check for requests that do not need the previous turns to be understood:
+    long enough and without pronouns or edit verbs pointing back at earlier answers
+    """
+    words = _WORDS.findall(normalize_query(query))
+    if len(words) < MIN_STANDALONE_WORDS:
+        return False
+    return not any(word in FOLLOW_UP_WORDS for word in words)
+
+
+class RephraseCache:
+    """Thread-safe LRU of standalone rephrasings keyed by (history digest, normalized query)"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, chat_history: list, query: str) -> Tuple[str, str]:
+        return history_digest(chat_history), normalize_query(query)
+
+    def get(self, chat_history: list, query: str) -> Optional[str]:
+        key = self._key(chat_history, query)
+        with self._lock:
+            rephrased = self._entries.get(key)
+            if rephrased is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rephrased
+
+    def put(self, chat_history: list, query: str, rephrased: str):
+        key = self._key(chat_history, query)
+        with self._lock:
+            self._entries[key] = rephrased
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -0,0 +1,507 @@
+# Import required packages
+import os
+import time
+import asyncio
+import logging
+import httpx
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Tuple
+
+# Importar pacotes do langchain
+from langchain.prompts import PromptTemplate
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import ConfigurableField, RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import merge_configs
+from app.rag.embedding_cache import voyage_embeddings
+from app.rag.lexical_index import HybridRetriever
+from app.rag.loader import category_filter, partition_filter
+from app.rag.mmr import MMRVectorStore
+from app.rag.text_utils import estimate_tokens
+from app.rag.tracing import get_tracer
+from app.rag.vector_store import VectorStoreHandler
+
+# Import prompts
+from .prompts import retrieval_marketing_agent_initial_prompt, retrieval_marketing_agent_rephrase_prompt
+
+# Import chat history helpers
+from .history import RephraseCache, is_standalone, message_parts, trim_history
+
+# Import context assembly
+from .context import assemble_context
+
+logger = logging.getLogger(__name__)
+
+
+class RagPipeline:
+    """
+    RAG pipeline built once per process and shared across requests and sessions.
+
+    The embedding, vector store and LLM clients (and their HTTP connection pools)
+    are created a single time, so each request only pays for the actual model and
+    vector store calls. The LangChain chains hold no per-request state, which makes
+    a single instance safe to share between concurrent Streamlit sessions.
+    """
+
+    def __init__(
+        self,
+        index_name: str = None,
+        embedding=None,
+        vectorstore=None,
+        llm=None,
+        max_connections: int = 20,
+        history_max_tokens: int = 1500,
+        history_max_messages: int = 6,
+        rephrase_cache_size: int = 1024,
+        guardrail=None,
+        theme_guardrail=None,
+        lexical_index=None,
+        context_max_tokens: int = 3000,
+        k: int = 4,
+        fetch_k: int = 20,
+        mmr_lambda: float = None,
+    ):
+        """
+        Args:
+            index_name (str): Vector index name (defaults to the INDEX_NAME env var).
+            embedding: Embeddings instance (defaults to cached VoyageAI voyage-3).
+            vectorstore: LangChain vector store (defaults to the VectorStoreHandler backend
+                         selected by VECTOR_BACKEND: Pinecone or the local in-process index).
+            llm: Chat model (defaults to ChatGroq llama-3.3-70b-versatile).
+            max_connections (int): Size of the pooled HTTP connections used by the LLM client.
+            history_max_tokens (int): Token budget of the chat history sent to the rephrase step.
+            history_max_messages (int): Maximum number of recent messages sent to the rephrase step.
+            rephrase_cache_size (int): Number of memoized rephrasings.
+            guardrail (RetrievalBasedGuardrail): Optional relevance check. Its single scored
+                       retrieval replaces the retriever, so it adds no extra vector query.
+            theme_guardrail (ThemeBasedGuardrail): Optional topic check of requests without history.
+                       The async path runs it concurrently with rephrase and retrieval.
+            lexical_index (LexicalIndex): Optional BM25 index (or ReloadingLexicalIndex). When given, retrieval
+                       fuses BM25 and vector results (HybridRetriever) and confident lexical matches skip
+                       the vector search. The guardrail's scored retrieval stays vector-only.
+            context_max_tokens (int): Token budget of the retrieved materials pasted into the prompt
+                       (None disables the cut; overlapping and duplicate chunks are merged either way).
+            k (int): Chunks retrieved per request.
+            fetch_k (int): Candidates fetched per vector search for the MMR re-ranking.
+            mmr_lambda (float): Enables maximal-marginal-relevance re-ranking of the vector search
+                       (MMRVectorStore): 1 ranks by relevance only, lower values favor diversity.
+                       Applies to the plain, hybrid (dense side) and guardrail retrievals.
+                       None keeps the plain top-k.
+        """
+        # Initialize the retriever
+        self.index_name = index_name or os.getenv("INDEX_NAME")
+        self.embedding = embedding or voyage_embeddings(model="voyage-3")
+        if vectorstore is None:
+            vectorstore = VectorStoreHandler(index_name=self.index_name, embeddings=self.embedding).vectorstore
+        self.vectorstore = vectorstore
+
+        # Set the LLM model, reusing keep-alive connections between requests
+        if llm is None:
+            # Importar AI da Groq (Fonte de LLM) only when no model is given
+            from langchain_groq import ChatGroq
+
+            limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            llm = ChatGroq(
+                model="llama-3.3-70b-versatile",
+                temperature=0,
+                http_client=httpx.Client(limits=limits),
+                http_async_client=httpx.AsyncClient(limits=limits),
+            )
+        self.llm = llm
+
+        # Combine prompt with chat
+        self.stuff_documents_chain = create_stuff_documents_chain(
+            self.llm, PromptTemplate.from_template(retrieval_marketing_agent_initial_prompt)
+        )
+
+        # Over-fetch and keep a diverse top-k (the stored vectors come with the candidates)
+        self.k = k
+        search_store = self.vectorstore
+        if mmr_lambda is not None:
+            search_store = MMRVectorStore(self.vectorstore, fetch_k=fetch_k, lambda_mult=mmr_lambda)
+
+        # Search kwargs (e.g. the category filter) can be set per request through the config
+        if lexical_index is not None:
+            retriever = HybridRetriever(vectorstore=search_store, lexical_index=lexical_index, k=k)
+        else:
+            retriever = search_store.as_retriever(search_kwargs={"k": k})
+        self.retriever = retriever.configurable_fields(search_kwargs=ConfigurableField(id="search_kwargs"))
+
+        # Rephrase follow-ups into standalone requests (only when the history is needed)
+        self.rephrase_chain = (
+            PromptTemplate.from_template(retrieval_marketing_agent_rephrase_prompt) | self.llm | StrOutputParser()
+        )
+        self.rephrase_cache = RephraseCache(max_size=rephrase_cache_size)
+        self.history_max_tokens = history_max_tokens
+        self.history_max_messages = history_max_messages
+
+        # Use history-aware retriever
+        self.history_aware_retriever = RunnableLambda(self._retrieve, afunc=self._aretrieve).with_config(
+            run_name="chat_retriever_chain"
+        )
+
+        # Reject requests without relevant materials before generating an answer
+        self.guardrail = guardrail
+        if guardrail is not None and guardrail.retriever is None:
+            guardrail.retriever = search_store
+        self.theme_guardrail = theme_guardrail
+
+        # Merge, dedup and cut the retrieved chunks before the stuff chain
+        self.context_max_tokens = context_max_tokens
+
+    def rephrase(self, query: str, chat_history: list = None, config: RunnableConfig = None) -> str:
+        """
+        Standalone version of the request for retrieval
+
+        The LLM is skipped when there is no history or the request is already standalone,
+        and rephrasings are memoized per (history window, request).
+        """
+        history = trim_history(chat_history, self.history_max_tokens, self.history_max_messages)
+        if not history or is_standalone(query):
+            return query
+
+        with get_tracer().span("rephrase") as span:
+            rephrased = self.rephrase_cache.get(history, query)
+            span.set(cache_hit=rephrased is not None)
+            if rephrased is None:
+                call_config, usage = self._with_usage(config)
+                rephrased = self.rephrase_chain.invoke({"input": query, "chat_history": history}, call_config)
+                self.rephrase_cache.put(history, query, rephrased)
+                if usage is not None:
+                    span.set(**_token_counts(usage, _history_text(history, query), rephrased))
+        return rephrased
+
+    async def arephrase(self, query: str, chat_history: list = None, config: RunnableConfig = None) -> str:
+        """Asynchronous rephrase"""
+        history = trim_history(chat_history, self.history_max_tokens, self.history_max_messages)
+        if not history or is_standalone(query):
+            return query
+
+        with get_tracer().span("rephrase") as span:
+            rephrased = self.rephrase_cache.get(history, query)
+            span.set(cache_hit=rephrased is not None)
+            if rephrased is None:
+                call_config, usage = self._with_usage(config)
+                rephrased = await self.rephrase_chain.ainvoke({"input": query, "chat_history": history}, call_config)
+                self.rephrase_cache.put(history, query, rephrased)
+                if usage is not None:
+                    span.set(**_token_counts(usage, _history_text(history, query), rephrased))
+        return rephrased
+
+    def _retrieve(self, inputs: dict, config: RunnableConfig) -> dict:
+        """
+        Rephrase (if needed) and retrieve documents for the request
+
+        Returns the guardrail verdict: {"relevant", "documents", "message"}. Without a
+        guardrail every request is relevant.
+        """
+        query = self.rephrase(inputs["input"], inputs.get("chat_history"), config)
+        with get_tracer().span("retrieve") as span:
+            if self.guardrail is None:
+                verdict = {"relevant": True, "documents": self.retriever.invoke(query, config), "message": None}
+            else:
+                # One scored search; the threshold is applied to its results locally
+                scored_docs = self.guardrail.retrieve(query, filter=self._search_filter(config))
+                verdict = self.guardrail.evaluate(scored_docs, inputs.get("chat_history"))
+            span.set(documents=len(verdict["documents"]), relevant=verdict["relevant"])
+        return verdict
+
+    async def _aretrieve(self, inputs: dict, config: RunnableConfig) -> dict:
+        """Asynchronous _retrieve"""
+        query = await self.arephrase(inputs["input"], inputs.get("chat_history"), config)
+        with get_tracer().span("retrieve") as span:
+            if self.guardrail is None:
+                verdict = {"relevant": True, "documents": await self.retriever.ainvoke(query, config), "message": None}
+            else:
+                scored_docs = await self.guardrail.aretrieve(query, filter=self._search_filter(config))
+                verdict = self.guardrail.evaluate(scored_docs, inputs.get("chat_history"))
+            span.set(documents=len(verdict["documents"]), relevant=verdict["relevant"])
+        return verdict
+
+    @staticmethod
+    def _search_filter(config: RunnableConfig) -> dict:
+        return config.get("configurable", {}).get("search_kwargs", {}).get("filter")
+
+    def _checks_theme(self, inputs: dict) -> bool:
+        """Follow-ups ("deixe mais curto") only make sense with the history, so only standalone requests are checked"""
+        return self.theme_guardrail is not None and (not inputs["chat_history"] or is_standalone(inputs["input"]))
+
+    def _theme_rejection(self) -> dict:
+        return {"relevant": False, "documents": [], "message": self.theme_guardrail.default_message["result"]}
+
+    def _checked_retrieve(self, inputs: dict, config: dict) -> dict:
+        """Theme check, then retrieval (skipped when the theme check rejects the request)"""
+        if self._checks_theme(inputs):
+            with get_tracer().span("theme_check") as span:
+                accepted = self.theme_guardrail.validate_query(inputs["input"])
+                span.set(accepted=accepted)
+            if not accepted:
+                return self._theme_rejection()
+        return self.history_aware_retriever.invoke(inputs, config)
+
+    async def _achecked_retrieve(self, inputs: dict, config: dict) -> dict:
+        """
+        Theme check running concurrently with rephrase, query embedding and retrieval
+
+        Retrieval is cancelled as soon as the theme check rejects the request.
+        """
+        if not self._checks_theme(inputs):
+            return await self.history_aware_retriever.ainvoke(inputs, config)
+
+        async def check_theme():
+            with get_tracer().span("theme_check") as span:
+                accepted = await self.theme_guardrail.avalidate_query(inputs["input"])
+                span.set(accepted=accepted)
+            if not accepted:
+                raise _Rejected(self._theme_rejection())
+
+        stages = [
+            asyncio.ensure_future(self.history_aware_retriever.ainvoke(inputs, config)),
+            asyncio.ensure_future(check_theme()),
+        ]
+        try:
+            retrieval, _ = await asyncio.gather(*stages)
+        except _Rejected as rejection:
+            return rejection.verdict
+        finally:
+            # No-op for finished stages; stops retrieval after a rejection or an error
+            for stage in stages:
+                stage.cancel()
+        return retrieval
+
+    def get_chunks(self, ids: List[str]) -> Dict[str, str]:
+        """
+        Text of indexed chunks by chunk_id (the vector IDs written by sync_documents)
+
+        Used to show sources referenced by ID (ConversationStore) without keeping their text per session.
+        """
+        # PineconeVectorStore exposes its Index, LocalVectorStore implements the Index API itself
+        # and PartitionedVectorStore fetches from the namespaces of the partitions
+        index = getattr(self.vectorstore, "index", self.vectorstore)
+        if not hasattr(index, "fetch"):
+            return {doc.id: doc.page_content for doc in self.vectorstore.get_by_ids(ids)}
+
+        response = index.fetch(ids=ids)
+        vectors = response["vectors"] if isinstance(response, dict) else response.vectors
+        texts = {}
+        for id, vector in vectors.items():
+            metadata = vector["metadata"] if isinstance(vector, dict) else vector.metadata
+            texts[id] = (metadata or {}).get("text", "")
+        return texts
+
+    def _config(self, category: str = None, partitions: List[str] = None) -> dict:
+        """
+        Per-request chain config restricting retrieval to a category (and its subcategories)
+        and/or to some index partitions (a PartitionedVectorStore only queries their namespaces)
+        """
+        filter = {}
+        if category:
+            filter.update(category_filter(category))
+        if partitions:
+            filter.update(partition_filter(partitions))
+        if not filter:
+            return None
+        return {"configurable": {"search_kwargs": {"k": self.k, "filter": filter}}}
+
+    def _assemble(self, retrieval: dict) -> dict:
+        """Replace the retrieved documents by the assembled context and add its stats"""
+        if not retrieval["relevant"]:
+            return {**retrieval, "context_stats": None}
+        with get_tracer().span("assemble_context") as span:
+            documents, stats = assemble_context(retrieval["documents"], max_tokens=self.context_max_tokens)
+            span.set(**stats)
+        logger.info("Context: %(chunks_in)d -> %(chunks_out)d chunks, %(tokens_saved)d tokens saved", stats)
+        return {**retrieval, "documents": documents, "context_stats": stats}
+
+    def _inputs(self, query: str, chat_history: list, category: str, partitions: List[str]) -> Tuple[dict, dict]:
+        return {"input": query, "chat_history": chat_history or []}, self._config(category, partitions)
+
+    @staticmethod
+    def _with_usage(config: dict) -> Tuple[dict, UsageMetadataCallbackHandler]:
+        """Config collecting the token usage reported by the LLM (only while tracing)"""
+        if not get_tracer().enabled:
+            return config, None
+        usage = UsageMetadataCallbackHandler()
+        return merge_configs(config, {"callbacks": [usage]}), usage
+
+    def _generate(self, inputs: dict, retrieval: dict, config: dict) -> str:
+        with get_tracer().span("generate") as span:
+            call_config, usage = self._with_usage(config)
+            answer = self.stuff_documents_chain.invoke({**inputs, "context": retrieval["documents"]}, call_config)
+            if usage is not None:
+                span.set(**_token_counts(usage, _prompt_text(inputs, retrieval), answer))
+        return answer
+
+    async def _agenerate(self, inputs: dict, retrieval: dict, config: dict) -> str:
+        with get_tracer().span("generate") as span:
+            call_config, usage = self._with_usage(config)
+            answer = await self.stuff_documents_chain.ainvoke({**inputs, "context": retrieval["documents"]}, call_config)
+            if usage is not None:
+                span.set(**_token_counts(usage, _prompt_text(inputs, retrieval), answer))
+        return answer
+
+    def retrieve(self, query: str, chat_history: list = None, category: str = None, partitions: List[str] = None) -> dict:
+        """
+        Guardrail checks, retrieval and context assembly of a request (the first half of invoke)
+
+        Returns:
+            dict: "relevant", "documents" (the assembled context), "message" (rejection message)
+                  and "context_stats". Can be passed to invoke(retrieval=...) for any request
+                  that should answer from the same materials.
+        """
+        inputs, config = self._inputs(query, chat_history, category, partitions)
+        return self._assemble(self._checked_retrieve(inputs, config))
+
+    async def aretrieve(self, query: str, chat_history: list = None, category: str = None, partitions: List[str] = None) -> dict:
+        """Asynchronous retrieve"""
+        inputs, config = self._inputs(query, chat_history, category, partitions)
+        return self._assemble(await self._achecked_retrieve(inputs, config))
+
+    @staticmethod
+    def _response(query: str, retrieval: dict, answer: str = None) -> dict:
+        """Structured response of a request (the guardrail message when it was rejected)"""
+        if not retrieval["relevant"]:
+            return {"query": query, "result": retrieval["message"], "source_documents": [], "context_stats": None, "rejected": True}
+        return {
+            "query": query,
+            "result": answer,
+            "source_documents": retrieval["documents"],
+            "context_stats": retrieval["context_stats"],
+            "rejected": False
+        }
+
+    @staticmethod
+    def _stream_start(retrieval: dict) -> List[dict]:
+        """First events of a stream: the sources, then the guardrail message of a rejected request"""
+        events = [{"source_documents": retrieval["documents"], "context_stats": retrieval["context_stats"], "rejected": not retrieval["relevant"]}]
+        if not retrieval["relevant"]:
+            events.append({"token": retrieval["message"]})
+        return events
+
+    @contextmanager
+    def _streamed_answer(self, inputs: dict, retrieval: dict, config: dict) -> Iterator["_StreamedAnswer"]:
+        """"generate" span of a streamed answer, with its time to first token and token usage"""
+        with get_tracer().span("generate") as span:
+            call_config, usage = self._with_usage(config)
+            answer = _StreamedAnswer(span, call_config)
+            yield answer
+            if usage is not None:
+                span.set(**_token_counts(usage, _prompt_text(inputs, retrieval), "".join(answer.chunks)))
+
+    def invoke(self, query: str, chat_history: list = None, category: str = None, partitions: List[str] = None,
+               retrieval: dict = None) -> dict:
+        """
+        Run the RAG chain for a single request and return the structured response
+
+        Args:
+            query (str): The user's request.
+            chat_history (list): Previous (role, message) turns.
+            category (str): Optional category (e.g. "Lançamentos > Python") to search in.
+            partitions (list): Optional index partitions (e.g. ["lancamentos"]) to search in.
+            retrieval (dict): Result of retrieve() to answer from (e.g. shared by batch requests
+                              with the same retrieval query); retrieval runs when not given.
+
+        Returns:
+            dict: "query", "result", "source_documents" (the assembled context), "context_stats"
+                  (chunks and tokens before/after assembly, None when the request was rejected) and
+                  "rejected" (whether a guardrail answered with its message instead of the LLM).
+        """
+        inputs, config = self._inputs(query, chat_history, category, partitions)
+
+        # Retrieve once and hand the same documents to the answer chain
+        if retrieval is None:
+            retrieval = self._assemble(self._checked_retrieve(inputs, config))
+        if not retrieval["relevant"]:
+            return self._response(query, retrieval)
+        return self._response(query, retrieval, self._generate(inputs, retrieval, config))
+
+    async def ainvoke(self, query: str, chat_history: list = None, category: str = None, partitions: List[str] = None,
+                      retrieval: dict = None) -> dict:
+        """Asynchronous invoke: guardrail checks and retrieval overlap, no thread per request"""
+        inputs, config = self._inputs(query, chat_history, category, partitions)
+
+        if retrieval is None:
+            retrieval = self._assemble(await self._achecked_retrieve(inputs, config))
+        if not retrieval["relevant"]:
+            return self._response(query, retrieval)
+        return self._response(query, retrieval, await self._agenerate(inputs, retrieval, config))
+
+    def stream(self, query: str, chat_history: list = None, category: str = None, partitions: List[str] = None) -> Iterator[dict]:
+        """
+        Stream the RAG chain for a single request
+
+        Yields {"source_documents": [...], "context_stats": {...}, "rejected": bool} as soon as
+        retrieval finishes, then {"token": str} for each answer chunk as the LLM generates it
+        (or the guardrail message of a rejected request).
+        """
+        inputs, config = self._inputs(query, chat_history, category, partitions)
+
+        retrieval = self._assemble(self._checked_retrieve(inputs, config))
+        yield from self._stream_start(retrieval)
+        if not retrieval["relevant"]:
+            return
+
+        with self._streamed_answer(inputs, retrieval, config) as answer:
+            for chunk in self.stuff_documents_chain.stream({**inputs, "context": retrieval["documents"]}, answer.config):
+                if chunk:
+                    answer.add(chunk)
+                    yield {"token": chunk}
+
+    async def astream(self, query: str, chat_history: list = None, category: str = None, partitions: List[str] = None) -> AsyncIterator[dict]:
+        """Asynchronous stream"""
+        inputs, config = self._inputs(query, chat_history, category, partitions)
+
+        retrieval = self._assemble(await self._achecked_retrieve(inputs, config))
+        for event in self._stream_start(retrieval):
+            yield event
+        if not retrieval["relevant"]:
+            return
+
+        with self._streamed_answer(inputs, retrieval, config) as answer:
+            async for chunk in self.stuff_documents_chain.astream({**inputs, "context": retrieval["documents"]}, answer.config):
+                if chunk:
+                    answer.add(chunk)
+                    yield {"token": chunk}
+
+
+def _history_text(history: list, query: str) -> str:
+    return "\n".join([*(message_parts(message)[1] for message in history), query])
+
+
+def _prompt_text(inputs: dict, retrieval: dict) -> str:
+    return "\n".join([*(doc.page_content for doc in retrieval["documents"]), _history_text(inputs["chat_history"], inputs["input"])])
+
+
+def _token_counts(usage: UsageMetadataCallbackHandler, prompt: str, completion: str) -> dict:
+    """Token usage reported by the LLM, estimated from the texts when the model reports none"""
+    if usage.usage_metadata:
+        reported = usage.usage_metadata.values()
+        return {
+            "input_tokens": sum(model["input_tokens"] for model in reported),
+            "output_tokens": sum(model["output_tokens"] for model in reported),
+        }
+    return {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(completion), "tokens_estimated": True}
+
+
+class _StreamedAnswer:
+    """Chunks of a streamed answer; the first one records the time to first token on the span"""
+
+    def __init__(self, span, config: dict):
+        self.span = span
+        self.config = config
+        self.chunks: List[str] = []
+        self._start = time.perf_counter()
+
+    def add(self, chunk: str):
+        if not self.chunks:
+            self.span.set(first_token_ms=round((time.perf_counter() - self._start) * 1000, 3))
+        self.chunks.append(chunk)
+
+
+class _Rejected(Exception):
+    """Raised by a guardrail stage to stop the concurrent stages of a request"""
+
+    def __init__(self, verdict: dict):
+        super().__init__(verdict["message"])
+        self.verdict = verdict
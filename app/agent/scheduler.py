@@ -0,0 +1,115 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.rag.vector_store import is_rate_limit_error
+
+# Default per-minute limits (override with GROQ_RPM / GROQ_TPM / VOYAGE_RPM / VOYAGE_TPM)
+GROQ_REQUESTS_PER_MINUTE = 30  # llama-3.3-70b-versatile, free tier
+GROQ_TOKENS_PER_MINUTE = 12_000
+VOYAGE_REQUESTS_PER_MINUTE = 2_000  # voyage-3, tier 1
+VOYAGE_TOKENS_PER_MINUTE = 3_000_000
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at rate_per_minute.
+
+    Starts full (a minute's worth of burst). Waiters are served in arrival order; an
+    amount larger than the bucket waits for a full bucket and leaves it negative, so
+    the calls after it wait for the overdraft to refill. Tokens given back by adjust()
+    wake the waiting call right away.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = float(rate_per_minute)
+        self.level = self.capacity
+        self.consumed = 0.0
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._returned = asyncio.Event()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until amount is available, then take it"""
+        async with self._lock:
+            self._refill()
+            needed = min(amount, self.capacity)
+            while self.level < needed:
+                self._returned.clear()
+                start = time.monotonic()
+                try:
+                    await asyncio.wait_for(self._returned.wait(), (needed - self.level) / self.rate)
+                except asyncio.TimeoutError:
+                    pass
+                self.waited += time.monotonic() - start
+                self._refill()
+            self.level -= amount
+            self.consumed += amount
+
+    def adjust(self, amount: float):
+        """Take (or give back, when negative) the difference between an estimate and the actual usage"""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+        self.consumed += amount
+        if amount < 0:
+            self._returned.set()
+
+
+class ProviderLimiter:
+    """Request and token buckets of one provider API key (None: no limit)"""
+
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.calls = 0
+        self.token_count = 0
+        self.retries = 0
+
+    async def acquire(self, tokens: int, requests: int = 1):
+        """Wait for the provider budget of a call (estimated tokens)"""
+        self.calls += requests
+        self.token_count += tokens
+        if self.requests is not None:
+            await self.requests.acquire(requests)
+        if self.tokens is not None:
+            await self.tokens.acquire(tokens)
+
+    def adjust(self, tokens: int):
+        """Correct the token budget once the actual usage of a call is known"""
+        self.token_count += tokens
+        if self.tokens is not None and tokens:
+            self.tokens.adjust(tokens)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], tokens: int, requests: int = 1,
+                   max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0) -> Any:
+        """
+        Await fn() within the provider budget, retrying with exponential backoff and jitter
+        on rate limit errors (each retry takes its budget again: the rejected call counted too)
+        """
+        for attempt in range(max_retries + 1):
+            await self.acquire(tokens, requests)
+            try:
+                return await fn()
+            except Exception as e:
+                if attempt == max_retries or not is_rate_limit_error(e):
+                    raise
+                self.retries += 1
+                delay = min(max_delay, base_delay * 2 ** attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.calls,
+            "tokens": self.token_count,
+            "throttled_seconds": sum(bucket.waited for bucket in (self.requests, self.tokens) if bucket),
+            "retries": self.retries,
+        }
@@ -1,49 +1,101 @@
 from rag.vector_store import VectorStoreHandler
-from rag.document_processor import DocumentProcessor
-from rag.loader import MarketingDataLoader
+from rag.document_processor import CHUNKING_MODES, DocumentProcessor
+from rag.loader import PARTITION_KEY, MarketingDataLoader
+from rag.manifest import IndexManifest
+from rag.lexical_index import LexicalIndex
+from rag.partitions import PartitionRegistry
+from rag.tracing import get_tracer
 from dotenv import load_dotenv
 from tqdm import tqdm
+import argparse
 import os
 
-def main():
+def main(full: bool = False, chunking: str = None, partitions: list = None):
     load_dotenv()
-    
+
     # Initialize components
-    data_loader = MarketingDataLoader(data_dir=r"C:\Users\PedroMiyasaki\OneDrive - DHAUZ\Área de Trabalho\Projetos\PESSOAL\arag_marketing\data\processed")
+    data_loader = MarketingDataLoader(
+        data_dir=r"C:\Users\PedroMiyasaki\OneDrive - DHAUZ\Área de Trabalho\Projetos\PESSOAL\arag_marketing\data\processed",
+        partition_depth=int(os.getenv("PARTITION_DEPTH", "1"))  # category levels per index partition
+    )
     document_processor = DocumentProcessor(
         chunk_size=500,  # Smaller chunks for better context
-        chunk_overlap=50
+        chunk_overlap=50,
+        mode=chunking or os.getenv("CHUNKING_MODE", "recursive"),  # "markdown": heading-aware, token budget
+        max_tokens=int(os.getenv("CHUNK_MAX_TOKENS", "256"))
     )
     vector_store = VectorStoreHandler(index_name=os.getenv("INDEX_NAME"))
-    
-    # Load all documents (no specific campaign)
-    print("Loading documents...")
-    documents = data_loader.load_campaign_data()
-    
-    if not documents:
-        print("No documents found in processed directory!")
-        return
-        
-    print(f"Found {len(documents)} documents")
-    
-    # Process documents
-    print("Processing documents...")
-    processed_docs = document_processor.process_documents(
-        documents=[doc['content'] for doc in documents],
-        metadatas=[doc['metadata'] for doc in documents]
+    manifest = IndexManifest(
+        path=os.getenv("INDEX_MANIFEST_PATH", str(data_loader.data_dir.parent / "index_manifest.json")),
+        index_name=vector_store.index_name
     )
-    
-    print(f"Created {len(processed_docs)} chunks")
-    
-    # Add to vector store
-    print("Adding to vector store...")
-    for doc in tqdm(processed_docs, desc="Indexing"):
-        vector_store.add_texts(
-            texts=[doc.page_content],
-            metadatas=[doc.metadata]
-        )
-    
+    registry = PartitionRegistry(os.getenv("PARTITIONS_PATH", str(data_loader.data_dir.parent / "partitions.json")))
+    lexical_path = os.getenv("LEXICAL_INDEX_PATH", str(data_loader.data_dir.parent / "lexical_index"))
+
+    tracer = get_tracer()
+    with tracer.trace("index_documents", full=full, partitions=partitions):
+        # Full rebuild: start from an empty index and manifest
+        if full:
+            print("Deleting all vectors for a full reindex...")
+            with tracer.span("delete_all"):
+                vector_store.delete_all(manifest)
+
+        # Load and split documents lazily (only the files of the given partitions, if any)
+        print("Loading and processing documents...")
+        with tracer.span("load_and_split") as span:
+            processed_docs = list(document_processor.iter_chunks(data_loader.iter_campaign_data(partitions=partitions)))
+            span.set(chunks=len(processed_docs))
+
+        if not processed_docs and not partitions:
+            print("No documents found in processed directory!")
+            return
+
+        print(f"Created {len(processed_docs)} chunks")
+
+        # Upsert only new or changed chunks (batched, concurrent) and drop removed ones
+        print("Syncing vector store...")
+        with tracer.span("sync") as span, tqdm(desc="Indexing", unit="chunk") as progress_bar:
+            stats = vector_store.sync_documents(
+                processed_docs,
+                manifest,
+                partitions=partitions,
+                max_workers=4,
+                progress=progress_bar.update
+            )
+            span.set(**stats, embedding_cache=vector_store.embeddings.stats())
+        with tracer.span("save"):
+            registry.update(processed_docs, partitions)
+            registry.save()
+
+        # Rebuild the BM25 index over all current chunks (used by hybrid retrieval);
+        # a partial run keeps the chunks of the other partitions from the previous index
+        print("Building lexical index...")
+        with tracer.span("lexical_index") as span:
+            lexical_docs = processed_docs
+            if partitions and LexicalIndex.exists(lexical_path):
+                kept = (doc for doc in LexicalIndex.load(lexical_path).documents() if doc.metadata.get(PARTITION_KEY) not in partitions)
+                lexical_docs = [*kept, *processed_docs]
+            lexical_index = LexicalIndex.build(lexical_docs)
+            lexical_index.save(lexical_path)
+            # Readers reload the snapshot on the next generation change: bump it once the snapshot is complete
+            vector_store.generation.bump()
+            span.set(chunks=lexical_index.count, terms=len(lexical_index.vocabulary))
+
+        print(f"Added {stats['added']}, deleted {stats['deleted']}, unchanged {stats['unchanged']} chunks")
+        print(f"Partitions: {', '.join(partitions or registry.names)}")
+        print(f"Indexed {stats['chunks']} chunks in {stats['seconds']:.1f}s ({stats['chunks_per_sec']:.1f} chunks/sec)")
+        print(f"Embedding cache: {vector_store.embeddings.stats()}")
+        print(f"Lexical index: {lexical_index.count} chunks, {len(lexical_index.vocabulary)} terms")
     print("Indexing complete!")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Index processed marketing documents")
+    parser.add_argument("--full", action="store_true", help="Delete everything and reindex the whole corpus")
+    parser.add_argument("--chunking", choices=CHUNKING_MODES, help="Chunking mode (defaults to CHUNKING_MODE, then recursive)")
+    parser.add_argument("--partition", action="append", dest="partitions",
+                        help="Only reindex this partition (e.g. lancamentos); can be repeated")
+    args = parser.parse_args()
+    if args.full and args.partitions:
+        parser.error("--full reindexes every partition; use --partition alone for a partial run")
+
+    main(full=args.full, chunking=args.chunking, partitions=args.partitions)
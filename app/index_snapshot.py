@@ -0,0 +1,51 @@
+from rag.vector_store import VectorStoreHandler
+from rag.snapshot import QUANTIZATIONS
+from dotenv import load_dotenv
+from tqdm import tqdm
+import argparse
+import os
+
+DEFAULT_SNAPSHOT_PATH = "data/index_snapshot.npz"
+
+def export(path: str, quantization: str, workers: int):
+    """Write every vector of the index to a snapshot file (no embedding calls)"""
+    vector_store = VectorStoreHandler(index_name=os.getenv("INDEX_NAME"))
+    with tqdm(desc="Exporting", unit="vector") as progress_bar:
+        stats = vector_store.export_snapshot(path, quantization, max_workers=workers, progress=progress_bar.update)
+
+    print(f"Exported {stats['vectors']} vectors to {path} in {stats['seconds']:.1f}s")
+    if stats["vectors"]:
+        print(f"Snapshot size: {stats['bytes'] / 1e6:.2f} MB ({stats['bytes'] / stats['vectors']:.0f} bytes/vector, "
+              f"float32 vectors alone: {stats['float32_bytes'] / 1e6:.2f} MB)")
+
+def restore(path: str, workers: int):
+    """Bulk-upsert a snapshot into the index (e.g. after delete_all or into a new index)"""
+    vector_store = VectorStoreHandler(index_name=os.getenv("INDEX_NAME"))
+    with tqdm(desc="Restoring", unit="vector") as progress_bar:
+        stats = vector_store.restore_snapshot(path, max_workers=workers, progress=progress_bar.update)
+    vector_store.save()
+
+    print(f"Restored {stats['vectors']} vectors in {stats['batches']} batches, {stats['seconds']:.1f}s "
+          f"({stats['vectors_per_sec']:.1f} vectors/sec)")
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Export or restore a compact snapshot of the vector index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write every vector, ID and metadata to a snapshot file")
+    export_parser.add_argument("--output", default=os.getenv("INDEX_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH))
+    export_parser.add_argument("--quantization", choices=QUANTIZATIONS, default="int8",
+                               help="int8: 1 byte per dimension + a scale per vector; float16: 2 bytes per dimension")
+    export_parser.add_argument("--workers", type=int, default=8, help="Concurrent fetch requests")
+
+    restore_parser = subparsers.add_parser("restore", help="Bulk-upsert a snapshot without re-embedding")
+    restore_parser.add_argument("--input", default=os.getenv("INDEX_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH))
+    restore_parser.add_argument("--workers", type=int, default=8, help="Concurrent upsert batches")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export(args.output, args.quantization, args.workers)
+    else:
+        restore(args.input, args.workers)
@@ -1,9 +1,23 @@
 import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.hyperlink import Hyperlink
+from docx.text.paragraph import Paragraph
 from tqdm import tqdm
 
+MANIFEST_FILE = '.preprocess_manifest.json'
+
+# WordprocessingML tags read directly by the converter
+W_R, W_T, W_TAB, W_BR, W_CR, W_HYPERLINK = (qn(tag) for tag in ('w:r', 'w:t', 'w:tab', 'w:br', 'w:cr', 'w:hyperlink'))
+
 class DataPreProcessor:
     def __init__(self, raw_data_dir: str, processed_data_dir: str):
         self.raw_data_dir = Path(raw_data_dir)
@@ -35,44 +49,151 @@ class DataPreProcessor:
             return ' > '.join(self.clean_title(part) for part in parts)
         return "General"
     
-    def docx_to_markdown(self, docx_path: Path) -> str:
-        """Convert DOCX content to markdown format"""
+    def _run_text(self, r) -> str:
+        """Text of a w:r element (direct child scan instead of an XPath query per run)"""
+        parts = []
+        for child in r:
+            if child.tag == W_T:
+                parts.append(child.text or '')
+            elif child.tag == W_TAB:
+                parts.append('\t')
+            elif child.tag in (W_BR, W_CR):
+                parts.append('\n')
+        return ''.join(parts)
+    
+    def _runs_to_markdown(self, paragraph: Paragraph) -> Tuple[str, str]:
+        """
+        Build a paragraph's markdown in one pass over its runs, merging adjacent runs
+        with the same formatting. Returns (markdown, plain text).
+        """
+        segments = []  # [pieces, (bold, italic)]
+        plain = []
+        for child in paragraph._p:
+            if child.tag == W_R:
+                text = self._run_text(child)
+                r_pr = child.rPr
+                bold = r_pr is not None and r_pr.b is not None and r_pr.b.val
+                italic = r_pr is not None and r_pr.i is not None and r_pr.i.val
+                style = (bool(bold), bool(italic))
+                plain.append(text)
+            elif child.tag == W_HYPERLINK:
+                link = Hyperlink(child, paragraph)
+                plain.append(link.text)
+                text = f"[{link.text}]({link.url})" if link.url else link.text
+                style = (False, False)
+            else:
+                continue
+            if not text:
+                continue
+            if segments and segments[-1][1] == style:
+                segments[-1][0].append(text)
+            else:
+                segments.append(([text], style))
+        
+        parts = []
+        for pieces, (bold, italic) in segments:
+            text = ''.join(pieces)
+            marker = '***' if bold and italic else '**' if bold else '*' if italic else ''
+            stripped = text.strip()
+            if marker and stripped:
+                # Keep surrounding whitespace outside the markers
+                leading = text[:len(text) - len(text.lstrip())]
+                trailing = text[len(text.rstrip()):]
+                parts.append(f"{leading}{marker}{stripped}{marker}{trailing}")
+            else:
+                parts.append(text)
+        return ''.join(parts), ''.join(plain)
+    
+    def _list_prefix(self, paragraph: Paragraph, style_name: str) -> Optional[str]:
+        """Markdown list marker for list paragraphs (None for regular paragraphs)"""
+        p_pr = paragraph._p.pPr
+        num_pr = p_pr.numPr if p_pr is not None else None
+        if num_pr is None and not style_name.startswith('List'):
+            return None
+        
+        level = 0
+        if num_pr is not None and num_pr.ilvl is not None:
+            level = num_pr.ilvl.val
+        elif style_name[-1:].isdigit():
+            level = int(style_name[-1]) - 1
+        marker = '1.' if 'Number' in style_name else '-'
+        return f"{'  ' * level}{marker} "
+    
+    def _table_to_markdown(self, table: Table) -> str:
+        """Convert a table to a markdown pipe table (first row as header)"""
+        rows = [
+            [cell.text.strip().replace('|', '\\|').replace('\n', '<br>') for cell in row.cells]
+            for row in table.rows
+        ]
+        if not rows:
+            return ''
+        width = max(len(row) for row in rows)
+        rows = [row + [''] * (width - len(row)) for row in rows]
+        lines = [f"| {' | '.join(rows[0])} |", f"|{'---|' * width}"]
+        lines.extend(f"| {' | '.join(row)} |" for row in rows[1:])
+        return '\n'.join(lines) + '\n'
+    
+    def iter_markdown(self, docx_path: Path) -> Iterator[str]:
+        """
+        Convert DOCX content to markdown, yielding one block (paragraph, list item
+        or table) at a time in document order
+        """
         try:
             # Try opening with python-docx
             doc = Document(str(docx_path))  # Convert Path to string explicitly
-            markdown_content = []
-            
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    # Handle different heading levels
-                    if paragraph.style.name.startswith('Heading'):
-                        level = paragraph.style.name[-1]  # Get heading level
-                        markdown_content.append(f"{'#' * int(level)} {paragraph.text}\n")
-                    else:
-                        # Handle text formatting
-                        text = paragraph.text
-                        if paragraph.runs:
-                            for run in paragraph.runs:
-                                if run.bold:
-                                    text = text.replace(run.text, f"**{run.text}**")
-                                if run.italic:
-                                    text = text.replace(run.text, f"*{run.text}*")
-                        
-                        markdown_content.append(f"{text}\n")
-            
-            # Add extra newline between paragraphs
-            return "\n".join(markdown_content)
-        
         except Exception as e:
             # Fallback: Try reading as plain text
             try:
                 with open(docx_path, 'r', encoding='utf-8', errors='ignore') as f:
-
-                    content = f.read()
-                    return content
-                
+                    yield f.read()
+                return
             except Exception as e2:
                 raise Exception(f"Failed to process file: {str(e)} and fallback also failed: {str(e2)}")
+        
+        # Resolve style names once instead of searching the styles part per paragraph
+        style_names = {style.style_id: style.name for style in doc.styles}
+        default_style = doc.styles.default(WD_STYLE_TYPE.PARAGRAPH)
+        default_style_name = default_style.name if default_style is not None else ''
+        
+        in_list = False
+        for block in doc.iter_inner_content():
+            prefix = None
+            if isinstance(block, Table):
+                markdown = self._table_to_markdown(block)
+            else:
+                style_id = block._p.style
+                style_name = style_names.get(style_id, '') if style_id else default_style_name
+                markdown, text = self._runs_to_markdown(block)
+                if not text.strip():
+                    continue
+                if style_name.startswith('Heading'):
+                    # Handle different heading levels
+                    level = style_name[-1]
+                    markdown = f"{'#' * (int(level) if level.isdigit() else 1)} {text}\n"
+                else:
+                    prefix = self._list_prefix(block, style_name)
+                    markdown = f"{prefix or ''}{markdown}\n"
+            
+            # List items stay together, other blocks are separated by a blank line
+            if in_list and prefix is None:
+                yield '\n'
+            in_list = prefix is not None
+            yield markdown if in_list else markdown + '\n'
+    
+    def docx_to_markdown(self, docx_path: Path) -> str:
+        """Convert DOCX content to markdown format"""
+        return ''.join(self.iter_markdown(docx_path))
+    
+    def _frontmatter(self, file_path: Path, file_title: str, hierarchy_title: str) -> str:
+        """Metadata as YAML frontmatter"""
+        return f"""---
+title: {file_title}
+category: {hierarchy_title}
+source_file: {file_path.name}
+source_path: {str(file_path.relative_to(self.raw_data_dir))}
+---
+
+"""
     
     def process_file(self, file_path: Path) -> Dict[str, str]:
         """Process individual file and convert to markdown"""
@@ -85,15 +206,7 @@ class DataPreProcessor:
                 markdown_content = self.docx_to_markdown(file_path)
                 
                 # Add metadata as YAML frontmatter
-                processed_content = f"""---
-title: {file_title}
-category: {hierarchy_title}
-source_file: {file_path.name}
-source_path: {str(file_path.relative_to(self.raw_data_dir))}
----
-
-{markdown_content}
-"""
+                processed_content = self._frontmatter(file_path, file_title, hierarchy_title) + markdown_content
                 return {
                     'content': processed_content,
                     'title': file_title,
@@ -106,37 +219,137 @@ source_path: {str(file_path.relative_to(self.raw_data_dir))}
         
         return None
     
-    def process_directory(self):
-        """Process all files in the raw data directory"""
+    def _file_hash(self, file_path: Path) -> str:
+        """SHA-256 of a source file"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def _process_and_save(self, file_path: Path) -> Optional[Dict[str, Any]]:
+        """Convert one file, streaming its markdown to disk, and return its manifest entry"""
+        if file_path.suffix.lower() != '.docx':
+            return None
+        
+        stat = file_path.stat()
+        hierarchy_title = self.get_hierarchy_title(file_path)
+        file_title = self.clean_title(file_path.name)
+        
+        # Create category-based directory structure
+        category_path = self.processed_data_dir / hierarchy_title.replace(' > ', '/')
+        category_path.mkdir(parents=True, exist_ok=True)
+        
+        # Save as markdown file, block by block (replaced only once complete)
+        output_path = category_path / f"{file_title}.md"
+        tmp_path = output_path.with_suffix('.md.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self._frontmatter(file_path, file_title, hierarchy_title))
+                for block in self.iter_markdown(file_path):
+                    f.write(block)
+            tmp_path.replace(output_path)
+        except Exception as e:
+            print(f"Error processing {file_path}: {str(e)}")
+            tmp_path.unlink(missing_ok=True)
+            return None
+        
+        return {
+            'original_path': str(file_path),
+            'processed_path': str(output_path),
+            'category': hierarchy_title,
+            'title': file_title,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha256': self._file_hash(file_path)
+        }
+    
+    def _is_unchanged(self, file_path: Path, entry: Dict[str, Any]) -> bool:
+        """Check a source file against its manifest entry (mtime/size first, then content hash)"""
+        if not Path(entry['processed_path']).exists():
+            return False
+        stat = file_path.stat()
+        if stat.st_mtime == entry['mtime'] and stat.st_size == entry['size']:
+            return True
+        if stat.st_size == entry['size'] and self._file_hash(file_path) == entry['sha256']:
+            # Touched but identical: remember the new mtime to skip hashing next time
+            entry['mtime'] = stat.st_mtime
+            return True
+        return False
+    
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        manifest_path = self.processed_data_dir / MANIFEST_FILE
+        if not manifest_path.exists():
+            return {}
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _save_manifest(self, entries: Dict[str, Dict[str, Any]]):
+        with open(self.processed_data_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=1)
+    
+    def process_directory(self, workers: int = 1, incremental: bool = False):
+        """
+        Process all files in the raw data directory
+        
+        Args:
+            workers (int): Number of worker processes (1 processes files in this process).
+            incremental (bool): Skip files unchanged since the previous run and remove
+                outputs whose sources were deleted; a file that fails to convert keeps
+                its previous output.
+        """
         # Create processed directory if it doesn't exist
         self.processed_data_dir.mkdir(parents=True, exist_ok=True)
         
         # Get all files recursively
         all_files = list(self.raw_data_dir.rglob('*'))
-        files_to_process = [f for f in all_files if f.is_file() and f.suffix.lower() == '.docx']
+        files = [f for f in all_files if f.is_file() and f.suffix.lower() == '.docx']
         
-        processed_files = []
+        # Reuse manifest entries of unchanged files
+        previous = self._load_manifest() if incremental else {}
+        entries = {}
+        files_to_process = []
+        for file_path in files:
+            key = str(file_path.relative_to(self.raw_data_dir))
+            if key in previous and self._is_unchanged(file_path, previous[key]):
+                entries[key] = previous[key]
+            else:
+                files_to_process.append(file_path)
         
-        for file_path in tqdm(files_to_process, desc="Processing files"):
-            result = self.process_file(file_path)
-            if result:
-                # Create category-based directory structure
-                category_path = self.processed_data_dir / result['category'].replace(' > ', '/')
-                category_path.mkdir(parents=True, exist_ok=True)
-                
-                # Save as markdown file
-                output_path = category_path / f"{result['title']}.md"
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(result['content'])
-                
-                processed_files.append({
-                    'original_path': str(file_path),
-                    'processed_path': str(output_path),
-                    'category': result['category'],
-                    'title': result['title']
-                })
-        
-        # Create index file
+        if incremental:
+            print(f"Skipping {len(entries)} unchanged files, processing {len(files_to_process)}")
+        
+        if workers > 1 and len(files_to_process) > 1:
+            # Convert files in a pool of worker processes
+            chunksize = max(1, len(files_to_process) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(tqdm(
+                    executor.map(self._process_and_save, files_to_process, chunksize=chunksize),
+                    total=len(files_to_process),
+                    desc="Processing files"
+                ))
+        else:
+            results = [self._process_and_save(f) for f in tqdm(files_to_process, desc="Processing files")]
+        
+        for file_path, entry in zip(files_to_process, results):
+            key = str(file_path.relative_to(self.raw_data_dir))
+            if entry:
+                entries[key] = entry
+            elif key in previous:
+                # Failed conversion: keep serving the previous output (its stale stats retry it next run)
+                entries[key] = previous[key]
+        
+        # Remove outputs whose sources were deleted (unless another source writes the same file)
+        current_sources = {str(file_path.relative_to(self.raw_data_dir)) for file_path in files}
+        current_outputs = {entry['processed_path'] for entry in entries.values()}
+        for key, entry in previous.items():
+            if key not in current_sources and entry['processed_path'] not in current_outputs:
+                Path(entry['processed_path']).unlink(missing_ok=True)
+        
+        self._save_manifest(entries)
+        
+        # Create index file from the merged (skipped + processed) results
+        processed_files = [entries[key] for key in sorted(entries)]
         self._create_index_file(processed_files)
         
         return processed_files
@@ -166,7 +379,7 @@ source_path: {str(file_path.relative_to(self.raw_data_dir))}
         with open(self.processed_data_dir / 'index.md', 'w', encoding='utf-8') as f:
             f.write(index_content)
 
-def main():
+def main(workers: int = 1, incremental: bool = False):
     # Initialize preprocessor
     preprocessor = DataPreProcessor(
         raw_data_dir="data/raw",
@@ -174,10 +387,15 @@ def main():
     )
     
     # Process all files
-    processed_files = preprocessor.process_directory()
+    processed_files = preprocessor.process_directory(workers=workers, incremental=incremental)
     
     print(f"\nProcessed {len(processed_files)} files")
     print(f"Results saved in {preprocessor.processed_data_dir}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Convert raw DOCX files to markdown")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--incremental", action="store_true", help="Only convert new or changed files")
+    args = parser.parse_args()
+    
+    main(workers=args.workers, incremental=args.incremental)
@@ -1,20 +1,42 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
+from .loader import CATEGORY_SEPARATOR
+from .text_utils import estimate_tokens
+import re
+
+CHUNKING_MODES = ("recursive", "markdown")
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.+?)\s*#*\s*$')
+_SENTENCE_END = re.compile(r'(?<=[.!?:;])\s+|\n')
+
 
 class DocumentProcessor:
     def __init__(
         self,
         chunk_size: int = 500,
-        chunk_overlap: int = 50
+        chunk_overlap: int = 50,
+        mode: str = "recursive",
+        max_tokens: int = 256
     ):
+        """
+        Args:
+            chunk_size (int): Maximum characters per chunk ("recursive" mode).
+            chunk_overlap (int): Characters repeated between consecutive chunks ("recursive" mode).
+            mode (str): "recursive" (character splitter) or "markdown" (heading-aware, token budget).
+            max_tokens (int): Token budget of a chunk ("markdown" mode).
+        """
+        if mode not in CHUNKING_MODES:
+            raise ValueError(f"Unknown chunking mode: {mode}")
+        self.mode = mode
+        self.max_tokens = max_tokens
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
             length_function=len,
             separators=["\n\n", "\n", " ", ""]
         )
-    
+
     def process_documents(
         self,
         documents: List[str],
@@ -25,10 +47,134 @@ class DocumentProcessor:
         """
         if metadatas is None:
             metadatas = [{} for _ in documents]
-            
+
         docs = [
             Document(page_content=text, metadata=metadata)
             for text, metadata in zip(documents, metadatas)
         ]
-        
-        return self.text_splitter.split_documents(docs) 
+
+        return self.split_documents(docs)
+
+    def iter_chunks(self, documents: Iterable[Dict[str, Any]]) -> Iterator[Document]:
+        """
+        Split loaded documents ({'content', 'metadata'} dicts) one at a time,
+        so only the current document is held in memory
+        """
+        for document in documents:
+            yield from self.split_documents(
+                [Document(page_content=document['content'], metadata=document['metadata'])]
+            )
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Split documents with the configured mode"""
+        if self.mode == "markdown":
+            return [chunk for document in documents for chunk in self.split_markdown(document.page_content, document.metadata)]
+        return self.text_splitter.split_documents(documents)
+
+    def split_markdown(self, text: str, metadata: Dict[str, Any] = None) -> List[Document]:
+        """
+        Split markdown on its heading hierarchy, then pack blocks up to max_tokens
+
+        Single pass over the lines: a heading closes the current chunk, and blocks
+        (paragraphs, runs of list items, tables, code fences) are packed while they fit
+        the token budget. A block larger than the budget is cut at sentence, then word
+        boundaries. Headings without body are carried into the next chunk.
+
+        Every chunk gets a section_path metadata field with its heading path
+        (e.g. "Lançamento > Etapa 2"; "" before the first heading).
+        """
+        metadata = metadata or {}
+        chunks: List[Document] = []
+        path: List[str] = []
+        pending: List[Tuple[int, str]] = []  # headings waiting for their first block
+        parts: List[str] = []
+        state = {"tokens": 0, "section": ""}
+
+        def close_chunk():
+            if parts:
+                chunks.append(Document(
+                    page_content="\n\n".join(parts),
+                    metadata={**metadata, "section_path": state["section"]}
+                ))
+                parts.clear()
+                state["tokens"] = 0
+
+        def add_piece(piece: str, tokens: int):
+            if parts and state["tokens"] + tokens > self.max_tokens:
+                close_chunk()
+            if not parts and pending:
+                parts.extend(line for _, line in pending)
+                state["tokens"] = sum(estimate_tokens(line) for _, line in pending)
+                pending.clear()
+            parts.append(piece)
+            state["tokens"] += tokens
+
+        def add_block(lines: List[str]):
+            block = "\n".join(lines).strip()
+            if not block:
+                return
+            # Pending headings open the chunk of the block, so they share its budget
+            # (at most half of it, so a run of long headings cannot shred the block)
+            budget = max(self.max_tokens - sum(estimate_tokens(line) for _, line in pending), self.max_tokens // 2)
+            tokens = estimate_tokens(block)
+            if tokens <= budget:
+                add_piece(block, tokens)
+                return
+            for piece in self._split_block(block, budget):
+                add_piece(piece, estimate_tokens(piece))
+
+        block: List[str] = []
+        in_fence = False
+        for line in text.splitlines():
+            if line.lstrip().startswith("```"):
+                in_fence = not in_fence
+                block.append(line)
+                continue
+            if in_fence:
+                block.append(line)
+                continue
+
+            heading = _HEADING.match(line)
+            if heading:
+                add_block(block)
+                block = []
+                close_chunk()
+                level = len(heading.group(1))
+                path[level - 1:] = [heading.group(2).strip()]
+                # A heading replaces pending headings of the same or a deeper level
+                pending[:] = [(pending_level, pending_line) for pending_level, pending_line in pending if pending_level < level]
+                pending.append((level, line.strip()))
+                state["section"] = CATEGORY_SEPARATOR.join(path)
+            elif line.strip():
+                block.append(line)
+            elif block:
+                add_block(block)
+                block = []
+
+        add_block(block)
+        close_chunk()
+        return chunks
+
+    def _split_block(self, block: str, max_tokens: int) -> List[str]:
+        """Cut an oversized block into pieces within max_tokens at sentence, then word boundaries"""
+        max_chars = max(1, (max_tokens - 1) * 3)
+        pieces, current = [], ""
+        for sentence in _SENTENCE_END.split(block):
+            if not sentence:
+                continue
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                pieces.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            pieces.append(current)
+        return pieces
@@ -0,0 +1,188 @@
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from array import array
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+import threading
+import asyncio
+import hashlib
+import sqlite3
+import os
+
+from .tracing import get_tracer
+
+DEFAULT_CACHE_PATH = ".cache/embeddings.sqlite"
+SQLITE_MAX_PARAMS = 500  # keys per SELECT ... IN (...) lookup
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with an in-memory LRU in front of a persistent SQLite store.
+
+    Entries are keyed by model name, input type (document/query) and the content
+    hash, so switching models never returns stale vectors. Cache misses of a call
+    are embedded together in a single provider request.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache_path: Optional[str] = DEFAULT_CACHE_PATH, max_memory_items: int = 10_000):
+        """
+        Args:
+            embeddings: The underlying embeddings provider.
+            model_name (str): Model identifier, part of every cache key.
+            cache_path (str): SQLite file for the persistent cache (None keeps it in memory only).
+            max_memory_items (int): Size of the in-memory LRU.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self._memory: "OrderedDict[str, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "provider_calls": 0}
+        self._inflight: Dict[tuple, "asyncio.Future[array]"] = {}
+
+        self._db = None
+        if cache_path:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)")
+            self._db.commit()
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, array]:
+        """Find cached vectors, first in memory then on disk"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self._counters["memory_hits"] += len(found)
+
+            missing = [key for key in keys if key not in found]
+            if self._db is not None and missing:
+                for i in range(0, len(missing), SQLITE_MAX_PARAMS):
+                    batch = missing[i:i + SQLITE_MAX_PARAMS]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f")
+                        vector.frombytes(blob)
+                        found[key] = vector
+                        self._remember(key, vector)
+                        self._counters["disk_hits"] += 1
+        return found
+
+    def _remember(self, key: str, vector: array):
+        """Insert into the LRU, evicting the least recently used entries (lock held)"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _store(self, entries: Dict[str, array]):
+        with self._lock:
+            self._counters["misses"] += len(entries)
+            self._counters["provider_calls"] += 1
+            for key, vector in entries.items():
+                self._remember(key, vector)
+            if self._db is not None:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    [(key, self.model_name, vector.tobytes()) for key, vector in entries.items()]
+                )
+                self._db.commit()
+
+    def _missing_texts(self, texts: List[str], keys: List[str], found: Dict[str, array]) -> Dict[str, str]:
+        """Unique texts (by key) that still need the provider"""
+        return {key: text for key, text in zip(keys, texts) if key not in found}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed search docs, calling the provider once for all cache misses"""
+        keys = [self._key("document", text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = self._missing_texts(texts, keys, found)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            entries = {key: array("f", vector) for key, vector in zip(missing, vectors)}
+            self._store(entries)
+            found.update(entries)
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text"""
+        key = self._key("query", text)
+        with get_tracer().span("embed_query") as span:
+            found = self._lookup([key])
+            span.set(cache_hit=key in found)
+            if key not in found:
+                found[key] = array("f", self.embeddings.embed_query(text))
+                self._store({key: found[key]})
+        return found[key].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Asynchronously embed search docs"""
+        keys = [self._key("document", text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing = self._missing_texts(texts, keys, found)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            entries = {key: array("f", vector) for key, vector in zip(missing, vectors)}
+            self._store(entries)
+            found.update(entries)
+
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Asynchronously embed query text
+
+        Concurrent calls for the same query (e.g. a guardrail and the retriever of one
+        request) share a single provider call.
+        """
+        key = self._key("query", text)
+        with get_tracer().span("embed_query") as span:
+            found = self._lookup([key])
+            span.set(cache_hit=key in found)
+            if key in found:
+                return found[key].tolist()
+
+            inflight_key = (asyncio.get_running_loop(), key)
+            pending = self._inflight.get(inflight_key)
+            span.set(shared=pending is not None)
+            if pending is None:
+                pending = asyncio.ensure_future(self._aembed_and_store(key, text))
+                self._inflight[inflight_key] = pending
+                pending.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+            return (await asyncio.shield(pending)).tolist()
+
+    async def _aembed_and_store(self, key: str, text: str) -> array:
+        vector = array("f", await self.embeddings.aembed_query(text))
+        self._store({key: vector})
+        return vector
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters since startup"""
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def voyage_embeddings(model: str = "voyage-3", cache_path: Optional[str] = None) -> CachedEmbeddings:
+    """VoyageAI embeddings behind the shared persistent cache (EMBEDDING_CACHE_PATH)"""
+    from langchain_voyageai import VoyageAIEmbeddings
+
+    return CachedEmbeddings(
+        VoyageAIEmbeddings(voyage_api_key=os.getenv("VOYAGE_API_KEY"), model=model),
+        model_name=model,
+        cache_path=cache_path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+    )
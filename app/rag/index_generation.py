@@ -0,0 +1,51 @@
+from pathlib import Path
+import threading
+import uuid
+import os
+
+DEFAULT_GENERATION_DIR = ".cache/index_generation"
+
+
+class IndexGeneration:
+    """
+    Stamp file changed on every write to an index.
+
+    Readers (e.g. the answer cache of the Streamlit process) compare the stamp with
+    the one they saw before to find out that the index was updated, even when the
+    write happened in another process (index_documents.py).
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file_id = None
+        self._stamp = ""
+
+    @classmethod
+    def for_index(cls, index_name: str, directory: str = None) -> "IndexGeneration":
+        """Stamp of an index, stored under INDEX_GENERATION_DIR (defaults to .cache/index_generation)"""
+        directory = directory or os.getenv("INDEX_GENERATION_DIR", DEFAULT_GENERATION_DIR)
+        return cls(os.path.join(directory, index_name or "default"))
+
+    def current(self) -> str:
+        """Current stamp ("" until the index is written); only re-reads the file when it changed"""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return ""
+        # bump() replaces the file, so the inode changes even when the mtime resolution is coarse
+        file_id = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if file_id != self._file_id:
+                self._stamp = self.path.read_text(encoding="utf-8").strip()
+                self._file_id = file_id
+            return self._stamp
+
+    def bump(self) -> str:
+        """Write a new stamp (atomically)"""
+        stamp = uuid.uuid4().hex
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{stamp}.tmp")
+        tmp_path.write_text(stamp, encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        return stamp
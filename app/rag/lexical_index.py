@@ -0,0 +1,345 @@
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+from pathlib import Path
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from langchain.schema import Document
+from pydantic import ConfigDict, Field
+from .index_generation import IndexGeneration
+from .local_index import match_filter
+from .text_utils import fold_accents
+import numpy as np
+import json
+import math
+import re
+import threading
+
+DEFAULT_LEXICAL_INDEX_PATH = "data/lexical_index"
+
+OFFSETS_FILE = "offsets.npy"  # start of each term's postings (vocabulary size + 1)
+POSTING_DOCS_FILE = "posting_docs.npy"  # document of each posting, grouped by term
+POSTING_TFS_FILE = "posting_tfs.npy"  # term frequency of each posting
+DOC_LENGTHS_FILE = "doc_lengths.npy"  # tokens per document
+TEXTS_FILE = "texts.npy"  # UTF-8 bytes of all chunk texts, concatenated
+TEXT_OFFSETS_FILE = "text_offsets.npy"  # start of each chunk text (documents + 1)
+LEXICON_FILE = "lexicon.json"  # vocabulary, chunk IDs and metadata
+
+# Portuguese stopwords (accent-folded)
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "uns", "umas", "de", "do", "da", "dos", "das", "em", "no", "na",
+    "nos", "nas", "ao", "aos", "por", "pelo", "pela", "pelos", "pelas", "para", "pra", "com", "sem",
+    "sob", "sobre", "entre", "ate", "apos", "desde", "e", "ou", "mas", "nem", "que", "se", "como",
+    "quando", "onde", "porque", "pois", "ja", "nao", "sim", "mais", "menos", "muito", "muita",
+    "muitos", "muitas", "ser", "sao", "foi", "era", "esta", "estao", "tem", "ter", "ha", "seu", "sua",
+    "seus", "suas", "meu", "minha", "me", "te", "lhe", "voce", "voces", "eu", "nos", "isso", "isto",
+    "esse", "essa", "este", "qual", "quais", "the", "of", "and", "to", "in", "for",
+}
+
+# Plural endings reduced to the singular (checked in order); other words just lose a final "s"
+PLURAL_SUFFIXES = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("ns", "m"), ("res", "r"))
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _stem(token: str) -> str:
+    """Light Portuguese plural reduction ("lançamentos" -> "lancamento", "materiais" -> "material")"""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix, replacement in PLURAL_SUFFIXES:
+        if token.endswith(suffix):
+            return token[:-len(suffix)] + replacement
+    return token[:-1] if token.endswith("s") else token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-folded, stopword-free and plural-reduced tokens (dates split on / and :)"""
+    return [_stem(token) for token in _TOKEN.findall(fold_accents(text).lower()) if token not in STOPWORDS]
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the indexed chunks, stored as flat numpy arrays.
+
+    Postings are grouped by term (offsets + document and frequency arrays), so a
+    query reads one contiguous slice per term. Snapshots are loaded with mmap_mode="r":
+    opening the index costs the vocabulary and metadata only, and the postings and
+    texts are paged in on demand.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.uint32)
+        self._tfs = np.zeros(0, dtype=np.uint16)
+        self._lengths = np.zeros(0, dtype=np.uint32)
+        self._texts = np.zeros(0, dtype=np.uint8)
+        self._text_offsets = np.zeros(1, dtype=np.int64)
+        self._prepare()
+
+    @property
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _prepare(self):
+        """Precompute the BM25 length normalization of every document"""
+        lengths = np.asarray(self._lengths, dtype=np.float32)
+        average = float(lengths.mean()) if len(lengths) else 1.0
+        self._length_norm = self.k1 * (1 - self.b + self.b * lengths / (average or 1.0))
+
+    @classmethod
+    def build(cls, documents: Iterable[Document], id_key: str = "chunk_id", **kwargs) -> "LexicalIndex":
+        """
+        Build the index from chunks (e.g. DocumentProcessor output after assign_chunk_ids)
+
+        Args:
+            documents: Chunks to index.
+            id_key (str): Metadata field used as the chunk ID (falls back to Document.id or the position).
+        """
+        index = cls(**kwargs)
+        term_ids, doc_ids, tfs, lengths, texts = [], [], [], [], []
+
+        for row, document in enumerate(documents):
+            tokens = tokenize(document.page_content)
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                term = index.vocabulary.setdefault(token, len(index.vocabulary))
+                counts[term] = counts.get(term, 0) + 1
+            term_ids.extend(counts)
+            tfs.extend(counts.values())
+            doc_ids.extend([row] * len(counts))
+            lengths.append(len(tokens))
+            texts.append(document.page_content.encode("utf-8"))
+            index.ids.append(str(document.metadata.get(id_key) or document.id or row))
+            index.metadatas.append(dict(document.metadata))
+
+        # Group postings by term (stable sort keeps documents in order within a term)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        index._docs = np.asarray(doc_ids, dtype=np.uint32)[order]
+        index._tfs = np.minimum(np.asarray(tfs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16)[order]
+        index._offsets = np.concatenate(([0], np.cumsum(np.bincount(term_ids, minlength=len(index.vocabulary))))).astype(np.int64)
+        index._lengths = np.asarray(lengths, dtype=np.uint32)
+
+        index._texts = np.frombuffer(b"".join(texts), dtype=np.uint8)
+        index._text_offsets = np.concatenate(([0], np.cumsum([len(text) for text in texts]))).astype(np.int64)
+        index._prepare()
+        return index
+
+    def _text(self, row: int) -> str:
+        return bytes(self._texts[self._text_offsets[row]:self._text_offsets[row + 1]]).decode("utf-8")
+
+    def _document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self._text(row), metadata=dict(self.metadatas[row]))
+
+    def documents(self) -> Iterator[Document]:
+        """Indexed chunks, in index order (e.g. to rebuild the index with some of them replaced)"""
+        for row in range(self.count):
+            yield self._document(row)
+
+    def _scores(self, query: str) -> Tuple[np.ndarray, float]:
+        """BM25 score of every document and the query's total idf (the score of an average-length match of every term)"""
+        scores = np.zeros(self.count, dtype=np.float32)
+        total_idf = 0.0
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                # Unknown terms still weigh in the total, so matching only part of the query is not confident
+                total_idf += math.log(1 + (self.count + 0.5) / 0.5)
+                continue
+            start, end = self._offsets[term], self._offsets[term + 1]
+            docs = self._docs[start:end]
+            tfs = self._tfs[start:end].astype(np.float32)
+            idf = math.log(1 + (self.count - (end - start) + 0.5) / ((end - start) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+            total_idf += idf
+        return scores, total_idf
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """
+        Top-k chunks by BM25, with scores normalized to [0, 1]
+
+        The score is divided by the query's total idf, i.e. the score of an average-length
+        chunk containing every query term once (and capped at 1). It reads as the share of
+        the query's weight a chunk matches, so thresholds do not depend on query length.
+        """
+        if not self.count:
+            return []
+        scores, total_idf = self._scores(query)
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return []
+
+        if filter is None and len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results = []
+        for row in candidates:
+            if filter is not None and not match_filter(self.metadatas[row], filter):
+                continue
+            results.append((self._document(int(row)), min(1.0, float(scores[row]) / total_idf)))
+            if len(results) == k:
+                break
+        return results
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    # Snapshots
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return (Path(path) / LEXICON_FILE).exists()
+
+    def save(self, path: str):
+        """Write a snapshot, replacing each file of the previous one atomically"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        arrays = {
+            OFFSETS_FILE: self._offsets, POSTING_DOCS_FILE: self._docs, POSTING_TFS_FILE: self._tfs,
+            DOC_LENGTHS_FILE: self._lengths, TEXTS_FILE: self._texts, TEXT_OFFSETS_FILE: self._text_offsets,
+        }
+        for name, array in arrays.items():
+            with open(path / (name + ".tmp"), "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+        with open(path / (LEXICON_FILE + ".tmp"), "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1, "b": self.b,
+                "vocabulary": sorted(self.vocabulary, key=self.vocabulary.get),
+                "ids": self.ids, "metadatas": self.metadatas,
+            }, f, ensure_ascii=False)
+
+        for name in (*arrays, LEXICON_FILE):
+            (path / (name + ".tmp")).replace(path / name)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        """Load a snapshot, memory-mapping postings and texts"""
+        path = Path(path)
+        with open(path / LEXICON_FILE, "r", encoding="utf-8") as f:
+            lexicon = json.load(f)
+
+        index = cls(k1=lexicon["k1"], b=lexicon["b"])
+        index.vocabulary = {term: i for i, term in enumerate(lexicon["vocabulary"])}
+        index.ids = lexicon["ids"]
+        index.metadatas = lexicon["metadatas"]
+        index._offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        index._docs = np.load(path / POSTING_DOCS_FILE, mmap_mode="r")
+        index._tfs = np.load(path / POSTING_TFS_FILE, mmap_mode="r")
+        index._lengths = np.load(path / DOC_LENGTHS_FILE, mmap_mode="r")
+        index._texts = np.load(path / TEXTS_FILE, mmap_mode="r")
+        index._text_offsets = np.load(path / TEXT_OFFSETS_FILE, mmap_mode="r")
+        index._prepare()
+        return index
+
+
+class ReloadingLexicalIndex:
+    """
+    LexicalIndex snapshot reloaded whenever the index generation changes.
+
+    The indexer rewrites the snapshot in another process and bumps the generation
+    stamp afterwards, so a long-lived process (Streamlit) searches the current chunks
+    without a restart. The first search after a change loads the new snapshot; the
+    memory maps of the previous one stay valid until it is released.
+    """
+
+    def __init__(self, path: str, generation: IndexGeneration):
+        """
+        Args:
+            path (str): Snapshot directory written by LexicalIndex.save.
+            generation (IndexGeneration): Stamp of the index the snapshot belongs to.
+        """
+        self.path = path
+        self.generation = generation
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._index: Optional[LexicalIndex] = None
+
+    @property
+    def index(self) -> Optional[LexicalIndex]:
+        """Current snapshot (None while none was written)"""
+        stamp = self.generation.current()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._index = LexicalIndex.load(self.path) if LexicalIndex.exists(self.path) else None
+                    self._stamp = stamp
+                    self.reloads += 1
+        return self._index
+
+    @property
+    def count(self) -> int:
+        index = self.index
+        return index.count if index is not None else 0
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        index = self.index
+        return index.similarity_search_with_score(query, k=k, filter=filter) if index is not None else []
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing BM25 and vector search results with reciprocal-rank fusion.
+
+    When the best BM25 match is confident, e.g. a request naming an exact course title
+    or date, the lexical results are returned directly and the remote vector search is
+    skipped. Confident means a normalized score >= lexical_threshold and a lead of at
+    least lexical_margin over the runner-up: a chunk containing every term of a generic
+    request ("mensagem de CRM") scores about 1.0 too, but so do many others.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: VectorStore
+    lexical_index: Union[LexicalIndex, ReloadingLexicalIndex]
+    search_kwargs: dict = Field(default_factory=dict)
+    k: int = 4
+    fetch_k: int = 10
+    rrf_k: int = 60
+    lexical_threshold: Optional[float] = 0.9
+    lexical_margin: float = 0.25
+
+    def _lexical(self, query: str) -> Tuple[List[Document], bool]:
+        """Lexical candidates and whether they are confident enough to skip the vector search"""
+        scored = self.lexical_index.similarity_search_with_score(
+            query, k=self.fetch_k, filter=self.search_kwargs.get("filter")
+        )
+        if self.lexical_threshold is None or not scored:
+            return [doc for doc, _ in scored], False
+        runner_up = scored[1][1] if len(scored) > 1 else 0.0
+        confident = scored[0][1] >= self.lexical_threshold and scored[0][1] - runner_up >= self.lexical_margin
+        return [doc for doc, _ in scored], confident
+
+    def _fuse(self, *rankings: List[Document]) -> List[Document]:
+        """Reciprocal-rank fusion: sum of 1 / (rrf_k + rank) over the rankings a document appears in"""
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                key = doc.metadata.get("chunk_id") or doc.id or doc.page_content
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                documents.setdefault(key, doc)
+        return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)[:self.k]]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        lexical, confident = self._lexical(query)
+        if confident:
+            return lexical[:self.k]
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k, filter=self.search_kwargs.get("filter"))
+        return self._fuse(lexical, dense)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        lexical, confident = self._lexical(query)
+        if confident:
+            return lexical[:self.k]
+        dense = await self.vectorstore.asimilarity_search(query, k=self.fetch_k, filter=self.search_kwargs.get("filter"))
+        return self._fuse(lexical, dense)
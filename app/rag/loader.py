@@ -1,34 +1,110 @@
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from .text_utils import fold_accents
+import re
+
+CATEGORY_SEPARATOR = ' > '
+PARTITION_KEY = 'partition'  # metadata field naming the index partition of a chunk
+DEFAULT_PARTITION = 'general'  # partition of files outside any category folder
+
+_NOT_SLUG = re.compile(r'[^a-z0-9]+')
+
+def parse_frontmatter(text: str) -> Tuple[Dict[str, str], str]:
+    """
+    Split the YAML frontmatter written by DataPreProcessor from the markdown body
+    Returns (fields, body); files without frontmatter return ({}, text)
+    """
+    if not text.startswith('---\n'):
+        return {}, text
+
+    end = text.find('\n---\n', 4)
+    if end == -1:
+        return {}, text
+
+    fields = {}
+    for line in text[4:end].splitlines():
+        key, separator, value = line.partition(':')
+        if separator and key.strip():
+            fields[key.strip()] = value.strip()
+    return fields, text[end + 5:].lstrip('\n')
+
+def category_paths(category: str) -> List[str]:
+    """All ancestors of a category, e.g. "A > B" -> ["A", "A > B"] (used for prefix filters)"""
+    parts = category.split(CATEGORY_SEPARATOR)
+    return [CATEGORY_SEPARATOR.join(parts[:i + 1]) for i in range(len(parts))]
+
+def category_filter(category: str) -> Dict[str, Any]:
+    """Metadata filter matching a category and all of its subcategories"""
+    return {'category_paths': {'$in': [category]}}
+
+def partition_filter(partitions: Iterable[str]) -> Dict[str, Any]:
+    """Metadata filter matching the chunks of some partitions (routed to their namespaces by PartitionedVectorStore)"""
+    return {PARTITION_KEY: {'$in': sorted(partitions)}}
+
+def partition_name(category: str, depth: int = 1) -> str:
+    """
+    Index partition of a category: slug of its first depth levels
+    e.g. "Lançamentos > Python > Campanha 1" -> "lancamentos" (depth 1) or "lancamentos/python" (depth 2)
+    """
+    parts = [part for part in (category or '').split(CATEGORY_SEPARATOR) if part.strip()][:depth]
+    slugs = [_NOT_SLUG.sub('-', fold_accents(part).lower()).strip('-') for part in parts]
+    return '/'.join(slug for slug in slugs if slug) or DEFAULT_PARTITION
 
 class MarketingDataLoader:
-    def __init__(self, data_dir: str):
+    def __init__(self, data_dir: str, partition_depth: int = 1):
+        """
+        Args:
+            data_dir (str): Directory of the processed markdown files (one folder per category level).
+            partition_depth (int): Category levels that make up the index partition of a file.
+        """
         self.data_dir = Path(data_dir)
-    
-    def load_campaign_data(self, campaign_name: str = None) -> List[Dict[str, Any]]:
+        self.partition_depth = partition_depth
+
+    def partition_of(self, markdown_file: Path) -> str:
+        """Partition of a processed file, from its category folders (known before the file is read)"""
+        folders = markdown_file.relative_to(self.data_dir).parts[:-1]
+        return partition_name(CATEGORY_SEPARATOR.join(folders), self.partition_depth)
+
+    def iter_campaign_data(self, campaign_name: str = None, partitions: Iterable[str] = None) -> Iterator[Dict[str, Any]]:
         """
-        Load marketing data from markdown files
-        Returns list of documents with metadata
+        Lazily load marketing data from markdown files
+        Yields documents whose frontmatter fields are moved into the metadata
+
+        Args:
+            campaign_name (str): Optional subdirectory to load.
+            partitions (list): Optional partitions to load (other files are skipped unread).
         """
-        documents = []
         search_dir = self.data_dir / campaign_name if campaign_name else self.data_dir
-        
+        partitions = set(partitions) if partitions is not None else None
+
         # Walk through the directory
         for markdown_file in search_dir.rglob('*.md'):
             if markdown_file.name == 'index.md':  # Skip index file
                 continue
-                
+
+            partition = self.partition_of(markdown_file)
+            if partitions is not None and partition not in partitions:
+                continue
+
             try:
                 with open(markdown_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                documents.append({
-                    'content': content,
-                    'metadata': {
-                        'file_path': str(markdown_file.relative_to(self.data_dir))
-                    }
-                })
+                    fields, content = parse_frontmatter(f.read())
             except Exception as e:
                 print(f"Error loading {markdown_file}: {str(e)}")
-        
-        return documents 
+                continue
+
+            metadata = {**fields, 'file_path': str(markdown_file.relative_to(self.data_dir)), PARTITION_KEY: partition}
+            if 'category' in fields:
+                metadata['category_paths'] = category_paths(fields['category'])
+
+            yield {
+                'content': content,
+                'metadata': metadata
+            }
+
+    def load_campaign_data(self, campaign_name: str = None, partitions: Iterable[str] = None) -> List[Dict[str, Any]]:
+        """
+        Load marketing data from markdown files
+        Returns list of documents with metadata
+        """
+        return list(self.iter_campaign_data(campaign_name, partitions))
@@ -0,0 +1,369 @@
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain.schema import Document
+import numpy as np
+import threading
+import json
+import uuid
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    """Evaluate one Pinecone-style field condition (list values match if any element does)"""
+    if not isinstance(condition, dict):
+        condition = {"$eq": condition}
+
+    values = value if isinstance(value, list) else [value]
+    for operator, operand in condition.items():
+        if operator == "$exists":
+            matched = (value is not None) == bool(operand)
+        elif operator == "$eq":
+            matched = operand in values
+        elif operator == "$ne":
+            matched = operand not in values
+        elif operator == "$in":
+            matched = any(v in operand for v in values)
+        elif operator == "$nin":
+            matched = not any(v in operand for v in values)
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            if not isinstance(value, (int, float)):
+                return False
+            matched = {
+                "$gt": value > operand, "$gte": value >= operand,
+                "$lt": value < operand, "$lte": value <= operand,
+            }[operator]
+        else:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def match_filter(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """Check metadata against a Pinecone-style filter ($eq, $ne, $in, $nin, $gt(e), $lt(e), $exists, $and, $or)"""
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(match_filter(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(match_filter(metadata, sub) for sub in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index for corpora that fit in RAM.
+
+    Embeddings live in one contiguous float32 matrix of L2-normalized rows, so top-k
+    cosine search is a single matrix-vector product plus argpartition. Snapshots are
+    saved as a .npy matrix (memory-mapped on load, so startup does not read the whole
+    file) next to a JSON file with IDs, texts and metadata.
+
+    Besides the LangChain VectorStore interface it implements the subset of the
+    Pinecone Index API used by VectorStoreHandler (upsert, delete, fetch, query, list,
+    describe_index_stats).
+    """
+
+    def __init__(self, embedding: Embeddings, path: Optional[str] = None):
+        """
+        Args:
+            embedding: Embeddings used for texts and queries.
+            path (str): Snapshot directory, loaded if it exists and used by save().
+        """
+        self._embedding = embedding
+        self.path = Path(path) if path else None
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+        self._columns: Dict[str, Optional[np.ndarray]] = {}
+
+        if self.path and (self.path / VECTORS_FILE).exists():
+            self.load(self.path)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @property
+    def count(self) -> int:
+        return self._size
+
+    # Storage
+
+    def _ensure_capacity(self, rows: int, dimension: int):
+        """Make room for rows more vectors in a writable matrix (amortized doubling)"""
+        if self._size == 0 and self._matrix.shape[1] != dimension:
+            self._matrix = np.empty((max(rows, 64), dimension), dtype=np.float32)
+            return
+        if self._matrix.shape[1] != dimension:
+            raise ValueError(f"Vector dimension {dimension} does not match index dimension {self._matrix.shape[1]}")
+
+        needed = self._size + rows
+        if needed > self._matrix.shape[0] or not self._matrix.flags.writeable:
+            # Memory-mapped snapshots are read-only: copy into RAM on first write
+            matrix = np.empty((max(needed, 2 * self._size, 64), dimension), dtype=np.float32)
+            matrix[:self._size] = self._matrix[:self._size]
+            self._matrix = matrix
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def upsert(self, vectors: Iterable, namespace: str = None, **kwargs) -> Dict[str, int]:
+        """Insert or overwrite vectors given as Pinecone-style dicts or (id, values, metadata) tuples"""
+        records = [v if isinstance(v, dict) else dict(zip(("id", "values", "metadata"), v)) for v in vectors]
+        if not records:
+            return {"upserted_count": 0}
+
+        matrix = self._normalize(np.asarray([r["values"] for r in records], dtype=np.float32))
+        with self._lock:
+            self._columns = {}
+            self._ensure_capacity(len(records), matrix.shape[1])
+            for record, row in zip(records, matrix):
+                metadata = dict(record.get("metadata") or {})
+                text = metadata.pop("text", "")
+                position = self._positions.get(record["id"])
+                if position is None:
+                    position = self._size
+                    self._size += 1
+                    self._positions[record["id"]] = position
+                    self.ids.append(record["id"])
+                    self.texts.append(text)
+                    self.metadatas.append(metadata)
+                else:
+                    self.texts[position] = text
+                    self.metadatas[position] = metadata
+                self._matrix[position] = row
+        return {"upserted_count": len(records)}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False, namespace: str = None, **kwargs) -> None:
+        """Delete vectors by ID (or everything) and compact the matrix"""
+        with self._lock:
+            self._columns = {}
+            if delete_all:
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+                self._size = 0
+                self.ids, self.texts, self.metadatas, self._positions = [], [], [], {}
+                return
+
+            rows = [self._positions[id] for id in ids or [] if id in self._positions]
+            if not rows:
+                return
+
+            keep = np.ones(self._size, dtype=bool)
+            keep[rows] = False
+            kept_rows = np.flatnonzero(keep)
+            matrix = np.empty((max(len(kept_rows), 64), self._matrix.shape[1]), dtype=np.float32)
+            matrix[:len(kept_rows)] = self._matrix[kept_rows]
+            self._matrix = matrix
+            self._size = len(kept_rows)
+            self.ids = [self.ids[i] for i in kept_rows]
+            self.texts = [self.texts[i] for i in kept_rows]
+            self.metadatas = [self.metadatas[i] for i in kept_rows]
+            self._positions = {id: i for i, id in enumerate(self.ids)}
+            self._columns = {}
+
+    def fetch(self, ids: List[str], namespace: str = None, **kwargs) -> Dict[str, Any]:
+        """Fetch stored vectors and metadata by ID"""
+        with self._lock:
+            return {"vectors": {
+                id: {
+                    "id": id,
+                    "values": self._matrix[self._positions[id]].tolist(),
+                    "metadata": {**self.metadatas[self._positions[id]], "text": self.texts[self._positions[id]]}
+                }
+                for id in ids if id in self._positions
+            }}
+
+    def list(self, prefix: str = None, limit: int = 100, namespace: str = None, **kwargs) -> Iterator[List[str]]:
+        """Pages of vector IDs (optionally starting with prefix), like Index.list"""
+        with self._lock:
+            ids = [id for id in self.ids if prefix is None or id.startswith(prefix)]
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        """Vector count and dimension (a single, default namespace)"""
+        with self._lock:
+            return {
+                "namespaces": {"": {"vector_count": self._size}} if self._size else {},
+                "dimension": self._matrix.shape[1],
+                "total_vector_count": self._size,
+            }
+
+    def query(self, vector: List[float], top_k: int = 4, include_metadata: bool = True, include_values: bool = False,
+              namespace: str = None, filter: Optional[Dict[str, Any]] = None, **kwargs) -> Dict[str, Any]:
+        """Pinecone-style query returning {"matches": [{"id", "score", "metadata"[, "values"]}]}"""
+        with self._lock:
+            matches = []
+            for row, score in self._search(vector, top_k, filter):
+                match = {"id": self.ids[row], "score": score}
+                if include_metadata:
+                    match["metadata"] = {**self.metadatas[row], "text": self.texts[row]}
+                if include_values:
+                    match["values"] = self._matrix[row].tolist()
+                matches.append(match)
+            return {"matches": matches}
+
+    def _column(self, key: str) -> Optional[np.ndarray]:
+        """Cached array of one scalar metadata field (None if any row holds a list)"""
+        if key not in self._columns:
+            values = [metadata.get(key) for metadata in self.metadatas]
+            column = None
+            if not any(isinstance(value, list) for value in values):
+                column = np.empty(len(values), dtype=object)
+                column[:] = values
+            self._columns[key] = column
+        return self._columns[key]
+
+    def _filter_rows(self, filter: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask of rows matching the filter"""
+        mask = np.ones(self._size, dtype=bool)
+        remaining = {}
+        for key, condition in filter.items():
+            column = None if key.startswith("$") else self._column(key)
+            operators = condition if isinstance(condition, dict) else {"$eq": condition}
+            # Vectorized fast path for equality / membership on scalar fields
+            if column is not None and set(operators) <= {"$eq", "$in"}:
+                for operator, operand in operators.items():
+                    mask &= (column == operand) if operator == "$eq" else np.isin(column, list(operand))
+            else:
+                remaining[key] = condition
+
+        if remaining:
+            mask &= np.fromiter(
+                (match_filter(metadata, remaining) for metadata in self.metadatas), dtype=bool, count=self._size
+            )
+        return mask
+
+    def _search(self, vector: List[float], k: int, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """Top-k rows by cosine similarity, as (row, score) pairs (lock held)"""
+        if self._size == 0 or k <= 0:
+            return []
+
+        query = self._normalize(np.asarray(vector, dtype=np.float32))
+        candidates = None
+        if filter:
+            candidates = np.flatnonzero(self._filter_rows(filter))
+            if len(candidates) == 0:
+                return []
+            scores = self._matrix[candidates] @ query
+        else:
+            scores = self._matrix[:self._size] @ query
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        rows = candidates[top] if candidates is not None else top
+        return [(int(row), float(scores[i])) for row, i in zip(rows, top)]
+
+    # LangChain VectorStore interface
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        """Embed and add texts to the index"""
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.upsert([
+            {"id": id, "values": vector, "metadata": {**metadata, "text": text}}
+            for id, vector, metadata, text in zip(ids, vectors, metadatas, texts)
+        ])
+        return ids
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        """Return documents most similar to an embedding, with cosine scores"""
+        with self._lock:
+            return [
+                (Document(id=self.ids[row], page_content=self.texts[row], metadata=dict(self.metadatas[row])), score)
+                for row, score in self._search(embedding, k, filter)
+            ]
+
+    def similarity_search_with_vectors(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None) -> Tuple[List[Tuple[Document, float]], np.ndarray]:
+        """Top-k documents with cosine scores and their (normalized) vectors, e.g. for MMR re-ranking"""
+        with self._lock:
+            matches = self._search(embedding, k, filter)
+            rows = [row for row, _ in matches]
+            scored = [
+                (Document(id=self.ids[row], page_content=self.texts[row], metadata=dict(self.metadatas[row])), score)
+                for row, score in matches
+            ]
+            return scored, np.array(self._matrix[rows])
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        """Return documents most similar to a query, with cosine scores"""
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        """Asynchronous similarity_search_with_score (only the embedding call is awaited; the search is in-process)"""
+        return self.similarity_search_by_vector_with_score(await self._embedding.aembed_query(query), k=k, filter=filter)
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity in [-1, 1] mapped to [0, 1]
+        return lambda score: (score + 1) / 2
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None, path: Optional[str] = None, **kwargs) -> "LocalVectorStore":
+        store = cls(embedding, path=path)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    # Snapshots
+
+    def save(self, path: Optional[str] = None):
+        """Write a snapshot (vectors.npy + records.json), replacing the previous one atomically"""
+        path = Path(path) if path else self.path
+        if path is None:
+            raise ValueError("No snapshot path given")
+        path.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            # Release the memory map first: the snapshot file is about to be replaced
+            if isinstance(self._matrix, np.memmap):
+                self._matrix = np.array(self._matrix)
+
+            vectors_tmp = path / (VECTORS_FILE + ".tmp")
+            records_tmp = path / (RECORDS_FILE + ".tmp")
+            with open(vectors_tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(self._matrix[:self._size]))
+            with open(records_tmp, "w", encoding="utf-8") as f:
+                json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f, ensure_ascii=False)
+            vectors_tmp.replace(path / VECTORS_FILE)
+            records_tmp.replace(path / RECORDS_FILE)
+
+    def load(self, path: str):
+        """Load a snapshot, memory-mapping the vector matrix"""
+        path = Path(path)
+        with open(path / RECORDS_FILE, "r", encoding="utf-8") as f:
+            records = json.load(f)
+
+        with self._lock:
+            self._matrix = np.load(path / VECTORS_FILE, mmap_mode="r")
+            self._size = self._matrix.shape[0]
+            self.ids = records["ids"]
+            self.texts = records["texts"]
+            self.metadatas = records["metadatas"]
+            self._positions = {id: i for i, id in enumerate(self.ids)}
+            self._columns = {}
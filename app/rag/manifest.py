@@ -0,0 +1,137 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import List, Dict, Set, Iterable
+from langchain.schema import Document
+
+# Version of the metadata written with every vector. Bump it when a field that filters
+# or routing rely on is added (2: category_paths and partition): the next sync then
+# re-upserts every chunk of a manifest written with an older version.
+METADATA_VERSION = 2
+
+
+def chunk_id(source: str, position: int, content: str) -> str:
+    """
+    Deterministic vector ID for a chunk: source path + chunk position + content hash.
+
+    The source path is hashed so the ID stays ASCII and every chunk of a file shares
+    the same prefix.
+    """
+    source_hash = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    return f"{source_hash}#{position}#{content_hash}"
+
+
+def assign_chunk_ids(chunks: List[Document], source_key: str = 'file_path') -> List[str]:
+    """
+    Give every chunk its deterministic ID, stored as chunk_id / chunk_index metadata.
+    Chunks must be in document order (as returned by DocumentProcessor).
+    """
+    positions = {}
+    ids = []
+    for chunk in chunks:
+        source = chunk.metadata.get(source_key, '')
+        position = positions.get(source, 0)
+        positions[source] = position + 1
+
+        id = chunk_id(source, position, chunk.page_content)
+        chunk.metadata['chunk_id'] = id
+        chunk.metadata['chunk_index'] = position
+        ids.append(id)
+    return ids
+
+
+class IndexManifest:
+    """
+    Local record of which chunk IDs are already indexed for each source file,
+    and of the partition each source was indexed in
+    """
+
+    def __init__(self, path: str, index_name: str):
+        self.path = Path(path)
+        self.index_name = index_name
+        self.sources: Dict[str, List[str]] = {}
+        self.partitions: Dict[str, str] = {}
+        # Whether partitions were written to their own namespaces (the layout of the index)
+        self.namespaced = False
+        self.metadata_version = METADATA_VERSION
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # A manifest written for another index says nothing about this one
+            if data.get('index_name') == index_name:
+                self.sources = data.get('sources', {})
+                self.partitions = data.get('partitions', {})
+                self.namespaced = data.get('namespaced', False)
+                # Manifests without a version predate the versioned metadata
+                self.metadata_version = data.get('metadata_version', 1)
+
+    @property
+    def stale(self) -> bool:
+        """Whether the recorded vectors carry metadata older than METADATA_VERSION"""
+        return bool(self.sources) and self.metadata_version < METADATA_VERSION
+
+    def indexed_ids(self, sources: Iterable[str] = None) -> Set[str]:
+        """All chunk IDs recorded as indexed (only those of some sources when given)"""
+        if sources is None:
+            return {id for ids in self.sources.values() for id in ids}
+        return {id for source in sources for id in self.sources.get(source, [])}
+
+    def sources_in(self, partitions: Iterable[str]) -> Set[str]:
+        """Sources recorded in some partitions"""
+        partitions = set(partitions)
+        return {source for source in self.sources if self.partitions.get(source, '') in partitions}
+
+    def plan(self, current: Dict[str, List[str]], sources: Iterable[str] = None):
+        """
+        Compare the current chunk IDs per source with the manifest.
+
+        Args:
+            current (dict): Current chunk IDs per source.
+            sources (set): Sources being synced (defaults to all); chunks of other
+                           recorded sources are neither upserted nor deleted.
+
+        Returns:
+            tuple: (IDs to upsert, IDs to delete). Every current ID is upserted when the
+                   manifest is stale, so the vectors get the current metadata.
+        """
+        indexed = self.indexed_ids(sources)
+        wanted = {id for ids in current.values() for id in ids}
+        return (wanted if self.stale else wanted - indexed), indexed - wanted
+
+    def update(self, current: Dict[str, List[str]], partitions: Dict[str, str] = None, sources: Iterable[str] = None):
+        """
+        Replace the recorded state with the current chunk IDs (and partition) per source
+
+        When sources is given, only those sources are replaced and the others are kept.
+        """
+        partitions = partitions or {}
+        if sources is None:
+            self.sources, self.partitions = {}, {}
+            self.metadata_version = METADATA_VERSION
+        for source in sources or ():
+            self.sources.pop(source, None)
+            self.partitions.pop(source, None)
+        for source, ids in current.items():
+            self.sources[source] = list(ids)
+            self.partitions[source] = partitions.get(source, '')
+
+    def clear(self):
+        self.sources = {}
+        self.partitions = {}
+        self.metadata_version = METADATA_VERSION
+
+    def save(self):
+        """Write the manifest atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'index_name': self.index_name,
+                'namespaced': self.namespaced,
+                'metadata_version': self.metadata_version,
+                'sources': self.sources,
+                'partitions': self.partitions
+            }, f, ensure_ascii=False)
+        tmp_path.replace(self.path)
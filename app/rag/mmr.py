@@ -0,0 +1,137 @@
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain.schema import Document
+from .local_index import LocalVectorStore
+import numpy as np
+import asyncio
+
+Candidates = Tuple[List[Tuple[Document, float]], np.ndarray]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def maximal_marginal_relevance(query, candidates, k: int = 4, lambda_mult: float = 0.5) -> np.ndarray:
+    """
+    Rows of the candidates picked by maximal marginal relevance, in selection order
+
+    Each step picks the candidate maximizing
+        lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, s) for s already selected)
+    Only the rows of the pairwise (cosine) similarity matrix that are ever read are
+    computed: one matrix-vector product per selected candidate, folded into a running
+    maximum. A selection then costs O(k * n * d) instead of O(n^2 * d) for the full
+    matrix, and no step loops over the candidates in Python.
+
+    Args:
+        query: Query embedding.
+        candidates: Candidate embeddings (n x d).
+        k (int): Rows to select.
+        lambda_mult (float): 1 ranks by relevance only, 0 by diversity only.
+    """
+    candidates = _normalize(np.asarray(candidates, dtype=np.float32))
+    k = min(k, len(candidates))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+
+    relevance = candidates @ _normalize(np.asarray(query, dtype=np.float32))
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    selected = np.empty(k, dtype=np.intp)
+    selected[0] = np.argmax(relevance)
+    for i in range(1, k):
+        np.maximum(redundancy, candidates @ candidates[selected[i - 1]], out=redundancy)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected[:i]] = -np.inf
+        selected[i] = np.argmax(scores)
+    return selected
+
+
+def query_with_vectors(index, embedding: List[float], k: int, filter: Optional[Dict[str, Any]] = None, namespace: str = None) -> Candidates:
+    """Top-k matches of a Pinecone-style index query with their stored vectors: ([(doc, score)], vectors)"""
+    kwargs = {"namespace": namespace} if namespace is not None else {}
+    response = index.query(vector=embedding, top_k=k, include_values=True, include_metadata=True, filter=filter, **kwargs)
+    scored, vectors = [], []
+    for match in response["matches"]:
+        metadata = dict(match["metadata"] or {})
+        text = metadata.pop("text", "")
+        scored.append((Document(id=match["id"], page_content=text, metadata=metadata), match["score"]))
+        vectors.append(match["values"])
+    return scored, np.asarray(vectors, dtype=np.float32)
+
+
+class MMRVectorStore(VectorStore):
+    """
+    Vector store returning a diverse top-k: over-fetch, then maximal marginal relevance.
+
+    Each search embeds the request once, fetches fetch_k candidates together with their
+    stored vectors (a single index query: nothing is re-embedded) and keeps the k that
+    best trade relevance against similarity to the ones already kept. Near-identical
+    chunks (e.g. several campaigns written from the same template) then take one slot
+    of the context instead of all of them. Scores are the candidates' similarity to the
+    request, so relevance thresholds keep their meaning.
+    """
+
+    def __init__(self, vectorstore: VectorStore, fetch_k: int = 20, lambda_mult: float = 0.5):
+        """
+        Args:
+            vectorstore: Store to search: LocalVectorStore, PartitionedVectorStore (both implement
+                         similarity_search_with_vectors) or a store exposing a Pinecone-style index
+                         (e.g. PineconeVectorStore).
+            fetch_k (int): Candidates fetched per search (at least the k asked for).
+            lambda_mult (float): 1 ranks by relevance only, 0 by diversity only.
+        """
+        self.vectorstore = vectorstore
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.vectorstore.embeddings
+
+    def _candidates(self, embedding: List[float], k: int, filter: Optional[Dict[str, Any]]) -> Candidates:
+        if hasattr(self.vectorstore, "similarity_search_with_vectors"):
+            return self.vectorstore.similarity_search_with_vectors(embedding, k=k, filter=filter)
+        return query_with_vectors(self.vectorstore.index, embedding, k, filter)
+
+    def _select(self, embedding: List[float], candidates: Candidates, k: int) -> List[Tuple[Document, float]]:
+        scored, vectors = candidates
+        if len(scored) <= 1:
+            return scored[:k]
+        return [scored[row] for row in maximal_marginal_relevance(embedding, vectors, k, self.lambda_mult)]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        """k diverse matches out of the fetch_k most similar, with their similarity scores"""
+        return self._select(embedding, self._candidates(embedding, max(k, self.fetch_k), filter), k)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        """Asynchronous similarity_search_with_score (the index query runs in a worker thread)"""
+        embedding = await self.embeddings.aembed_query(query)
+        candidates = await asyncio.to_thread(self._candidates, embedding, max(k, self.fetch_k), filter)
+        return self._select(embedding, candidates, k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return self.vectorstore._select_relevance_score_fn()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs) -> List[str]:
+        return self.vectorstore.add_texts(texts, metadatas, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs) -> "MMRVectorStore":
+        """MMR search over a new local index of the texts (**kwargs: LocalVectorStore.from_texts, e.g. ids, path)"""
+        return cls(LocalVectorStore.from_texts(texts, embedding, metadatas, **kwargs), fetch_k=fetch_k, lambda_mult=lambda_mult)
@@ -0,0 +1,174 @@
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain.schema import Document
+from .loader import PARTITION_KEY
+from .index_generation import IndexGeneration
+from .mmr import query_with_vectors
+import numpy as np
+import asyncio
+import threading
+import uuid
+
+
+class PartitionedVectorStore(VectorStore):
+    """
+    Vector store over an index holding one namespace per partition (e.g. Pinecone).
+
+    A condition on the partition field of the filter (see loader.partition_filter)
+    selects the namespaces to search; without one, every namespace of the index is
+    searched. The request is embedded once, the namespaces are queried concurrently
+    and their matches are merged by score.
+    """
+
+    def __init__(
+        self,
+        vectorstore: VectorStore,
+        index,
+        generation: IndexGeneration = None,
+        max_workers: int = 8
+    ):
+        """
+        Args:
+            vectorstore: Vector store searching one namespace per call (namespace= keyword),
+                         e.g. PineconeVectorStore.
+            index: Its index (describe_index_stats lists the namespaces, fetch reads vectors).
+            generation (IndexGeneration): Index stamp; the namespace list is refreshed when it changes.
+            max_workers (int): Namespaces queried concurrently.
+        """
+        self.vectorstore = vectorstore
+        self._index = index
+        self.generation = generation
+        self._namespaces: Optional[List[str]] = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="partition-search")
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.vectorstore.embeddings
+
+    def namespaces(self) -> List[str]:
+        """Namespaces of the index (listed once per index generation)"""
+        stamp = self.generation.current() if self.generation else ""
+        with self._lock:
+            if self._namespaces is None or stamp != self._stamp:
+                stats = self._index.describe_index_stats()
+                namespaces = stats["namespaces"] if isinstance(stats, dict) else stats.namespaces
+                self._namespaces, self._stamp = sorted(namespaces), stamp
+            return self._namespaces
+
+    @staticmethod
+    def _split_filter(filter: Optional[Dict[str, Any]]) -> Tuple[Optional[List[str]], Optional[Dict[str, Any]]]:
+        """(namespaces selected by the filter or None, the rest of the filter)"""
+        if not filter or PARTITION_KEY not in filter:
+            return None, filter
+        condition = filter[PARTITION_KEY]
+        operators = condition if isinstance(condition, dict) else {"$eq": condition}
+        if set(operators) - {"$eq", "$in"}:
+            # Other operators stay a metadata filter over every namespace
+            return None, filter
+
+        selected = set(operators["$in"]) if "$in" in operators else None
+        if "$eq" in operators:
+            selected = {operators["$eq"]} & selected if selected is not None else {operators["$eq"]}
+        rest = {key: value for key, value in filter.items() if key != PARTITION_KEY}
+        return sorted(selected), rest or None
+
+    def _search(self, embedding: List[float], k: int, filter: Optional[Dict[str, Any]], namespace: str) -> List[Tuple[Document, float]]:
+        return self.vectorstore.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, namespace=namespace)
+
+    @staticmethod
+    def _merge(results: Iterable[List[Tuple[Document, float]]], k: int) -> List[Tuple[Document, float]]:
+        return sorted((pair for result in results for pair in result), key=lambda pair: pair[1], reverse=True)[:k]
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        """Top-k matches over the selected namespaces, with scores"""
+        selected, filter = self._split_filter(filter)
+        namespaces = selected if selected is not None else self.namespaces()
+        if len(namespaces) == 1:
+            return self._search(embedding, k, filter, namespaces[0])
+        futures = [self._executor.submit(self._search, embedding, k, filter, namespace) for namespace in namespaces]
+        return self._merge((future.result() for future in futures), k)
+
+    def similarity_search_with_vectors(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None) -> Tuple[List[Tuple[Document, float]], np.ndarray]:
+        """Top-k matches over the selected namespaces with their stored vectors (for MMR re-ranking)"""
+        selected, filter = self._split_filter(filter)
+        namespaces = selected if selected is not None else self.namespaces()
+        futures = [
+            self._executor.submit(query_with_vectors, self._index, embedding, k, filter, namespace) for namespace in namespaces
+        ]
+        matches = sorted(
+            (match for future in futures for match in zip(*future.result())), key=lambda match: match[0][1], reverse=True
+        )[:k]
+        return [pair for pair, _ in matches], np.asarray([vector for _, vector in matches], dtype=np.float32)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Tuple[Document, float]]:
+        """Asynchronous similarity_search_with_score (the namespace queries run in worker threads)"""
+        embedding = await self.embeddings.aembed_query(query)
+        selected, filter = self._split_filter(filter)
+        namespaces = selected if selected is not None else await asyncio.to_thread(self.namespaces)
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._executor, self._search, embedding, k, filter, namespace) for namespace in namespaces
+        ))
+        return self._merge(results, k)
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return self.vectorstore._select_relevance_score_fn()
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, namespace: str = None, **kwargs) -> List[str]:
+        """Add texts to one namespace (VectorStoreHandler.sync_documents routes chunks by partition)"""
+        return self.vectorstore.add_texts(texts, metadatas, namespace=namespace, **kwargs)
+
+    def fetch(self, ids: List[str], **kwargs) -> Dict[str, Any]:
+        """Fetch vectors by ID from whichever namespaces hold them"""
+        vectors, missing = {}, list(ids)
+        for namespace in self.namespaces():
+            if not missing:
+                break
+            response = self._index.fetch(ids=missing, namespace=namespace)
+            found = response["vectors"] if isinstance(response, dict) else response.vectors
+            vectors.update(found)
+            missing = [id for id in missing if id not in found]
+        return {"vectors": vectors}
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, index=None, **kwargs) -> "PartitionedVectorStore":
+        """
+        Store over a Pinecone-style index, with each text added to the namespace of its partition
+
+        Args:
+            index: Index to write to (required), e.g. a Pinecone index or an in-memory fake.
+            **kwargs: Passed through to the constructor (generation, max_workers).
+        """
+        if index is None:
+            raise ValueError("PartitionedVectorStore.from_texts needs the index to write to (index=...)")
+        from langchain_pinecone import PineconeVectorStore
+
+        store = cls(PineconeVectorStore(index, embedding, "text"), index, **kwargs)
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        by_partition: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            by_partition.setdefault(metadata.get(PARTITION_KEY, ''), []).append(row)
+        for partition, rows in by_partition.items():
+            store.add_texts(
+                [texts[row] for row in rows], [metadatas[row] for row in rows], ids=[ids[row] for row in rows], namespace=partition
+            )
+        return store
@@ -0,0 +1,115 @@
+from typing import List, Dict, Any, Iterable, Optional, TYPE_CHECKING
+from pathlib import Path
+from .loader import CATEGORY_SEPARATOR, DEFAULT_PARTITION, PARTITION_KEY
+import json
+
+# Only light imports: the app reads the registry while rendering the page
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+DEFAULT_PARTITIONS_PATH = "data/partitions.json"
+
+
+class PartitionRegistry:
+    """
+    Partitions of the index and the categories they hold.
+
+    Written by the indexer next to the manifest; read by the app to route requests
+    (PartitionRouter) and to list the partitions a user can pick. A "keywords" list
+    can be added by hand to an entry and is kept across reindexing runs.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.partitions: Dict[str, Dict[str, Any]] = {}
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.partitions = json.load(f).get('partitions', {})
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self.partitions)
+
+    def update(self, chunks: Iterable["Document"], partitions: Iterable[str] = None):
+        """
+        Recount categories and chunks per partition
+
+        Args:
+            chunks: Chunks indexed by this run.
+            partitions (list): Partitions synced by a scoped run; only their entries are
+                               replaced (defaults to all of them).
+        """
+        counts: Dict[str, Dict[str, Any]] = {}
+        for chunk in chunks:
+            entry = counts.setdefault(chunk.metadata.get(PARTITION_KEY, DEFAULT_PARTITION), {'categories': set(), 'chunks': 0})
+            entry['chunks'] += 1
+            if chunk.metadata.get('category'):
+                entry['categories'].add(chunk.metadata['category'])
+
+        previous = self.partitions
+        replaced = set(previous) if partitions is None else set(partitions)
+        self.partitions = {name: entry for name, entry in previous.items() if name not in replaced}
+        for name, entry in counts.items():
+            self.partitions[name] = {'categories': sorted(entry['categories']), 'chunks': entry['chunks']}
+            if previous.get(name, {}).get('keywords'):
+                self.partitions[name]['keywords'] = previous[name]['keywords']
+
+    def save(self):
+        """Write the registry atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'partitions': self.partitions}, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.path)
+
+
+class PartitionRouter:
+    """
+    Map a request to the partitions it should search.
+
+    An explicit selection (e.g. from the UI) wins. Otherwise the request tokens are
+    matched against the category names and keywords of every partition, and the
+    partitions of the most specific matching token win: "campanha" may appear in
+    every partition, "python" only in one. Requests matching nothing, or every
+    partition, are not scoped (None: search everything).
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        """
+        Args:
+            keywords (dict): Words describing each partition (category names, course titles, ...).
+        """
+        # Same tokens as the BM25 index (imported here: the registry alone stays light)
+        from .lexical_index import tokenize
+
+        self._tokenize = tokenize
+        self.partitions = sorted(keywords)
+        self._postings: Dict[str, set] = {}
+        for name, words in keywords.items():
+            for token in tokenize(" ".join(words)):
+                # Numbers and short tokens ("1", "ao") say nothing about the topic
+                if len(token) > 2 and not token.isdigit():
+                    self._postings.setdefault(token, set()).add(name)
+
+    @classmethod
+    def from_registry(cls, registry: PartitionRegistry) -> "PartitionRouter":
+        keywords = {}
+        for name, entry in registry.partitions.items():
+            words = [name.replace("/", " ").replace("-", " "), *entry.get('keywords', [])]
+            for category in entry.get('categories', []):
+                words.extend(category.split(CATEGORY_SEPARATOR))
+            keywords[name] = words
+        return cls(keywords)
+
+    def route(self, query: str, selected: Iterable[str] = None) -> Optional[List[str]]:
+        """Partitions to search for the request (None when it is not scoped)"""
+        if selected:
+            return sorted(selected)
+
+        matches = [self._postings[token] for token in set(self._tokenize(query)) if token in self._postings]
+        if not matches:
+            return None
+        narrowest = min(len(partitions) for partitions in matches)
+        routed = set().union(*(partitions for partitions in matches if len(partitions) == narrowest))
+        return sorted(routed) if len(routed) < len(self.partitions) else None
@@ -0,0 +1,234 @@
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from .vector_store import PINECONE_MAX_UPSERT_SIZE, with_backoff
+import numpy as np
+import json
+import time
+
+SNAPSHOT_VERSION = 1
+QUANTIZATIONS = ("int8", "float16", "float32")
+FETCH_BATCH_SIZE = 200  # IDs per fetch request (Pinecone sends them in the query string)
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compact form of float32 rows: (stored rows, scale of each row)
+
+    int8 is symmetric per row (v ≈ q * scale, scale = max|v| / 127); float16 and
+    float32 rows are stored as they are, with a scale of 1.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.ones(len(vectors), dtype=np.float32)
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127 if vectors.size else scales
+        scales[scales == 0] = 1.0
+        return np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8), scales.astype(np.float32)
+    if quantization == "float16":
+        return vectors.astype(np.float16), scales
+    if quantization == "float32":
+        return vectors, scales
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+def dequantize(stored: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """float32 rows back from quantize()"""
+    vectors = stored.astype(np.float32)
+    if stored.dtype == np.int8:
+        vectors *= scales[:, None]
+    return vectors
+
+
+def _pack(strings: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Offset-indexed block: UTF-8 bytes of all strings concatenated, and the start of each (count + 1)"""
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.concatenate(([0], np.cumsum([len(data) for data in encoded], dtype=np.int64))).astype(np.int64)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _vector_fields(vector) -> Tuple[List[float], Dict[str, Any]]:
+    """(values, metadata) of a fetched vector (dict or SDK object)"""
+    if isinstance(vector, dict):
+        return vector["values"], vector.get("metadata") or {}
+    return vector.values, vector.metadata or {}
+
+
+class IndexSnapshot:
+    """
+    Compact columnar copy of an index: vectors, IDs, namespaces and metadata (texts included).
+
+    Saved as a single uncompressed .npz file:
+        header                  JSON: version, quantization, dimension, namespace names
+        vectors, scales         quantized rows (int8, float16 or float32) and their int8 scales
+        namespaces              namespace of each row (position in the header list)
+        ids, id_offsets         offset-indexed block of the vector IDs
+        records, record_offsets offset-indexed block of the JSON metadata of each row
+
+    Rows are grouped by namespace and the records are only decoded batch by batch,
+    so a restore never holds the whole corpus as Python objects. Restoring upserts
+    the stored vectors: the embedding API is not called.
+    """
+
+    def __init__(self, header: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.header = header
+        self.arrays = arrays
+
+    @property
+    def count(self) -> int:
+        return len(self.arrays["scales"])
+
+    @property
+    def quantization(self) -> str:
+        return self.header["quantization"]
+
+    @classmethod
+    def export(
+        cls,
+        index,
+        quantization: str = "int8",
+        namespaces: List[str] = None,
+        max_workers: int = 8,
+        max_retries: int = 5,
+        progress: Callable[[int], None] = None
+    ) -> "IndexSnapshot":
+        """
+        Read every vector of an index (Pinecone Index API: describe_index_stats, list, fetch)
+
+        Args:
+            index: Index to read (Pinecone Index, LocalVectorStore or a fake).
+            quantization (str): "int8" (1 byte per dimension + a scale per row), "float16" or "float32".
+            namespaces (list): Namespaces to read (defaults to all of them).
+            max_workers (int): Fetch requests in flight.
+            max_retries (int): Retries per fetch on rate limit errors.
+            progress (callable): Called with the number of vectors of each fetched batch.
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        if namespaces is None:
+            stats = index.describe_index_stats()
+            namespaces = sorted(stats["namespaces"] if isinstance(stats, dict) else stats.namespaces)
+
+        def fetch(ids: List[str], namespace: str):
+            """One fetch request, quantized right away (the float32 values are not kept)"""
+            response = with_backoff(lambda: index.fetch(ids=ids, namespace=namespace), max_retries)
+            vectors = response["vectors"] if isinstance(response, dict) else response.vectors
+            found = [id for id in ids if id in vectors]
+            fields = [_vector_fields(vectors[id]) for id in found]
+            stored, scales = quantize([values for values, _ in fields], quantization) if found else (None, None)
+            records = [json.dumps(metadata, ensure_ascii=False) for _, metadata in fields]
+            if progress:
+                progress(len(found))
+            return found, records, stored, scales
+
+        parts = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for position, namespace in enumerate(namespaces):
+                futures = [
+                    executor.submit(fetch, page[i:i + FETCH_BATCH_SIZE], namespace)
+                    for page in index.list(namespace=namespace)
+                    for i in range(0, len(page), FETCH_BATCH_SIZE)
+                ]
+                for future in futures:
+                    found, records, stored, scales = future.result()
+                    if found:
+                        parts.append((position, found, records, stored, scales))
+
+        ids, id_offsets = _pack(id for part in parts for id in part[1])
+        records, record_offsets = _pack(record for part in parts for record in part[2])
+        arrays = {
+            "vectors": np.concatenate([part[3] for part in parts]) if parts else np.zeros((0, 0), dtype=quantization),
+            "scales": np.concatenate([part[4] for part in parts]) if parts else np.zeros(0, dtype=np.float32),
+            "namespaces": np.concatenate([np.full(len(part[1]), part[0], dtype=np.int32) for part in parts])
+                          if parts else np.zeros(0, dtype=np.int32),
+            "ids": ids, "id_offsets": id_offsets,
+            "records": records, "record_offsets": record_offsets,
+        }
+        dimension = arrays["vectors"].shape[1]
+        header = {"version": SNAPSHOT_VERSION, "quantization": quantization, "dimension": dimension, "namespaces": namespaces}
+        return cls(header, arrays)
+
+    def save(self, path: str) -> int:
+        """Write the snapshot atomically; returns its size in bytes"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        header = np.frombuffer(json.dumps(self.header, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+        with open(tmp_path, "wb") as f:
+            np.savez(f, header=header, **self.arrays)
+        tmp_path.replace(path)
+        return path.stat().st_size
+
+    @classmethod
+    def load(cls, path: str) -> "IndexSnapshot":
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        header = json.loads(arrays.pop("header").tobytes().decode("utf-8"))
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {header.get('version')}")
+        return cls(header, arrays)
+
+    def _string(self, block: str, row: int) -> str:
+        """String of a row in an offset-indexed block ("ids" or "records")"""
+        offsets = self.arrays["id_offsets" if block == "ids" else "record_offsets"]
+        return self.arrays[block][offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
+
+    def iter_batches(self, batch_size: int = PINECONE_MAX_UPSERT_SIZE) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """(namespace, Pinecone-style vector dicts) batches; a batch never mixes namespaces"""
+        names, rows = self.header["namespaces"], self.arrays["namespaces"]
+        start = 0
+        while start < self.count:
+            end = min(start + batch_size, self.count)
+            end = start + int(np.searchsorted(rows[start:end], rows[start], side="right"))
+            vectors = dequantize(self.arrays["vectors"][start:end], self.arrays["scales"][start:end])
+            yield names[rows[start]], [
+                {"id": self._string("ids", row), "values": vectors[row - start].tolist(),
+                 "metadata": json.loads(self._string("records", row))}
+                for row in range(start, end)
+            ]
+            start = end
+
+    def restore(
+        self,
+        index,
+        batch_size: int = PINECONE_MAX_UPSERT_SIZE,
+        max_workers: int = 8,
+        max_retries: int = 5,
+        progress: Callable[[int], None] = None
+    ) -> Dict[str, Any]:
+        """
+        Bulk-upsert the snapshot into an index, max_workers batches at a time
+
+        Returns:
+            dict: Stats with "vectors", "batches", "seconds" and "vectors_per_sec".
+        """
+        def upsert(namespace: str, vectors: List[Dict[str, Any]]) -> int:
+            with_backoff(lambda: index.upsert(vectors=vectors, namespace=namespace or None), max_retries)
+            return len(vectors)
+
+        def finish(future):
+            upserted = future.result()
+            if progress:
+                progress(upserted)
+
+        start = time.perf_counter()
+        batches = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = set()
+            for namespace, vectors in self.iter_batches(batch_size):
+                # Bounded queue: decoded batches are only held while in flight
+                if len(in_flight) >= 2 * max_workers:
+                    done = next(as_completed(in_flight))
+                    in_flight.remove(done)
+                    finish(done)
+                in_flight.add(executor.submit(upsert, namespace, vectors))
+                batches += 1
+            for future in as_completed(in_flight):
+                finish(future)
+
+        seconds = time.perf_counter() - start
+        return {
+            "vectors": self.count,
+            "batches": batches,
+            "seconds": seconds,
+            "vectors_per_sec": self.count / seconds if seconds > 0 else 0.0
+        }
@@ -0,0 +1,20 @@
+import unicodedata
+import re
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fold_accents(text: str) -> str:
+    """Remove diacritics (e.g. "lançamento" -> "lancamento")"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, accent-folded, whitespace-collapsed form of a query (used as cache key)"""
+    return _WHITESPACE.sub(' ', fold_accents(text).lower()).strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~3 characters per token for Portuguese text)"""
+    return len(text) // 3 + 1
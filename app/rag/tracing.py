@@ -0,0 +1,304 @@
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import threading
+import json
+import time
+import uuid
+import os
+
+DEFAULT_TRACE_PATH = ".cache/traces.jsonl"
+DEFAULT_METRICS_PATH = ".cache/metrics.prom"
+# Upper bounds (seconds) of the stage latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Trace and innermost open span of the running request (copied into asyncio tasks)
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled (or outside a trace): every call is a no-op"""
+
+    def set(self, **attributes):
+        pass
+
+    def to_dict(self):
+        return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def _reset(var: ContextVar, token):
+    try:
+        var.reset(token)
+    except ValueError:
+        # Exited in another context (e.g. a generator closed by the garbage collector)
+        var.set(None)
+
+
+class Span:
+    """Timed stage of a trace with free-form attributes (tokens, documents, cache hits, ...)"""
+
+    __slots__ = ("trace", "name", "depth", "attributes", "start", "seconds", "_token")
+
+    def __init__(self, trace: "Trace", name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.depth = 0
+        self.attributes = attributes
+        self.start = 0.0
+        self.seconds = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.depth = parent.depth + 1 if parent is not None and parent.trace is self.trace else 0
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.seconds = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _reset(_current_span, self._token)
+        self.trace.spans.append(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "depth": self.depth,
+            "offset_ms": round((self.start - self.trace.start) * 1000, 3),
+            "ms": round(self.seconds * 1000, 3) if self.seconds is not None else None,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """One request (or indexing run): the root timing and the spans of its stages"""
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = attributes
+        self.spans: List[Span] = []
+        self.timestamp = 0.0
+        self.start = 0.0
+        self.seconds = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _current_trace.set(self)
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.seconds = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _reset(_current_trace, self._token)
+        self.tracer.record(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "ms": round(self.seconds * 1000, 3) if self.seconds is not None else None,
+            "attributes": self.attributes,
+            "spans": [span.to_dict() for span in sorted(self.spans, key=lambda span: span.start)],
+        }
+
+
+class Tracer:
+    """
+    Lightweight per-stage tracing of the RAG request path and of the indexer.
+
+    A trace is opened per request (tracer.trace) and each stage runs in a span
+    (tracer.span) carrying its wall time and attributes. Finished traces are appended
+    to a JSONL file and aggregated into Prometheus text metrics (latency histogram
+    per stage, token, document and cache hit counters) written to a file, e.g. for
+    the node_exporter textfile collector.
+
+    While disabled, trace() and span() return a shared no-op object: no timing,
+    allocation or I/O happens on the request path.
+    """
+
+    def __init__(self, enabled: bool = False, trace_path: Optional[str] = DEFAULT_TRACE_PATH,
+                 metrics_path: Optional[str] = DEFAULT_METRICS_PATH):
+        """
+        Args:
+            enabled (bool): Record traces (off by default).
+            trace_path (str): JSONL file receiving one line per finished trace (None disables it).
+            metrics_path (str): Prometheus text file rewritten after each trace (None disables it).
+        """
+        self.enabled = enabled
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.metrics_path = Path(metrics_path) if metrics_path else None
+        self.last_trace: Optional[Trace] = None
+        self._lock = threading.Lock()
+        # (trace, span) -> [count, sum, bucket counts]
+        self._latency: Dict[tuple, list] = {}
+        # (metric, labels) -> value
+        self._counters: Dict[tuple, float] = {}
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Tracer configured by TRACING (true/false), TRACE_PATH and TRACE_METRICS_PATH ("none" disables a sink)"""
+        def path(name: str, default: str) -> Optional[str]:
+            value = os.getenv(name, default)
+            return None if value.lower() in ("", "none") else value
+
+        return cls(
+            enabled=os.getenv("TRACING", "").lower() == "true",
+            trace_path=path("TRACE_PATH", DEFAULT_TRACE_PATH),
+            metrics_path=path("TRACE_METRICS_PATH", DEFAULT_METRICS_PATH),
+        )
+
+    def trace(self, name: str, **attributes):
+        """
+        Context manager recording a trace (a span when a trace is already open)
+
+        Example:
+            with get_tracer().trace("run_llm", category=category):
+                ...
+        """
+        if not self.enabled:
+            return _NOOP
+        trace = _current_trace.get()
+        if trace is not None:
+            return Span(trace, name, attributes)
+        return Trace(self, name, attributes)
+
+    def span(self, name: str, **attributes):
+        """Context manager timing a stage of the current trace (no-op outside a trace)"""
+        if not self.enabled:
+            return _NOOP
+        trace = _current_trace.get()
+        if trace is None:
+            return _NOOP
+        return Span(trace, name, attributes)
+
+    def annotate(self, **attributes):
+        """Add attributes to the innermost open span (e.g. a cache hit found deep in a stage)"""
+        if not self.enabled:
+            return
+        span = _current_span.get()
+        if span is not None and span.trace is _current_trace.get():
+            span.set(**attributes)
+        else:
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.set(**attributes)
+
+    def record(self, trace: Trace):
+        """Send a finished trace to the JSONL file and the metrics"""
+        self.last_trace = trace
+        with self._lock:
+            self._observe(trace.name, "total", trace.seconds, trace.attributes)
+            for span in trace.spans:
+                self._observe(trace.name, span.name, span.seconds, span.attributes)
+            if self.trace_path is not None:
+                self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.trace_path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
+            if self.metrics_path is not None:
+                self._write_metrics()
+
+    def _observe(self, trace: str, span: str, seconds: float, attributes: Dict[str, Any]):
+        """Update the aggregates of one span (lock held)"""
+        latency = self._latency.setdefault((trace, span), [0, 0.0, [0] * len(LATENCY_BUCKETS)])
+        latency[0] += 1
+        latency[1] += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                latency[2][i] += 1
+
+        labels = (("trace", trace), ("span", span))
+        for name, value in attributes.items():
+            if isinstance(value, bool):
+                if name == "cache_hit":
+                    key = ("rag_cache_lookups_total", labels + (("result", "hit" if value else "miss"),))
+                    self._counters[key] = self._counters.get(key, 0) + 1
+            elif isinstance(value, (int, float)):
+                if "tokens" in name:
+                    key = ("rag_tokens_total", labels + (("kind", name),))
+                elif name == "documents":
+                    key = ("rag_documents_total", labels)
+                else:
+                    continue
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def render_metrics(self) -> str:
+        """Aggregated metrics in the Prometheus text exposition format"""
+        with self._lock:
+            return self._render_metrics()
+
+    def _render_metrics(self) -> str:
+        """render_metrics with the lock held"""
+        def format_labels(labels) -> str:
+            return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+        lines = [
+            "# HELP rag_stage_seconds Wall time of a traced stage",
+            "# TYPE rag_stage_seconds histogram",
+        ]
+        for (trace, span), (count, total, buckets) in sorted(self._latency.items()):
+            labels = (("trace", trace), ("span", span))
+            for bound, bucket in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f"rag_stage_seconds_bucket{format_labels(labels + (('le', str(bound)),))} {bucket}")
+            lines.append(f"rag_stage_seconds_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"rag_stage_seconds_sum{format_labels(labels)} {total:.6f}")
+            lines.append(f"rag_stage_seconds_count{format_labels(labels)} {count}")
+
+        help_texts = {
+            "rag_tokens_total": "Tokens counted by a traced stage (kind is the attribute name)",
+            "rag_documents_total": "Documents returned by a traced stage",
+            "rag_cache_lookups_total": "Cache lookups of a traced stage by result",
+        }
+        for metric, help_text in help_texts.items():
+            samples = sorted((labels, value) for (name, labels), value in self._counters.items() if name == metric)
+            if samples:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                lines += [f"{metric}{format_labels(labels)} {value:g}" for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+    def _write_metrics(self):
+        """Rewrite the metrics file atomically (lock held)"""
+        text = self._render_metrics()
+        self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.metrics_path.with_name(f"{self.metrics_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, self.metrics_path)
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide Tracer (configured from the environment on first use)"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_env()
+    return _tracer
@@ -1,40 +1,397 @@
-from typing import List, Dict, Any
-from langchain_voyageai import VoyageAIEmbeddings
-from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from langchain.schema import Document
 from dotenv import load_dotenv
+from .manifest import IndexManifest, assign_chunk_ids
+from .loader import PARTITION_KEY
+from .embedding_cache import voyage_embeddings
+from .local_index import LocalVectorStore
+from .index_generation import IndexGeneration
+from .text_utils import estimate_tokens
+import random
+import time
+import uuid
 import os
 
+# Provider limits for a single request
+VOYAGE_MAX_BATCH_SIZE = 128  # voyage-3: max texts per embedding request
+VOYAGE_MAX_BATCH_TOKENS = 120_000  # voyage-3: max tokens per embedding request
+PINECONE_MAX_UPSERT_SIZE = 100  # Pinecone: recommended vectors per upsert request
+PINECONE_MAX_DELETE_SIZE = 1000  # Pinecone: max IDs per delete request
+
+DEFAULT_LOCAL_INDEX_PATH = "data/local_index"
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check whether a provider error is an HTTP 429 / rate limit response"""
+    response = getattr(error, "response", None)
+    for status in (getattr(error, "status", None), getattr(error, "status_code", None),
+                   getattr(error, "http_status", None), getattr(response, "status_code", None)):
+        if status == 429:
+            return True
+    return type(error).__name__ == "RateLimitError" or "429" in str(error)
+
+
+def with_backoff(fn: Callable, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 30.0):
+    """Call fn, retrying with exponential backoff and jitter on rate limit errors"""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries or not is_rate_limit_error(e):
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
 class VectorStoreHandler:
-    def __init__(self, index_name: str):
+    def __init__(self, index_name: str, embeddings=None, index=None, backend: str = None, local_path: str = None,
+                 partitioned: bool = None):
+        """
+        Args:
+            index_name (str): Pinecone index name.
+            embeddings: Optional embeddings instance (defaults to cached VoyageAI voyage-3).
+            index: Optional index object exposing the Pinecone Index API (upsert, delete, query).
+                   When given, no Pinecone client is created.
+            backend (str): "pinecone" or "local" (defaults to the VECTOR_BACKEND env var, then "pinecone").
+            local_path (str): Snapshot directory of the local backend (defaults to LOCAL_INDEX_PATH).
+            partitioned (bool): Write every partition (chunk "partition" metadata) to its own namespace
+                                and search only the namespaces a request is scoped to (defaults to
+                                the INDEX_PARTITIONED env var, off unless "true"). The local backend
+                                keeps one matrix and scopes searches with the partition metadata filter.
+        """
         load_dotenv()
-        
-        # Initialize Pinecone
-        pinecone = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        
+
         self.index_name = index_name
-        self.embeddings = VoyageAIEmbeddings(voyage_api_key=os.getenv("VOYAGE_API_KEY"), model="voyage-3")
-        
-        # Create index if it doesn't exist
-        if self.index_name not in [k["name"] for k in pinecone.list_indexes()]:
-            pinecone.create_index(
-                name=self.index_name,
-                metric='cosine',
-                dimension=1024 ,
-                spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+        self.embeddings = embeddings or voyage_embeddings(model="voyage-3")
+        self.backend = backend or os.getenv("VECTOR_BACKEND", "pinecone")
+        if partitioned is None:
+            partitioned = os.getenv("INDEX_PARTITIONED", "false").lower() == "true"
+        self.partitioned = partitioned
+
+        # Changed on every write so caches of answers built on the index can be invalidated
+        self.generation = IndexGeneration.for_index(index_name)
+
+        if self.backend == "local":
+            # In-process index: serves both as index and as LangChain vector store
+            self.index = LocalVectorStore(
+                self.embeddings, path=local_path or os.getenv("LOCAL_INDEX_PATH", DEFAULT_LOCAL_INDEX_PATH)
             )
-        
-        self.index = pinecone.Index(self.index_name)
+            self.vectorstore = self.index
+            return
+
+        if self.backend != "pinecone":
+            raise ValueError(f"Unknown vector store backend: {self.backend}")
+
+        # The Pinecone SDK is only imported by the pinecone backend
+        from pinecone import Pinecone, ServerlessSpec
+        from langchain_pinecone import PineconeVectorStore
+
+        if index is None:
+            # Initialize Pinecone
+            pinecone = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+
+            # Create index if it doesn't exist
+            if self.index_name not in [k["name"] for k in pinecone.list_indexes()]:
+                pinecone.create_index(
+                    name=self.index_name,
+                    metric='cosine',
+                    dimension=1024 ,
+                    spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+                )
+
+            index = pinecone.Index(self.index_name)
+
+        self.index = index
         self.vectorstore = PineconeVectorStore(self.index, self.embeddings, "text")
-    
+        if self.partitioned:
+            from .partitioned_store import PartitionedVectorStore
+
+            self.vectorstore = PartitionedVectorStore(self.vectorstore, self.index, generation=self.generation)
+
     def add_texts(self, texts: List[str], metadatas: List[Dict[str, Any]] = None) -> List[str]:
         """Add texts to the vector store"""
-        return self.vectorstore.add_texts(texts, metadatas)
-    
+        ids = self.vectorstore.add_texts(texts, metadatas)
+        self.generation.bump()
+        return ids
+
+    def add_texts_bulk(
+        self,
+        texts: List[str],
+        metadatas: List[Dict[str, Any]] = None,
+        ids: List[str] = None,
+        namespaces: List[str] = None,
+        batch_size: int = VOYAGE_MAX_BATCH_SIZE,
+        max_workers: int = 4,
+        max_retries: int = 5,
+        progress: Callable[[int], None] = None
+    ) -> Dict[str, Any]:
+        """
+        Embed and upsert texts in batches, running up to max_workers batches concurrently.
+
+        Batches are capped by the Voyage request limits, upserts by the Pinecone request
+        size. Rate limited (429) calls are retried with exponential backoff.
+
+        Args:
+            texts (list): Texts to index.
+            metadatas (list): Optional metadata for each text.
+            ids (list): Optional vector IDs (random UUIDs when omitted).
+            namespaces (list): Optional namespace of each text (default namespace when omitted).
+                               A batch never mixes namespaces, so group texts by namespace.
+            batch_size (int): Maximum texts per embedding request.
+            max_workers (int): Maximum number of batches in flight.
+            max_retries (int): Retries per provider call on rate limit errors.
+            progress (callable): Called with the number of chunks of each finished batch.
+
+        Returns:
+            dict: Stats with "ids", "chunks", "batches", "seconds" and "chunks_per_sec".
+        """
+        start = time.perf_counter()
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        batches = list(self._iter_batches(texts, min(batch_size, VOYAGE_MAX_BATCH_SIZE), namespaces))
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        self._index_batch, texts[s:e], metadatas[s:e], ids[s:e], max_retries,
+                        namespaces[s] if namespaces else None
+                    )
+                    for s, e in batches
+                ]
+                for future in as_completed(futures):
+                    indexed = future.result()
+                    if progress:
+                        progress(indexed)
+        finally:
+            # Partially applied batches also change what the index returns
+            self.generation.bump()
+
+        seconds = time.perf_counter() - start
+        return {
+            "ids": ids,
+            "chunks": len(texts),
+            "batches": len(batches),
+            "seconds": seconds,
+            "chunks_per_sec": len(texts) / seconds if seconds > 0 else 0.0
+        }
+
+    def _iter_batches(self, texts: List[str], batch_size: int, namespaces: List[str] = None) -> Iterator[Tuple[int, int]]:
+        """Yield (start, end) ranges holding at most batch_size texts and the token limit, in a single namespace"""
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            text_tokens = estimate_tokens(text)
+            if i > start and (i - start >= batch_size or tokens + text_tokens > VOYAGE_MAX_BATCH_TOKENS
+                              or (namespaces and namespaces[i] != namespaces[start])):
+                yield start, i
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(texts):
+            yield start, len(texts)
+
+    def _index_batch(self, texts: List[str], metadatas: List[Dict[str, Any]], ids: List[str], max_retries: int,
+                     namespace: str = None) -> int:
+        """Embed one batch with a single provider call and upsert it"""
+        embeddings = with_backoff(lambda: self.embeddings.embed_documents(texts), max_retries)
+        vectors = [
+            {"id": id, "values": values, "metadata": {**metadata, "text": text}}
+            for id, values, metadata, text in zip(ids, embeddings, metadatas, texts)
+        ]
+        for i in range(0, len(vectors), PINECONE_MAX_UPSERT_SIZE):
+            batch = vectors[i:i + PINECONE_MAX_UPSERT_SIZE]
+            with_backoff(lambda: self.index.upsert(vectors=batch, namespace=namespace), max_retries)
+        return len(texts)
+
+    def sync_documents(
+        self,
+        chunks: List[Document],
+        manifest: IndexManifest,
+        partitions: Iterable[str] = None,
+        **bulk_kwargs
+    ) -> Dict[str, Any]:
+        """
+        Incrementally index chunks against a manifest of what is already in the index.
+
+        Every chunk gets a deterministic ID, so only new or changed chunks are embedded
+        and upserted, and vectors of chunks that no longer exist are deleted. When the
+        manifest predates the current chunk metadata (IndexManifest.stale), every chunk is
+        upserted again (the embedding cache avoids re-embedding unchanged texts), and so
+        is every chunk when the index turns out empty while the manifest is not. The
+        manifest is saved only after the index has been updated (and, for the local
+        backend, persisted). A partitioned index
+        gets every chunk in the namespace of its partition.
+
+        Args:
+            chunks (list): All current chunks (of the synced partitions), in document order.
+            manifest (IndexManifest): Manifest of the previous run (updated in place).
+            partitions (list): Partitions being synced (defaults to all). Sources recorded in
+                               other partitions are left untouched, so reindexing one campaign
+                               only loads, compares and deletes within that campaign.
+            **bulk_kwargs: Passed through to add_texts_bulk.
+
+        Returns:
+            dict: Stats with "added", "deleted", "unchanged", "partitions" (chunks added per
+                  partition) and the add_texts_bulk stats.
+        """
+        if manifest.sources and manifest.namespaced != self.partitioned:
+            raise ValueError(
+                "The manifest was written for a "
+                f"{'partitioned' if manifest.namespaced else 'single namespace'} index: run a full reindex"
+            )
+        if manifest.sources and not self._stats().get("total_vector_count"):
+            # The index was emptied behind the manifest's back (e.g. deleted in the console)
+            manifest.clear()
+        if manifest.stale and partitions is not None:
+            # Only an unscoped sync re-upserts every source (and then records the new version)
+            raise ValueError(
+                f"The index holds chunks with metadata version {manifest.metadata_version}: "
+                "run a sync of every partition first (index_documents.py without --partition)"
+            )
+
+        ids = assign_chunk_ids(chunks)
+
+        current, source_partitions = {}, {}
+        for chunk, id in zip(chunks, ids):
+            source = chunk.metadata.get('file_path', '')
+            current.setdefault(source, []).append(id)
+            source_partitions[source] = chunk.metadata.get(PARTITION_KEY, '')
+
+        sources = None
+        if partitions is not None:
+            sources = manifest.sources_in(partitions) | set(current)
+        to_upsert, to_delete = manifest.plan(current, sources)
+
+        # Grouped by partition, so that every batch is upserted into a single namespace
+        new_chunks = [(chunk, id) for chunk, id in zip(chunks, ids) if id in to_upsert]
+        new_chunks.sort(key=lambda pair: pair[0].metadata.get(PARTITION_KEY, ''))
+        added: Dict[str, int] = {}
+        for chunk, _ in new_chunks:
+            partition = chunk.metadata.get(PARTITION_KEY, '')
+            added[partition] = added.get(partition, 0) + 1
+
+        stats = {"chunks": 0, "seconds": 0.0, "chunks_per_sec": 0.0}
+        if new_chunks:
+            stats = self.add_texts_bulk(
+                texts=[chunk.page_content for chunk, _ in new_chunks],
+                metadatas=[chunk.metadata for chunk, _ in new_chunks],
+                ids=[id for _, id in new_chunks],
+                namespaces=[self._namespace(chunk.metadata.get(PARTITION_KEY, '')) for chunk, _ in new_chunks],
+                **bulk_kwargs
+            )
+        if to_delete:
+            by_namespace: Dict[str, List[str]] = {}
+            for source in manifest.sources if sources is None else sources:
+                namespace = self._namespace(manifest.partitions.get(source, ''))
+                by_namespace.setdefault(namespace, []).extend(
+                    id for id in manifest.sources.get(source, []) if id in to_delete
+                )
+            for namespace, namespace_ids in by_namespace.items():
+                if namespace_ids:
+                    self.delete(sorted(namespace_ids), namespace=namespace)
+
+        # Manifest last: it must never record chunks the persisted index does not hold
+        self.save()
+        manifest.update(current, source_partitions, sources)
+        manifest.namespaced = self.partitioned
+        manifest.save()
+
+        return {
+            **stats,
+            "added": len(new_chunks),
+            "deleted": len(to_delete),
+            "unchanged": len(ids) - len(new_chunks),
+            "partitions": added
+        }
+
+    def _namespace(self, partition: str) -> str:
+        """Namespace holding a partition (None: the default namespace of an unpartitioned index)"""
+        return partition if self.partitioned else None
+
+    def delete(self, ids: List[str], namespace: str = None):
+        """Delete vectors by ID (from one namespace of a partitioned index)"""
+        for i in range(0, len(ids), PINECONE_MAX_DELETE_SIZE):
+            batch = ids[i:i + PINECONE_MAX_DELETE_SIZE]
+            with_backoff(lambda: self.index.delete(ids=batch, namespace=namespace))
+        self.generation.bump()
+
     def similarity_search(self, query: str, k: int = 4) -> List[Dict]:
         """Search for similar documents"""
         return self.vectorstore.similarity_search(query, k=k)
-    
-    def delete_all(self):
-        """Delete all vectors in the index"""
-        self.index.delete(delete_all=True)
+
+    def delete_all(self, manifest: IndexManifest = None):
+        """
+        Delete all vectors in the index (in every namespace)
+
+        Args:
+            manifest (IndexManifest): Manifest of the index, cleared and saved once the
+                                      vectors are gone (otherwise the next incremental sync
+                                      would consider every chunk already indexed).
+        """
+        if self.backend == "local":
+            self.index.delete(delete_all=True)
+        else:
+            for namespace in self._stats()["namespaces"]:
+                self.index.delete(delete_all=True, namespace=namespace)
+        self.generation.bump()
+        if manifest is not None:
+            manifest.clear()
+            manifest.save()
+
+    def _stats(self) -> Dict[str, Any]:
+        """describe_index_stats as a dict ("namespaces", "total_vector_count")"""
+        stats = self.index.describe_index_stats()
+        if isinstance(stats, dict):
+            return stats
+        return {"namespaces": stats.namespaces, "total_vector_count": stats.total_vector_count}
+
+    def save(self):
+        """Persist a snapshot of the local backend (no-op for Pinecone)"""
+        if self.backend == "local":
+            self.index.save()
+
+    def export_snapshot(self, path: str, quantization: str = "int8", **kwargs) -> Dict[str, Any]:
+        """
+        Write every vector, ID and metadata of the index (all namespaces) to a compact snapshot file
+
+        Args:
+            path (str): Snapshot file (.npz).
+            quantization (str): "int8", "float16" or "float32".
+            **kwargs: Passed through to IndexSnapshot.export (max_workers, progress, ...).
+
+        Returns:
+            dict: Stats with "vectors", "bytes", "float32_bytes" (size of the raw vectors alone) and "seconds".
+        """
+        from .snapshot import IndexSnapshot
+
+        start = time.perf_counter()
+        snapshot = IndexSnapshot.export(self.index, quantization, **kwargs)
+        size = snapshot.save(path)
+        return {
+            "vectors": snapshot.count,
+            "bytes": size,
+            "float32_bytes": snapshot.count * snapshot.header["dimension"] * 4,
+            "seconds": time.perf_counter() - start
+        }
+
+    def restore_snapshot(self, path: str, **kwargs) -> Dict[str, Any]:
+        """
+        Bulk-upsert a snapshot written by export_snapshot, without calling the embedding API
+
+        The vectors keep their IDs and namespaces, so the index manifest of the exported
+        index stays valid and the next index_documents.py run only syncs what changed since.
+
+        Args:
+            path (str): Snapshot file (.npz).
+            **kwargs: Passed through to IndexSnapshot.restore (batch_size, max_workers, progress, ...).
+
+        Returns:
+            dict: Stats with "vectors", "batches", "seconds" and "vectors_per_sec".
+        """
+        from .snapshot import IndexSnapshot
+
+        snapshot = IndexSnapshot.load(path)
+        try:
+            return snapshot.restore(self.index, **kwargs)
+        finally:
+            self.generation.bump()
@@ -0,0 +1,107 @@
+"""
+Latency of the synchronous run_llm path vs. arun_llm, where the topic guardrail overlaps
+with query embedding and retrieval, and throughput of many concurrent sessions
+(a thread per request vs. a single event loop).
+
+The topic guardrail is forced into its LLM fallback (--theme-band -1 2) by default,
+i.e. the worst case of one extra LLM round trip per request.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_async --requests 20 --sessions 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.agent.agent import arun_llm, run_llm
+from app.agent.guard.theme_based_guardrail import ThemeBasedGuardrail
+from app.agent.pipeline import RagPipeline
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakeVectorStore, synthetic_texts
+
+QUERY = "Gere uma mensagem de CRM de contagem regressiva para o curso de Python"
+
+
+def build_pipeline(args) -> RagPipeline:
+    embedding = FakeEmbeddings(latency=args.embed_latency)
+    vectorstore = FakeVectorStore(embedding, query_latency=args.query_latency)
+    vectorstore.add_texts(synthetic_texts(args.corpus), metadatas=[{"file_path": f"doc_{i}.md"} for i in range(args.corpus)])
+    theme_guardrail = ThemeBasedGuardrail(
+        embedding=embedding,
+        llm=FakeChatModel(response="true", latency=args.llm_latency),
+        ambiguity_band=tuple(args.theme_band),
+    )
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+    return RagPipeline(embedding=embedding, vectorstore=vectorstore, llm=llm, theme_guardrail=theme_guardrail)
+
+
+def queries(count: int, offset: int = 0) -> list:
+    """Distinct requests, so no memoized decision or cached answer is reused"""
+    return [f"{QUERY} turma {offset + i}" for i in range(count)]
+
+
+def sequential_sync(pipeline, requests) -> list:
+    timings = []
+    for query in requests:
+        start = time.perf_counter()
+        run_llm(query, pipeline=pipeline, use_cache=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def sequential_async(pipeline, requests) -> list:
+    timings = []
+    for query in requests:
+        start = time.perf_counter()
+        await arun_llm(query, pipeline=pipeline, use_cache=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def concurrent_sync(pipeline, requests, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda query: run_llm(query, pipeline=pipeline, use_cache=False), requests))
+    return time.perf_counter() - start
+
+
+async def concurrent_async(pipeline, requests) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(arun_llm(query, pipeline=pipeline, use_cache=False) for query in requests))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20, help="Sequential requests per mode")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent requests")
+    parser.add_argument("--threads", type=int, default=8, help="Thread pool size of the synchronous concurrent run")
+    parser.add_argument("--corpus", type=int, default=300)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--query-latency", type=float, default=0.02)
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Latency of each LLM call before its first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.001)
+    parser.add_argument("--theme-band", type=float, nargs=2, default=[-1.0, 2.0], help="Ambiguity band sent to the LLM")
+    args = parser.parse_args()
+
+    pipeline = build_pipeline(args)
+
+    sync_timings = sequential_sync(pipeline, queries(args.requests))
+    async_timings = asyncio.run(sequential_async(pipeline, queries(args.requests, offset=args.requests)))
+
+    print(f"{'single request':<26}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}")
+    for label, timings in (("run_llm (sequential)", sync_timings), ("arun_llm (overlapped)", async_timings)):
+        print(f"{label:<26}{statistics.mean(timings):>10.1f}{statistics.median(timings):>10.1f}{max(timings):>10.1f}")
+
+    offset = 2 * args.requests
+    sync_seconds = concurrent_sync(pipeline, queries(args.sessions, offset), args.threads)
+    async_seconds = asyncio.run(concurrent_async(pipeline, queries(args.sessions, offset + args.sessions)))
+
+    print(f"\n{f'{args.sessions} concurrent requests':<26}{'seconds':>10}{'req/s':>10}")
+    for label, seconds in ((f"run_llm, {args.threads} threads", sync_seconds), ("arun_llm, 1 event loop", async_seconds)):
+        print(f"{label:<26}{seconds:>10.2f}{args.sessions / seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
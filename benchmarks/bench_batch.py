@@ -0,0 +1,114 @@
+"""
+Batch generation: throughput of app.agent.batch against fake providers.
+
+Runs a spreadsheet-like set of countdown requests (several per course launch) through
+BatchRunner with injected embedding and LLM latency, and compares:
+  - one request at a time (the UI / run_llm path);
+  - concurrent requests, each with its own retrieval;
+  - concurrent requests sharing the retrieval of their course (--retrieval-template);
+  - the same under a Groq token budget (token bucket throttling);
+  - the same with every n-th embedding request failing with HTTP 429 (backoff retries);
+  - a resumed run over a checkpoint holding half of the answers.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_batch --courses 10 --messages 4 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import tempfile
+from pathlib import Path
+
+from app.agent.batch import BatchRunner, read_checkpoint
+from app.agent.pipeline import RagPipeline
+from app.agent.scheduler import GROQ_TOKENS_PER_MINUTE, ProviderLimiter
+from app.rag.local_index import LocalVectorStore
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, synthetic_texts
+
+
+def fake_pipeline(latency: float = 0.05, llm_latency: float = 0.5, rate_limit_every: int = 0) -> RagPipeline:
+    """
+    Offline pipeline: fake Voyage and Groq clients over a synthetic in-process index
+
+    Args:
+        latency (float): Embedding request latency (s).
+        llm_latency (float): LLM request latency (s).
+        rate_limit_every (int): Make every n-th embedding request fail with HTTP 429 (0: never).
+    """
+    embedding = FakeEmbeddings(dimension=256, latency=latency, rate_limit_every=rate_limit_every)
+    vectorstore = LocalVectorStore(embedding)
+    texts = synthetic_texts(500)
+    vectorstore.add_texts(texts, [{"file_path": f"material_{i // 10}.docx"} for i in range(len(texts))])
+    return RagPipeline(
+        embedding=embedding, vectorstore=vectorstore, llm=FakeChatModel(latency=llm_latency), mmr_lambda=0.5
+    )
+
+
+def requests_for(courses: int, messages: int, shared: bool) -> list:
+    requests = []
+    for course in range(courses):
+        for days in range(messages):
+            query = f"Gere uma mensagem de contagem regressiva ({days} dias) para o lançamento do curso {course}"
+            requests.append({
+                "id": f"{course}-{days}",
+                "query": query,
+                "retrieval_query": f"contagem regressiva lançamento curso {course}" if shared else query,
+                "category": None,
+                "partitions": None,
+            })
+    return requests
+
+
+def run(args, requests: list, checkpoint: Path, concurrency: int, groq_tpm: float = None, rate_limit_every: int = 0) -> dict:
+    runner = BatchRunner(
+        fake_pipeline(latency=args.embed_latency, llm_latency=args.llm_latency, rate_limit_every=rate_limit_every),
+        llm_limiter=ProviderLimiter("groq", tokens_per_minute=groq_tpm),
+        embedding_limiter=ProviderLimiter("voyage"),
+        concurrency=concurrency,
+        route=lambda query, category, partitions: partitions,
+    )
+    return asyncio.run(runner.run(requests, str(checkpoint)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=4, help="Countdown messages per course")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--embed-latency", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--groq-tpm", type=float, default=GROQ_TOKENS_PER_MINUTE, help="Groq token budget of the throttled run")
+    args = parser.parse_args()
+
+    total = args.courses * args.messages
+    print(f"{total} requests ({args.courses} courses x {args.messages} messages), "
+          f"embedding {args.embed_latency * 1000:.0f} ms, LLM {args.llm_latency * 1000:.0f} ms\n")
+    print(f"{'run':<40}{'answered':>9}{'retrievals':>11}{'seconds':>9}{'req/min':>9}{'throttled s':>12}{'retries':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [
+            ("sequential", requests_for(args.courses, args.messages, False), {"concurrency": 1}),
+            ("concurrent", requests_for(args.courses, args.messages, False), {"concurrency": args.concurrency}),
+            ("concurrent, shared retrieval", requests_for(args.courses, args.messages, True), {"concurrency": args.concurrency}),
+            (f"  + Groq budget {args.groq_tpm:.0f} tokens/min", requests_for(args.courses, args.messages, True),
+             {"concurrency": args.concurrency, "groq_tpm": args.groq_tpm}),
+            ("  + 429 on every 4th embedding", requests_for(args.courses, args.messages, False),
+             {"concurrency": args.concurrency, "rate_limit_every": 4}),
+        ]
+        for i, (name, requests, options) in enumerate(runs):
+            stats = run(args, requests, Path(tmp) / f"run_{i}.jsonl", **options)
+            throttled = stats["groq"]["throttled_seconds"] + stats["voyage"]["throttled_seconds"]
+            retries = stats["groq"]["retries"] + stats["voyage"]["retries"]
+            print(f"{name:<40}{stats['answered']:>9}{stats['retrievals']:>11}{stats['seconds']:>9.2f}"
+                  f"{stats['requests_per_min']:>9.0f}{throttled:>12.2f}{retries:>8}")
+
+        # Interrupted halfway: keep half of the checkpoint (and a cut line), then resume
+        checkpoint = Path(tmp) / "run_2.jsonl"
+        lines = checkpoint.read_text(encoding="utf-8").splitlines(keepends=True)
+        checkpoint.write_text("".join(lines[:total // 2]) + lines[total // 2][:20], encoding="utf-8")
+        stats = run(args, requests_for(args.courses, args.messages, True), checkpoint, concurrency=args.concurrency)
+        print(f"{'resumed (half answered)':<40}{stats['answered']:>9}{stats['retrievals']:>11}{stats['seconds']:>9.2f}"
+              f"{stats['requests_per_min']:>9.0f}{'':>12}{'':>8}")
+        assert len(read_checkpoint(str(checkpoint))) == total
+
+
+if __name__ == "__main__":
+    main()
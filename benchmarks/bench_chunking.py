@@ -0,0 +1,96 @@
+"""
+Chunking: the recursive character splitter (chunk_size=500, chunk_overlap=50) vs. the
+heading-aware markdown mode of DocumentProcessor (token budget per chunk).
+
+Compares chunks per document, chunking throughput (MB/s of markdown), the embedding
+token volume of the chunks (what the indexer pays the provider for) and the share of
+chunks that mix the end of one section with the start of another.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_chunking --documents 500 --max-tokens 256
+"""
+import argparse
+import re
+import time
+
+from app.rag.document_processor import DocumentProcessor
+from app.rag.text_utils import estimate_tokens
+from benchmarks.fakes import synthetic_texts
+
+_HEADING_LINE = re.compile(r"^#{1,6} ", re.MULTILINE)
+
+
+def synthetic_markdown(count: int, sections: int) -> list:
+    """Markdown shaped like the DataPreProcessor output: headings, paragraphs, lists and a table"""
+    documents = []
+    for i in range(count):
+        texts = synthetic_texts(sections * 4, seed=i)
+        blocks = [f"# Campanha {i}\n"]
+        for s in range(sections):
+            blocks.append(f"## Etapa {s + 1}\n")
+            blocks.append(" ".join(texts[s * 4:s * 4 + 2 + s % 3]) + "\n")
+            if s % 3 == 1:
+                blocks.append("\n".join(f"- {text[:60]}" for text in texts[s * 4 + 2:s * 4 + 4]) + "\n")
+            if s % 5 == 4:
+                blocks.append("| Dia | Canal |\n|---|---|\n" + "\n".join(f"| {d} | e-mail |" for d in range(1, 6)) + "\n")
+        documents.append({"content": "\n".join(blocks), "metadata": {"file_path": f"doc_{i}.md"}})
+    return documents
+
+
+def mixes_sections(chunk: str) -> bool:
+    """A heading after body text: the chunk ends one section and starts another"""
+    first = _HEADING_LINE.search(chunk)
+    if first is None:
+        return False
+    if first.start() > 0 and chunk[:first.start()].strip():
+        return True
+    # Body text followed by another heading
+    body_seen = False
+    for line in chunk.splitlines():
+        if _HEADING_LINE.match(line):
+            if body_seen:
+                return True
+        elif line.strip():
+            body_seen = True
+    return False
+
+
+def measure(processor: DocumentProcessor, documents: list, repeat: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chunks = list(processor.iter_chunks(documents))
+    seconds = (time.perf_counter() - start) / repeat
+    megabytes = sum(len(document["content"].encode("utf-8")) for document in documents) / 1e6
+    tokens = [estimate_tokens(chunk.page_content) for chunk in chunks]
+    return {
+        "chunks": len(chunks),
+        "chunks_per_doc": len(chunks) / len(documents),
+        "mb_per_sec": megabytes / seconds,
+        "embedding_tokens": sum(tokens),
+        "max_tokens": max(tokens),
+        "mixed": sum(mixes_sections(chunk.page_content) for chunk in chunks) / len(chunks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--sections", type=int, default=12, help="Sections per document")
+    parser.add_argument("--max-tokens", type=int, default=256, help="Token budget of the markdown mode")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    documents = synthetic_markdown(args.documents, args.sections)
+    results = {
+        "recursive (500/50 chars)": measure(DocumentProcessor(chunk_size=500, chunk_overlap=50), documents, args.repeat),
+        f"markdown ({args.max_tokens} tokens)": measure(DocumentProcessor(mode="markdown", max_tokens=args.max_tokens), documents, args.repeat),
+    }
+
+    print(f"{'splitter':<26}{'chunks':>8}{'per doc':>9}{'MB/s':>8}{'emb. tokens':>13}{'max tok':>9}{'mixed':>8}")
+    for label, result in results.items():
+        print(f"{label:<26}{result['chunks']:>8}{result['chunks_per_doc']:>9.1f}{result['mb_per_sec']:>8.2f}"
+              f"{result['embedding_tokens']:>13,}{result['max_tokens']:>9}{result['mixed']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
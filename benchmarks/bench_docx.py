@@ -0,0 +1,92 @@
+"""
+DOCX-to-markdown conversion throughput on large synthetic documents.
+
+Compares the run-based converter (DataPreProcessor.docx_to_markdown) with the
+previous per-run str.replace implementation, kept below for reference.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_docx --paragraphs 400 --runs 60
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from docx import Document
+
+from app.pre_processor import DataPreProcessor
+
+
+def legacy_docx_to_markdown(docx_path: Path) -> str:
+    """Previous converter: rescans the paragraph text once per formatted run"""
+    doc = Document(str(docx_path))
+    markdown_content = []
+    for paragraph in doc.paragraphs:
+        if paragraph.text.strip():
+            if paragraph.style.name.startswith('Heading'):
+                markdown_content.append(f"{'#' * int(paragraph.style.name[-1])} {paragraph.text}\n")
+            else:
+                text = paragraph.text
+                for run in paragraph.runs:
+                    if run.bold:
+                        text = text.replace(run.text, f"**{run.text}**")
+                    if run.italic:
+                        text = text.replace(run.text, f"*{run.text}*")
+                markdown_content.append(f"{text}\n")
+    return "\n".join(markdown_content)
+
+
+def write_synthetic_docx(path: Path, paragraphs: int, runs: int):
+    """Heavily formatted document: headings, long mixed-format paragraphs, lists and a table"""
+    doc = Document()
+    words = ["campanha", "lançamento", "inscrições", "abertas", "live", "curso", "Python", "desconto", "vagas", "limitadas"]
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            doc.add_heading(f"Seção {i // 20}", level=1 + (i // 20) % 2)
+        if i % 10 == 5:
+            doc.add_paragraph(f"Item de checklist {i}", style="List Bullet")
+            continue
+        paragraph = doc.add_paragraph()
+        for j in range(runs):
+            run = paragraph.add_run(f"{words[(i + j) % len(words)]} {j} ")
+            run.bold = j % 3 == 0
+            run.italic = j % 4 == 0
+    table = doc.add_table(rows=20, cols=4)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"célula {r}.{c}"
+    doc.save(str(path))
+
+
+def measure(fn, path: Path, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = fn(path)
+    return (time.perf_counter() - start) / repeat, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=60, help="Formatted runs per paragraph")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "synthetic.docx"
+        write_synthetic_docx(path, args.paragraphs, args.runs)
+        preprocessor = DataPreProcessor(raw_data_dir=tmp, processed_data_dir=tmp)
+
+        results = {
+            "legacy (str.replace)": measure(legacy_docx_to_markdown, path, args.repeat),
+            "run-based": measure(preprocessor.docx_to_markdown, path, args.repeat),
+        }
+
+    print(f"document: {args.paragraphs} paragraphs x {args.runs} runs, {path.name}")
+    print(f"{'converter':<22}{'seconds':>10}{'paragraphs/s':>15}{'output MB/s':>14}")
+    for label, (seconds, output) in results.items():
+        print(f"{label:<22}{seconds:>10.3f}{args.paragraphs / seconds:>15,.0f}{len(output.encode()) / seconds / 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Offline end-to-end benchmark: synthetic DOCX corpus -> DataPreProcessor -> MarketingDataLoader
+-> DocumentProcessor -> VectorStoreHandler.sync_documents -> run_llm.
+
+No API keys are needed: embeddings, vector index and chat model are the deterministic fakes
+of benchmarks/fakes.py, with configurable injected latency. Reports preprocessing files/sec,
+chunking MB/sec, indexing chunks/sec and query p50/p95/p99 latency, and saves them as JSON
+(by default .cache/benchmarks/e2e_<commit>.json) so runs of different commits can be compared.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_e2e --files 200 --requests 100
+    python -m benchmarks.bench_e2e --compare .cache/benchmarks/e2e_<previous commit>.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from docx import Document
+
+from app.agent.agent import run_llm
+from app.agent.pipeline import RagPipeline
+from app.pre_processor import DataPreProcessor
+from app.rag.document_processor import DocumentProcessor
+from app.rag.loader import MarketingDataLoader
+from app.rag.manifest import IndexManifest
+from app.rag.vector_store import VectorStoreHandler
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakePineconeIndex
+
+CATEGORIES = ["1. Lançamentos/Python", "1. Lançamentos/Dados", "2. Perpétuo/Excel", "3. Eventos/Imersão Power BI"]
+PIECES = ["E-mail", "WhatsApp", "Post Instagram", "Roteiro de Live", "Página de Vendas"]
+PHRASES = [
+    "a contagem regressiva para a live começa hoje",
+    "as inscrições ficam abertas até domingo às 23h59",
+    "use um tom próximo e uma chamada para ação clara",
+    "destaque o bônus exclusivo para quem entrar na primeira turma",
+    "lembre o público-alvo do problema que o curso resolve",
+    "reforce a data e o horário da aula de abertura",
+]
+REQUESTS = [
+    "Gere uma mensagem de CRM de contagem regressiva para o curso de {course}",
+    "Escreva um e-mail de lançamento da turma de {course} com desconto",
+    "Crie um roteiro de live de abertura da imersão de {course}",
+    "Sugira um post de Instagram anunciando as inscrições de {course}",
+]
+
+
+def write_corpus(raw_dir: Path, files: int, paragraphs: int):
+    """DOCX files spread over category folders: headings, formatted runs, lists and a table"""
+    for i in range(files):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        folder = raw_dir / category / f"{1 + i // len(CATEGORIES) % 5}. Campanha {i // 20}"
+        folder.mkdir(parents=True, exist_ok=True)
+
+        course = category.split("/")[-1]
+        doc = Document()
+        doc.add_heading(f"{PIECES[i % len(PIECES)]} {course} {i}", level=1)
+        for j in range(paragraphs):
+            if j % 8 == 0:
+                doc.add_heading(f"Etapa {j // 8 + 1}", level=2)
+            if j % 8 == 7:
+                doc.add_paragraph(f"{PHRASES[(i + j) % len(PHRASES)].capitalize()}.", style="List Bullet")
+                continue
+            paragraph = doc.add_paragraph()
+            for k in range(4):
+                run = paragraph.add_run(f"{PHRASES[(i + j + k) % len(PHRASES)].capitalize()} ({course}, peça {i}.{j}). ")
+                run.bold = k == 1
+                run.italic = k == 3
+        if i % 5 == 0:
+            table = doc.add_table(rows=4, cols=3)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"Dia {r + 1}, bloco {c + 1}"
+        doc.save(str(folder / f"{i}- {PIECES[i % len(PIECES)]} {course}.docx"))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def latency_stats(timings: list) -> dict:
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "mean_ms": float(np.mean(timings)),
+    }
+
+
+def run(args, workdir: Path) -> dict:
+    raw_dir, processed_dir = workdir / "raw", workdir / "processed"
+    write_corpus(raw_dir, args.files, args.paragraphs)
+    results = {}
+
+    # 1. DOCX -> markdown
+    preprocessor = DataPreProcessor(raw_data_dir=str(raw_dir), processed_data_dir=str(processed_dir))
+    start = time.perf_counter()
+    processed_files = preprocessor.process_directory(workers=args.workers)
+    seconds = time.perf_counter() - start
+    results["preprocessing"] = {"files": len(processed_files), "seconds": seconds, "files_per_sec": len(processed_files) / seconds}
+
+    # 2. Load and split
+    loader = MarketingDataLoader(data_dir=str(processed_dir))
+    document_processor = DocumentProcessor(chunk_size=500, chunk_overlap=50)
+    start = time.perf_counter()
+    documents = loader.load_campaign_data()
+    chunks = list(document_processor.iter_chunks(documents))
+    seconds = time.perf_counter() - start
+    megabytes = sum(len(document["content"].encode("utf-8")) for document in documents) / 1e6
+    results["chunking"] = {"documents": len(documents), "chunks": len(chunks), "mb": megabytes, "seconds": seconds, "mb_per_sec": megabytes / seconds}
+
+    # 3. Embed and upsert
+    embeddings = FakeEmbeddings(dimension=args.dimension, latency=args.embed_latency)
+    if args.backend == "local":
+        handler = VectorStoreHandler(index_name="bench", embeddings=embeddings, backend="local", local_path=str(workdir / "local_index"))
+    else:
+        handler = VectorStoreHandler(index_name="bench", embeddings=embeddings, index=FakePineconeIndex(latency=args.upsert_latency))
+    manifest = IndexManifest(path=str(workdir / "index_manifest.json"), index_name="bench")
+    stats = handler.sync_documents(chunks, manifest, max_workers=args.index_workers)
+    results["indexing"] = {"chunks": stats["chunks"], "batches": stats["batches"], "seconds": stats["seconds"], "chunks_per_sec": stats["chunks_per_sec"]}
+
+    # 4. Requests through run_llm (answer cache off: every request runs the whole pipeline)
+    pipeline = RagPipeline(
+        embedding=FakeEmbeddings(dimension=args.dimension, latency=args.embed_latency),
+        vectorstore=handler.vectorstore,
+        llm=FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency),
+        mmr_lambda=0.5,  # as configured by get_pipeline (RETRIEVAL_MMR_LAMBDA)
+    )
+    courses = [category.split("/")[-1] for category in CATEGORIES]
+    timings = []
+    for i in range(args.requests):
+        query = REQUESTS[i % len(REQUESTS)].format(course=courses[i % len(courses)]) + f" (turma {i})"
+        start = time.perf_counter()
+        run_llm(query, pipeline=pipeline, use_cache=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    results["query"] = {"requests": args.requests, **latency_stats(timings)}
+    return results
+
+
+# Metrics compared with --compare (higher is better for throughputs, lower for latencies)
+HEADLINE = [
+    ("preprocessing", "files_per_sec", "files/sec"),
+    ("chunking", "mb_per_sec", "MB/sec"),
+    ("indexing", "chunks_per_sec", "chunks/sec"),
+    ("query", "p50_ms", "ms"),
+    ("query", "p95_ms", "ms"),
+    ("query", "p99_ms", "ms"),
+]
+
+
+def report(results: dict, baseline: dict = None):
+    print(f"\n{'metric':<28}{'value':>14}{'baseline':>14}{'change':>10}")
+    for stage, key, unit in HEADLINE:
+        value = results[stage][key]
+        line = f"{f'{stage} {key}':<28}{value:>14.2f}"
+        if baseline and key in baseline.get("results", {}).get(stage, {}):
+            previous = baseline["results"][stage][key]
+            change = (value - previous) / previous * 100 if previous else 0.0
+            line += f"{previous:>14.2f}{change:>+9.1f}%"
+        print(f"{line}  {unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100, help="Synthetic DOCX files")
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per file")
+    parser.add_argument("--workers", type=int, default=1, help="DataPreProcessor worker processes")
+    parser.add_argument("--index-workers", type=int, default=4, help="Concurrent embedding/upsert batches")
+    parser.add_argument("--backend", choices=["local", "pinecone"], default="local",
+                        help="LocalVectorStore or a fake in-memory Pinecone index behind PineconeVectorStore")
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--embed-latency", type=float, default=0.005, help="Simulated embedding request latency (s)")
+    parser.add_argument("--upsert-latency", type=float, default=0.005, help="Simulated upsert request latency (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Simulated LLM latency before the first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.001, help="Simulated latency per generated token (s)")
+    parser.add_argument("--output", help="Result JSON (defaults to .cache/benchmarks/e2e_<commit>.json)")
+    parser.add_argument("--compare", help="Previous result JSON to compare with")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the index generation stamp of the benchmark index out of the real cache
+        os.environ["INDEX_GENERATION_DIR"] = str(Path(tmp) / "index_generation")
+        results = run(args, Path(tmp))
+
+    output = Path(args.output or f".cache/benchmarks/e2e_{commit}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": vars(args),
+        "results": results,
+    }, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+    print(f"Corpus: {results['preprocessing']['files']} files, {results['chunking']['mb']:.2f} MB of markdown, "
+          f"{results['chunking']['chunks']} chunks")
+    report(results, baseline)
+    print(f"\nSaved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Indexing throughput: one add_texts call per chunk (old loop) vs. VectorStoreHandler.add_texts_bulk.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_indexing --chunks 2000 --workers 4
+"""
+import argparse
+import time
+
+from app.rag import vector_store
+from app.rag.vector_store import VectorStoreHandler
+from benchmarks.fakes import FakeEmbeddings, FakePineconeIndex, synthetic_texts
+
+
+def build_handler(args) -> VectorStoreHandler:
+    embeddings = FakeEmbeddings(latency=args.embed_latency, rate_limit_every=args.rate_limit_every)
+    index = FakePineconeIndex(latency=args.upsert_latency, rate_limit_every=args.rate_limit_every)
+    return VectorStoreHandler(index_name="bench", embeddings=embeddings, index=index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Simulated embedding request latency (s)")
+    parser.add_argument("--upsert-latency", type=float, default=0.005, help="Simulated upsert request latency (s)")
+    parser.add_argument("--rate-limit-every", type=int, default=7, help="Fail every n-th provider call with a 429")
+    parser.add_argument("--per-chunk-sample", type=int, default=200, help="Chunks indexed one at a time for the baseline")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.chunks)
+    metadatas = [{"file_path": f"doc_{i // 10}.md"} for i in range(args.chunks)]
+
+    # Keep the benchmark fast: retries back off in milliseconds instead of seconds
+    original_backoff = vector_store.with_backoff
+    vector_store.with_backoff = lambda fn, max_retries=5: original_backoff(fn, max_retries, base_delay=0.005)
+
+    # Before: one embedding request and one upsert per chunk (sampled, then extrapolated)
+    handler = build_handler(args)
+    sample = min(args.per_chunk_sample, args.chunks)
+    start = time.perf_counter()
+    for text, metadata in zip(texts[:sample], metadatas[:sample]):
+        vector_store.with_backoff(lambda: handler.add_texts([text], [metadata]))
+    per_chunk_rate = sample / (time.perf_counter() - start)
+
+    # After: batched and concurrent
+    handler = build_handler(args)
+    stats = handler.add_texts_bulk(texts, metadatas, max_workers=args.workers)
+    assert len(handler.index.vectors) == args.chunks
+
+    print(f"per-chunk add_texts : {per_chunk_rate:10.1f} chunks/sec")
+    print(f"add_texts_bulk      : {stats['chunks_per_sec']:10.1f} chunks/sec "
+          f"({stats['batches']} batches, {handler.index.upserts} upserts, "
+          f"{handler.embeddings.rate_limiter.rejected + handler.index.rate_limiter.rejected} rate-limited calls retried)")
+    print(f"speedup             : {stats['chunks_per_sec'] / per_chunk_rate:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
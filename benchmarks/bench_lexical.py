@@ -0,0 +1,111 @@
+"""
+LexicalIndex (BM25): build time, on-disk size, memory-mapped load time and query latency,
+and retrieval latency of the HybridRetriever next to vector-only retrieval.
+
+The request mix alternates generic requests with requests naming an exact course title
+and date; the latter take the lexical fast path and skip the (simulated) vector round trip.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_lexical --chunks 50000
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from langchain.schema import Document
+
+from app.rag.lexical_index import HybridRetriever, LexicalIndex
+from benchmarks.fakes import FakeEmbeddings, FakeVectorStore, synthetic_texts
+
+COURSES = ["Python", "Dados", "Excel", "Power BI", "SQL", "Machine Learning", "Java", "React", "Design", "Copywriting"]
+
+
+def synthetic_corpus(count: int) -> list:
+    """Generic marketing chunks plus chunks naming a course edition and its live date"""
+    texts = synthetic_texts(count)
+    for i in range(0, count, 10):
+        course = COURSES[i % len(COURSES)]
+        texts[i] = f"Imersão {course} Edição {i}: live de abertura em {1 + i % 28:02d}/{1 + i % 12:02d}/2025 às 20h00. " + texts[i]
+    return [Document(page_content=text, metadata={"chunk_id": f"c{i}", "file_path": f"doc_{i // 20}.md"}) for i, text in enumerate(texts)]
+
+
+def requests_mix(count: int, corpus_size: int) -> list:
+    requests = []
+    for i in range(count):
+        if i % 2:
+            edition = (i * 10) % corpus_size // 10 * 10
+            requests.append(f"Imersão {COURSES[edition % len(COURSES)]} Edição {edition}")
+        else:
+            requests.append("Gere uma mensagem de CRM de contagem regressiva para a live do curso")
+    return requests
+
+
+def timed(fn, inputs) -> list:
+    timings = []
+    for value in inputs:
+        start = time.perf_counter()
+        fn(value)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list):
+    print(f"{label:<28}{statistics.median(timings):>10.2f}{np.percentile(timings, 95):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--vector-chunks", type=int, default=2000, help="Chunks in the fake vector store (pure Python search)")
+    parser.add_argument("--query-latency", type=float, default=0.03, help="Simulated vector store round trip (s)")
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.chunks)
+
+    start = time.perf_counter()
+    index = LexicalIndex.build(corpus)
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        index.save(directory)
+        size = sum(f.stat().st_size for f in Path(directory).iterdir())
+        text_size = sum(len(doc.page_content.encode("utf-8")) for doc in corpus)
+
+        start = time.perf_counter()
+        loaded = LexicalIndex.load(directory)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        print(f"Chunks: {loaded.count}, vocabulary: {len(loaded.vocabulary)} terms")
+        print(f"Build: {build_seconds:.2f}s, load (mmap): {load_ms:.1f} ms")
+        print(f"On disk: {size / 1e6:.1f} MB ({size / text_size:.2f}x the raw chunk text, texts included)\n")
+
+        requests = requests_mix(args.requests, args.chunks)
+        print(f"{'query latency':<28}{'p50 ms':>10}{'p95 ms':>10}")
+        report("BM25 top-4", timed(lambda query: loaded.similarity_search_with_score(query, k=4), requests))
+
+        # Hybrid vs. vector-only retrieval over the same chunks
+        vector_corpus = corpus[:args.vector_chunks]
+        vectorstore = FakeVectorStore(FakeEmbeddings(), query_latency=args.query_latency)
+        vectorstore.add_texts([doc.page_content for doc in vector_corpus], metadatas=[doc.metadata for doc in vector_corpus])
+        lexical = LexicalIndex.build(vector_corpus)
+        hybrid = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical)
+        dense = vectorstore.as_retriever()
+
+        vector_requests = requests_mix(args.requests // 4, args.vector_chunks)
+        report("vector only", timed(dense.invoke, vector_requests))
+        report("hybrid (RRF + fast path)", timed(hybrid.invoke, vector_requests))
+
+        fast = sum(
+            1 for query in vector_requests
+            if hybrid._lexical(query)[1]
+        )
+        print(f"\nLexical fast path: {fast}/{len(vector_requests)} requests skipped the vector search")
+
+
+if __name__ == "__main__":
+    main()
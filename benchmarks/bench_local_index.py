@@ -0,0 +1,71 @@
+"""
+LocalVectorStore: snapshot size, memory-mapped load time and top-k query latency.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_local_index --vectors 50000 --dimension 1024
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.rag.local_index import LocalVectorStore
+from benchmarks.fakes import FakeEmbeddings
+
+
+def percentile(timings, q):
+    return float(np.percentile(timings, q))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dimension), dtype=np.float32)
+    categories = ["Lançamentos", "CRM", "Mídias Sociais", "Email Marketing"]
+
+    store = LocalVectorStore(FakeEmbeddings(dimension=args.dimension))
+    start = time.perf_counter()
+    for i in range(0, args.vectors, 1000):
+        store.upsert([
+            {"id": f"v{j}", "values": vectors[j], "metadata": {"text": f"chunk {j}", "category": categories[j % len(categories)]}}
+            for j in range(i, min(i + 1000, args.vectors))
+        ])
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store.save(tmp)
+        size_mb = sum(f.stat().st_size for f in Path(tmp).iterdir()) / 1e6
+
+        start = time.perf_counter()
+        loaded = LocalVectorStore(FakeEmbeddings(dimension=args.dimension), path=tmp)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        queries = rng.standard_normal((args.queries, args.dimension), dtype=np.float32)
+        results = {}
+        for label, filter in (("unfiltered", None), ("category filter", {"category": {"$eq": "CRM"}})):
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                loaded.query(query, top_k=args.k, filter=filter)
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = timings
+
+        print(f"vectors            : {args.vectors} x {args.dimension}")
+        print(f"build              : {args.vectors / build_seconds:,.0f} vectors/sec")
+        print(f"snapshot size      : {size_mb:.1f} MB")
+        print(f"load (mmap)        : {load_ms:.1f} ms")
+        for label, timings in results.items():
+            print(f"query {label:<13}: p50 {statistics.median(timings):.2f} ms, p95 {percentile(timings, 95):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
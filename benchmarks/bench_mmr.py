@@ -0,0 +1,122 @@
+"""
+MMR re-ranking: cost against candidate count, and diversity of the retrieved context.
+
+1. Re-rank cost: app.rag.mmr.maximal_marginal_relevance (one similarity row per selected
+   candidate, folded into a running maximum) vs. the full pairwise similarity matrix and
+   the LangChain reference implementation (recomputes the similarities to the whole
+   selected set at every step), for growing fetch_k candidate sets.
+2. Retrieval: a local index of near-duplicate chunks (several copies of each "template"
+   with small edits), searched with the plain top-k and with MMRVectorStore. Reports
+   how many distinct templates the k chunks cover, their mean pairwise similarity, their
+   mean relevance and the search latency.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_mmr --dimension 1024 --k 4
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+from langchain_core.vectorstores.utils import maximal_marginal_relevance as reference_mmr
+
+from app.rag.local_index import LocalVectorStore
+from app.rag.mmr import MMRVectorStore, maximal_marginal_relevance
+
+
+def median_us(function, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings)
+
+
+def full_matrix_mmr(query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float) -> np.ndarray:
+    """Same selection from the whole n x n similarity matrix, computed up front"""
+    candidates = candidates / np.linalg.norm(candidates, axis=1, keepdims=True)
+    relevance = candidates @ (query / np.linalg.norm(query))
+    similarity = candidates @ candidates.T
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    selected = [int(np.argmax(relevance))]
+    for _ in range(1, min(k, len(candidates))):
+        np.maximum(redundancy, similarity[selected[-1]], out=redundancy)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return np.asarray(selected)
+
+
+class VectorEmbeddings:
+    """Embeddings returning precomputed query vectors (the benchmark searches by vector)"""
+
+    def __init__(self, vectors: dict):
+        self.vectors = vectors
+
+    def embed_query(self, text: str):
+        return self.vectors[text]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--lambda-mult", type=float, default=0.5)
+    parser.add_argument("--templates", type=int, default=200, help="Distinct chunk templates in the index")
+    parser.add_argument("--copies", type=int, default=8, help="Near-identical copies of each template")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"Re-rank cost (k={args.k}, {args.dimension} dims, median µs)")
+    print(f"{'fetch_k':>8}{'rows':>10}{'full matrix':>13}{'reference':>11}{'vs reference':>14}")
+    query = rng.standard_normal(args.dimension).astype(np.float32)
+    for fetch_k in (10, 20, 50, 100, 200, 500, 1000):
+        candidates = rng.standard_normal((fetch_k, args.dimension)).astype(np.float32)
+        assert list(maximal_marginal_relevance(query, candidates, args.k, args.lambda_mult)) == \
+            reference_mmr(query[None], candidates, args.lambda_mult, args.k)
+        ours = median_us(lambda: maximal_marginal_relevance(query, candidates, args.k, args.lambda_mult), args.repeats)
+        full = median_us(lambda: full_matrix_mmr(query, candidates, args.k, args.lambda_mult), args.repeats)
+        theirs = median_us(lambda: reference_mmr(query[None], candidates, args.lambda_mult, args.k), args.repeats)
+        print(f"{fetch_k:>8}{ours:>10.0f}{full:>13.0f}{theirs:>11.0f}{theirs / ours:>13.1f}x")
+
+    # Templates and their near-identical copies (same campaign text with another date or name)
+    templates = rng.standard_normal((args.templates, args.dimension)).astype(np.float32)
+    vectors = np.repeat(templates, args.copies, axis=0)
+    vectors += 0.15 * rng.standard_normal(vectors.shape).astype(np.float32) / np.sqrt(args.dimension) * np.linalg.norm(templates[0])
+    rows = len(vectors)
+    queries = {
+        f"q{i}": (templates[a] + templates[b] + templates[c]).tolist()
+        for i, (a, b, c) in enumerate(rng.integers(0, args.templates, size=(args.queries, 3)))
+    }
+    store = LocalVectorStore(VectorEmbeddings(queries))
+    store.upsert([
+        {"id": f"chunk-{row}", "values": vectors[row].tolist(), "metadata": {"text": f"chunk {row}", "template": row // args.copies}}
+        for row in range(rows)
+    ])
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    print(f"\nRetrieval over {rows} chunks ({args.templates} templates x {args.copies} copies), "
+          f"k={args.k}, lambda={args.lambda_mult}")
+    print(f"{'search':<22}{'templates':>10}{'pairwise sim':>14}{'relevance':>11}{'median ms':>11}")
+    for name, searcher in [("plain top-k", store)] + [
+        (f"mmr fetch_k={fetch_k}", MMRVectorStore(store, fetch_k=fetch_k, lambda_mult=args.lambda_mult)) for fetch_k in (20, 50)
+    ]:
+        covered, pairwise, relevance, timings = [], [], [], []
+        for text in queries:
+            start = time.perf_counter()
+            scored = searcher.similarity_search_with_score(text, k=args.k)
+            timings.append((time.perf_counter() - start) * 1000)
+            picked = [int(doc.id.split("-")[1]) for doc, _ in scored]
+            covered.append(len({row // args.copies for row in picked}))
+            similarity = normalized[picked] @ normalized[picked].T
+            pairwise.append(similarity[np.triu_indices(len(picked), 1)].mean())
+            relevance.append(np.mean([score for _, score in scored]))
+        print(f"{name:<22}{statistics.mean(covered):>10.2f}{statistics.mean(pairwise):>14.3f}"
+              f"{statistics.mean(relevance):>11.3f}{statistics.median(timings):>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Per-campaign partitions: one namespace per partition vs. a single flat namespace.
+
+Indexes synthetic campaign documents into the fake in-memory Pinecone index (its query
+cost grows with the vectors of the searched namespace), then compares:
+  - query latency over the flat index, one routed partition, and all partitions (fan-out);
+  - a reindex after one file of one partition changed: full run (load, split and compare
+    every partition) vs. a partial run of that partition only.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_partitions --partitions 8 --documents 400 --queries 30
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from app.rag.document_processor import DocumentProcessor
+from app.rag.loader import PARTITION_KEY
+from app.rag.manifest import IndexManifest
+from app.rag.vector_store import VectorStoreHandler
+from benchmarks.fakes import FakeEmbeddings, FakePineconeIndex, synthetic_texts
+
+
+def synthetic_documents(partitions: int, documents: int, paragraphs: int) -> list:
+    """Loaded documents ({'content', 'metadata'}) spread over the partitions"""
+    result = []
+    for i in range(documents):
+        partition = f"campanha-{i % partitions}"
+        texts = synthetic_texts(paragraphs, seed=i)
+        result.append({
+            "content": "\n\n".join(f"{text} Campanha {i % partitions}, peça {i}." for text in texts),
+            "metadata": {"file_path": f"{partition}/doc_{i}.md", "category": f"Campanha {i % partitions}", PARTITION_KEY: partition},
+        })
+    return result
+
+
+def index(args, documents: list, workdir: Path, partitioned: bool):
+    handler = VectorStoreHandler(
+        index_name="bench", embeddings=FakeEmbeddings(dimension=args.dimension), index=FakePineconeIndex(), partitioned=partitioned
+    )
+    manifest = IndexManifest(path=str(workdir / f"manifest_{partitioned}.json"), index_name="bench")
+    chunks = list(DocumentProcessor(chunk_size=500, chunk_overlap=50).iter_chunks(documents))
+    handler.sync_documents(chunks, manifest, max_workers=4)
+    return handler, manifest
+
+
+def query_ms(handler: VectorStoreHandler, queries: list, filter: dict = None) -> float:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        handler.vectorstore.similarity_search(query, k=4, filter=filter)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def reindex_ms(handler: VectorStoreHandler, manifest: IndexManifest, documents: list, partitions: list = None) -> float:
+    """Load (filter), split and sync, as index_documents.py does"""
+    start = time.perf_counter()
+    loaded = [doc for doc in documents if partitions is None or doc["metadata"][PARTITION_KEY] in partitions]
+    chunks = list(DocumentProcessor(chunk_size=500, chunk_overlap=50).iter_chunks(loaded))
+    handler.sync_documents(chunks, manifest, partitions=partitions, max_workers=4)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--documents", type=int, default=400)
+    parser.add_argument("--paragraphs", type=int, default=12, help="Paragraphs per document")
+    parser.add_argument("--dimension", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.partitions, args.documents, args.paragraphs)
+    queries = [f"mensagem de lançamento da campanha {i % args.partitions} com desconto" for i in range(args.queries)]
+    target = "campanha-0"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        flat, flat_manifest = index(args, documents, Path(tmp), partitioned=False)
+        partitioned, manifest = index(args, documents, Path(tmp), partitioned=True)
+        vectors = len(flat.index.vectors)
+        print(f"{args.documents} documents, {vectors} chunks in {args.partitions} partitions "
+              f"({vectors // args.partitions} per partition)\n")
+
+        print(f"{'query (median ms)':<40}{'ms':>10}")
+        print(f"{'flat index':<40}{query_ms(flat, queries):>10.2f}")
+        print(f"{'flat index, partition metadata filter':<40}{query_ms(flat, queries, {PARTITION_KEY: target}):>10.2f}")
+        print(f"{'partitioned, one routed partition':<40}{query_ms(partitioned, queries, {PARTITION_KEY: target}):>10.2f}")
+        print(f"{'partitioned, all partitions (fan-out)':<40}{query_ms(partitioned, queries):>10.2f}")
+
+        # One file of the target partition changes
+        changed = next(doc for doc in documents if doc["metadata"][PARTITION_KEY] == target)
+        changed["content"] += "\n\nParágrafo novo com a data da live de abertura."
+        print(f"\n{'reindex after one changed file':<40}{'ms':>10}")
+        print(f"{'full run (every partition)':<40}{reindex_ms(flat, flat_manifest, documents):>10.2f}")
+        changed["content"] += "\n\nOutro parágrafo novo."
+        print(f"{'partial run (--partition ' + target + ')':<40}{reindex_ms(partitioned, manifest, documents, [target]):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Per-request latency of the RAG pipeline, rebuilt per call (old run_llm) vs. built once,
+and time-to-first-token of the streaming path next to its total latency.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pipeline --requests 50
+"""
+import argparse
+import statistics
+import time
+
+from app.agent.pipeline import RagPipeline
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakeVectorStore, synthetic_texts
+
+QUERY = "Gere uma mensagem de CRM de contagem regressiva para o curso de Python"
+
+
+def build_pipeline(store: dict, args) -> RagPipeline:
+    """Build a pipeline on fake providers, paying the simulated client setup cost"""
+    embedding = FakeEmbeddings(latency=args.embed_latency, setup_latency=args.setup_latency)
+    vectorstore = FakeVectorStore(embedding, store=store, setup_latency=args.setup_latency, query_latency=args.query_latency)
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency, setup_latency=args.setup_latency)
+    return RagPipeline(embedding=embedding, vectorstore=vectorstore, llm=llm)
+
+
+def measure(fn, requests: int) -> list:
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def measure_stream(pipeline: RagPipeline, requests: int) -> tuple:
+    """Time to first answer token and total latency of pipeline.stream, in ms"""
+    first_token, total = [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        first = None
+        for event in pipeline.stream(QUERY):
+            if first is None and "token" in event:
+                first = time.perf_counter()
+        end = time.perf_counter()
+        first_token.append((first - start) * 1000)
+        total.append((end - start) * 1000)
+    return first_token, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--corpus", type=int, default=500, help="Number of synthetic chunks in the fake index")
+    parser.add_argument("--setup-latency", type=float, default=0.03, help="Simulated setup cost per client (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--query-latency", type=float, default=0.005)
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Simulated LLM latency before the first token (s)")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Simulated latency per generated token (s)")
+    args = parser.parse_args()
+
+    # Populate a shared fake index once (data lives server-side in production)
+    seed_store = FakeVectorStore(FakeEmbeddings())
+    seed_store.add_texts(synthetic_texts(args.corpus), metadatas=[{"file_path": f"doc_{i}.md"} for i in range(args.corpus)])
+    store = seed_store.store
+
+    # Before: every request rebuilds clients and chains
+    before = measure(lambda: build_pipeline(store, args).invoke(QUERY), args.requests)
+
+    # After: pipeline built once and reused
+    pipeline = build_pipeline(store, args)
+    after = measure(lambda: pipeline.invoke(QUERY), args.requests)
+
+    print(f"{'mode':<22}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}")
+    for label, timings in (("rebuild per request", before), ("shared pipeline", after)):
+        print(f"{label:<22}{statistics.mean(timings):>10.1f}{statistics.median(timings):>10.1f}{max(timings):>10.1f}")
+    print(f"\nPer-request overhead removed: {statistics.mean(before) - statistics.mean(after):.1f} ms")
+
+    # Streaming: the user sees text after the first token instead of the full generation
+    first_token, total = measure_stream(pipeline, args.requests)
+    print(f"\n{'streaming':<22}{'TTFT ms':>10}{'total ms':>10}")
+    print(f"{'p50':<22}{statistics.median(first_token):>10.1f}{statistics.median(total):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Index snapshots: export size and restore throughput per quantization, vs. re-embedding.
+
+Fills a fake in-memory Pinecone index (several namespaces, random unit vectors with
+text metadata), exports it with IndexSnapshot at each quantization and restores it into
+an empty fake index with parallel upserts. Reports the snapshot size, the restore
+throughput, how well the restored vectors preserve the top-10 neighbours of random
+queries, and the time re-indexing the same chunks through the (fake) embedding API takes.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_snapshot --vectors 5000 --dimension 1024
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.rag.snapshot import QUANTIZATIONS, IndexSnapshot
+from app.rag.vector_store import VectorStoreHandler
+from benchmarks.fakes import FakeEmbeddings, FakePineconeIndex, synthetic_texts
+
+
+def fill(index: FakePineconeIndex, vectors: np.ndarray, texts: list, namespaces: int):
+    for i in range(0, len(vectors), 1000):
+        for namespace in range(namespaces):
+            rows = range(i + namespace, min(i + 1000, len(vectors)), namespaces)
+            index.upsert(vectors=[
+                {"id": f"chunk-{row}", "values": vectors[row].tolist(),
+                 "metadata": {"text": texts[row], "file_path": f"doc_{row // 10}.md", "partition": f"p{namespace}"}}
+                for row in rows
+            ], namespace=f"p{namespace}")
+
+
+def matrix(index: FakePineconeIndex, ids: list) -> np.ndarray:
+    vectors = index.vectors
+    return np.asarray([vectors[id]["values"] for id in ids], dtype=np.float32)
+
+
+def recall_at_10(original: np.ndarray, restored: np.ndarray, queries: np.ndarray) -> float:
+    """Share of the true top-10 neighbours (cosine) still in the top-10 of the restored vectors"""
+    def top(vectors):
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.argsort(-(queries @ normalized.T), axis=1)[:, :10]
+    expected, found = top(original), top(restored)
+    return float(np.mean([len(set(e) & set(f)) / 10 for e, f in zip(expected, found)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=3000)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--namespaces", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--upsert-latency", type=float, default=0.01, help="Simulated upsert/fetch request latency (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.2, help="Simulated embedding request latency (s)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dimension), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    texts = synthetic_texts(args.vectors)
+    queries = vectors[rng.choice(args.vectors, 50, replace=False)] + 0.05 * rng.standard_normal((50, args.dimension), dtype=np.float32)
+
+    source = FakePineconeIndex()
+    fill(source, vectors, texts, args.namespaces)
+    source.latency = args.upsert_latency
+    ids = sorted(source.vectors)
+    original = matrix(source, ids)
+
+    print(f"{args.vectors} vectors x {args.dimension} dims in {args.namespaces} namespaces "
+          f"(float32 vectors alone: {args.vectors * args.dimension * 4 / 1e6:.1f} MB)\n")
+    print(f"{'quantization':<14}{'MB':>8}{'B/vector':>10}{'export s':>10}{'restore s':>11}{'vectors/s':>11}{'recall@10':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for quantization in QUANTIZATIONS:
+            path = Path(tmp) / f"snapshot_{quantization}.npz"
+            start = time.perf_counter()
+            size = IndexSnapshot.export(source, quantization, max_workers=args.workers).save(path)
+            export_seconds = time.perf_counter() - start
+
+            target = FakePineconeIndex(latency=args.upsert_latency)
+            stats = IndexSnapshot.load(path).restore(target, max_workers=args.workers)
+            assert sorted(target.vectors) == ids and sorted(target.namespaces) == sorted(source.namespaces)
+            recall = recall_at_10(original, matrix(target, ids), queries)
+            print(f"{quantization:<14}{size / 1e6:>8.2f}{size / args.vectors:>10.0f}{export_seconds:>10.2f}"
+                  f"{stats['seconds']:>11.2f}{stats['vectors_per_sec']:>11.0f}{recall:>11.3f}")
+
+    # The only path before: re-embed every chunk and upsert it again
+    handler = VectorStoreHandler(
+        index_name="bench", embeddings=FakeEmbeddings(dimension=args.dimension, latency=args.embed_latency),
+        index=FakePineconeIndex(latency=args.upsert_latency)
+    )
+    stats = handler.add_texts_bulk(texts, ids=[f"chunk-{row}" for row in range(args.vectors)], max_workers=4)
+    print(f"\nre-embedding  : {stats['seconds']:.2f}s ({stats['chunks_per_sec']:.0f} chunks/sec, "
+          f"{stats['batches']} embedding requests at {args.embed_latency * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
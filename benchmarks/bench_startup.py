@@ -0,0 +1,88 @@
+"""
+Cold start of the Streamlit app: import time of the agent and main.py, heavy SDKs loaded
+by those imports, and time to first render of main.py (streamlit.testing AppTest).
+
+Every measurement runs in a fresh interpreter, so nothing is already imported. The
+pipeline warm-up thread is disabled (PIPELINE_WARMUP=false) and no request is sent:
+no API keys are needed. With --max-import-ms / --max-render-ms the script exits with
+status 1 when a median exceeds its limit, or when an agent import loads a heavy SDK.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup --repeat 5
+    python -m benchmarks.bench_startup --max-import-ms 200 --max-render-ms 3000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules that must stay out of the import path of the first render
+HEAVY_MODULES = ["langchain", "langchain_core", "langchain_groq", "langchain_pinecone", "langchain_voyageai", "pinecone", "numpy"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"ms": (time.perf_counter() - start) * 1000, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+RENDER_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("main.py", default_timeout=120)
+ready = time.perf_counter()
+app.run()
+print(json.dumps({
+    "ms": (time.perf_counter() - start) * 1000,
+    "script_ms": (time.perf_counter() - ready) * 1000,
+    "exceptions": [str(exception.value) for exception in app.exception],
+}))
+"""
+
+
+def measure(script: str) -> dict:
+    env = {**os.environ, "PIPELINE_WARMUP": "false", "PYTHONPATH": os.getcwd()}
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-import-ms", type=float, help="Fail when importing app.agent.agent takes longer (median)")
+    parser.add_argument("--max-render-ms", type=float, help="Fail when the first render of main.py takes longer (median)")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'measurement':<34}{'median ms':>12}{'max ms':>10}")
+
+    for module in ("app.agent.agent", "app.agent.pipeline"):
+        runs = [measure(IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)) for _ in range(args.repeat)]
+        timings = [run["ms"] for run in runs]
+        print(f"{f'import {module}':<34}{statistics.median(timings):>12.1f}{max(timings):>10.1f}  "
+              f"heavy: {', '.join(runs[0]['heavy']) or '-'}")
+        if module == "app.agent.agent":
+            if runs[0]["heavy"]:
+                failures.append(f"app.agent.agent imports {', '.join(runs[0]['heavy'])}")
+            if args.max_import_ms and statistics.median(timings) > args.max_import_ms:
+                failures.append(f"import app.agent.agent: {statistics.median(timings):.1f} ms > {args.max_import_ms} ms")
+
+    runs = [measure(RENDER_SCRIPT) for _ in range(args.repeat)]
+    timings = [run["ms"] for run in runs]
+    print(f"{'first render of main.py':<34}{statistics.median(timings):>12.1f}{max(timings):>10.1f}  "
+          f"(script run: {statistics.median(run['script_ms'] for run in runs):.1f} ms)")
+    for exception in runs[0]["exceptions"]:
+        failures.append(f"main.py raised: {exception}")
+    if args.max_render_ms and statistics.median(timings) > args.max_render_ms:
+        failures.append(f"first render: {statistics.median(timings):.1f} ms > {args.max_render_ms} ms")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Evaluation of the ThemeBasedGuardrail local classifier: accuracy on a labeled set of
+requests and the share of requests decided without the LLM fallback.
+
+The fallback LLM is an oracle that always answers with the true label, so the numbers
+isolate the local classifier and its band. Scores depend on the embedding model: the
+fake embedder (a hashed bag of words, offline) only exercises the mechanics, while
+--embedder voyage scores with voyage-3 (VOYAGE_API_KEY, embeddings cached on disk) and
+is what THEME_GUARDRAIL_BAND must be calibrated on. --no-examples builds the centroids
+from the theme names alone, as get_pipeline does.
+
+Run with --sweep to print the score range of each label, a band covering their overlap
+and the trade-off of several bands.
+
+Usage (from the repository root):
+    python -m benchmarks.eval_theme_guardrail --lower 0.05 --upper 0.2
+    python -m benchmarks.eval_theme_guardrail --embedder voyage --no-examples --sweep
+"""
+import argparse
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage
+
+from app.agent.guard.theme_based_guardrail import OFF_TOPIC, ThemeBasedGuardrail
+from benchmarks.fakes import FakeEmbeddings
+
+# Labeled examples that shape the centroids
+EXAMPLES = {
+    "crm": ["mensagem de crm para alunos inscritos", "régua de relacionamento com leads"],
+    "campanhas": ["campanha de lançamento do curso", "campanha de black friday com desconto"],
+    "mídias sociais": ["post para instagram sobre a live", "legenda para linkedin do evento"],
+    "email marketing": ["email de convite para o webinar", "assunto de email para carrinho abandonado"],
+    "criação de conteúdo": ["roteiro de vídeo para o youtube", "texto para landing page do curso"],
+    OFF_TOPIC: [
+        "qual a previsão do tempo para amanhã", "receita de bolo de chocolate",
+        "quem ganhou o jogo de futebol ontem", "como resolver uma equação de segundo grau",
+        "me explique a teoria da relatividade", "qual a capital da austrália",
+    ],
+}
+
+# (request, is marketing) pairs not used as examples
+EVALUATION = [
+    ("Gere uma mensagem de CRM de contagem regressiva para o curso de Python", True),
+    ("Crie um email de lançamento para a turma de dados", True),
+    ("Escreva um post para instagram anunciando a live de sexta", True),
+    ("Sugira uma estratégia de conteúdo para o blog da empresa", True),
+    ("Monte uma campanha de remarketing para leads frios", True),
+    ("Quais elementos de branding devo destacar no anúncio", True),
+    ("Escreva o assunto de um email de última chamada para inscrições", True),
+    ("Crie uma legenda para o reels do curso de Python", True),
+    ("Planeje a comunicação do evento de lançamento", True),
+    ("Gere três variações de headline para a landing page", True),
+    ("Faça um roteiro de vídeo curto para divulgar o webinar", True),
+    ("Escreva uma mensagem de whatsapp para alunos que não abriram o email", True),
+    ("Qual o melhor horário para publicar nas mídias sociais", True),
+    ("Crie uma sequência de emails de nutrição para novos leads", True),
+    ("Reescreva o texto do anúncio com tom mais próximo", True),
+    ("Qual a previsão do tempo para o fim de semana", False),
+    ("Me passe uma receita de lasanha", False),
+    ("Quem ganhou a copa do mundo de 2002", False),
+    ("Como calcular a derivada de uma função", False),
+    ("Qual a capital do canadá", False),
+    ("Explique como funciona a fotossíntese", False),
+    ("Recomende um filme de terror", False),
+    ("Quantos quilômetros tem uma maratona", False),
+    ("Como trocar o pneu do carro", False),
+    ("Traduza esta frase para o japonês: bom dia", False),
+    ("Qual é a fórmula da água", False),
+    ("Me conte uma piada", False),
+]
+
+
+class OracleLLM:
+    """Fallback LLM answering with the true label of the request in the prompt"""
+
+    def __init__(self, labels: dict):
+        self.labels = labels
+        self.calls = 0
+
+    def invoke(self, prompt: str) -> AIMessage:
+        self.calls += 1
+        for query, label in self.labels.items():
+            if f"Consulta: {query}\n" in prompt:
+                return AIMessage(content="true" if label else "false")
+        return AIMessage(content="false")
+
+
+def evaluate(lower: float, upper: float, embedding, examples: dict = EXAMPLES) -> dict:
+    llm = OracleLLM(dict(EVALUATION))
+    guardrail = ThemeBasedGuardrail(embedding=embedding, llm=llm, examples=examples, ambiguity_band=(lower, upper))
+
+    correct = local = local_correct = 0
+    for query, label in EVALUATION:
+        score = guardrail.score(query)
+        decision = guardrail.validate_query(query)
+        correct += decision == label
+        if not lower <= score < upper:
+            local += 1
+            local_correct += decision == label
+
+    # Repeated requests are answered from the memoized decisions
+    for query, _ in EVALUATION:
+        guardrail.validate_query(query.upper())
+
+    return {
+        "accuracy": correct / len(EVALUATION),
+        "local_accuracy": local_correct / local if local else 0.0,
+        "llm_avoided": 1 - llm.calls / len(EVALUATION),
+        "llm_calls": llm.calls,
+        "cached": guardrail.stats["cached"],
+    }
+
+
+def overlap_band(embedding, examples: dict = EXAMPLES, margin: float = 0.02) -> tuple:
+    """
+    Scores of each label and the smallest band (widened by margin) outside of which every
+    labeled request is decided correctly: from the lowest marketing score to the highest
+    off-topic one when they overlap, else a margin around the gap between them
+    """
+    guardrail = ThemeBasedGuardrail(embedding=embedding, llm=OracleLLM({}), examples=examples, ambiguity_band=(0.0, 0.0))
+    marketing = [guardrail.score(query) for query, label in EVALUATION if label]
+    off_topic = [guardrail.score(query) for query, label in EVALUATION if not label]
+    print(f"marketing scores:  {min(marketing):.3f} .. {max(marketing):.3f}")
+    print(f"off-topic scores:  {min(off_topic):.3f} .. {max(off_topic):.3f}")
+    lower, upper = sorted((min(marketing), max(off_topic)))
+    return round(lower - margin, 3), round(upper + margin, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lower", type=float, default=0.05, help="Lower bound of the ambiguity band")
+    parser.add_argument("--upper", type=float, default=0.2, help="Upper bound of the ambiguity band")
+    parser.add_argument("--embedder", choices=["fake", "voyage"], default="fake",
+                        help="Hashed bag of words (offline) or voyage-3, the model the band is calibrated on")
+    parser.add_argument("--no-examples", action="store_true", help="Centroids from the theme names alone (as get_pipeline)")
+    parser.add_argument("--dimension", type=int, default=512, help="Dimension of the fake embedder")
+    parser.add_argument("--sweep", action="store_true", help="Evaluate several bands")
+    args = parser.parse_args()
+
+    if args.embedder == "voyage":
+        from app.rag.embedding_cache import voyage_embeddings
+
+        load_dotenv()
+        embedding = voyage_embeddings(model="voyage-3")
+    else:
+        embedding = FakeEmbeddings(dimension=args.dimension)
+    examples = {} if args.no_examples else EXAMPLES
+
+    bands = [(args.lower, args.upper)]
+    if args.sweep:
+        bands = [(0.0, 0.0), (0.05, 0.2), (0.1, 0.3), (0.0, 0.4), (-0.1, 0.5), overlap_band(embedding, examples)]
+        print(f"band covering the overlap: [{bands[-1][0]:.3f}, {bands[-1][1]:.3f})\n")
+
+    print(f"{'band':<16}{'accuracy':>10}{'local acc':>11}{'LLM avoided':>13}{'LLM calls':>11}")
+    for lower, upper in bands:
+        result = evaluate(lower, upper, embedding, examples)
+        print(f"{f'[{lower:.2f}, {upper:.2f})':<16}{result['accuracy']:>10.1%}{result['local_accuracy']:>11.1%}"
+              f"{result['llm_avoided']:>13.1%}{result['llm_calls']:>11}")
+    print(f"\nRepeated requests answered from memoized decisions: {result['cached']}/{len(EVALUATION)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Local stand-ins for the Voyage, Pinecone and Groq clients used by the benchmarks.
+
+Everything here runs in-process and offline. Latencies are injected with
+time.sleep so the benchmarks can model network round trips and client setup.
+"""
+import asyncio
+import hashlib
+import math
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app.rag.local_index import match_filter
+
+
+class RateLimitError(Exception):
+    """Provider-style HTTP 429 error"""
+
+    status = 429
+
+
+class _RateLimiter:
+    """Raise RateLimitError on every n-th call (thread-safe)"""
+
+    def __init__(self, every: int = 0):
+        self.every = every
+        self.count = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def check(self):
+        if not self.every:
+            return
+        with self._lock:
+            self.count += 1
+            if self.count % self.every == 0:
+                self.rejected += 1
+                raise RateLimitError("429 Too Many Requests")
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words embeddings (similar texts get similar vectors)"""
+
+    def __init__(self, dimension: int = 256, latency: float = 0.0, setup_latency: float = 0.0, rate_limit_every: int = 0):
+        # Simulate client construction (TLS handshake, auth)
+        time.sleep(setup_latency)
+        self.dimension = dimension
+        self.latency = latency
+        self.rate_limiter = _RateLimiter(rate_limit_every)
+        self.calls = 0
+        self.texts = 0
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[index] += 1.0 if digest[4] % 2 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        self.rate_limiter.check()
+        self.calls += 1
+        self.texts += len(texts)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        self.rate_limiter.check()
+        self.calls += 1
+        self.texts += len(texts)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakePineconeIndex:
+    """In-memory subset of the Pinecone Index API (upsert, delete, query, fetch, list, describe_index_stats) with namespaces"""
+
+    def __init__(self, latency: float = 0.0, rate_limit_every: int = 0):
+        self.config = SimpleNamespace(host="localhost", api_key="fake")
+        self.latency = latency
+        self.rate_limiter = _RateLimiter(rate_limit_every)
+        self.namespaces: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.upserts = 0
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    @property
+    def vectors(self) -> Dict[str, Dict[str, Any]]:
+        """Vectors of all namespaces"""
+        with self._lock:
+            return {id: item for vectors in self.namespaces.values() for id, item in vectors.items()}
+
+    def upsert(self, vectors, namespace: str = None, **kwargs):
+        time.sleep(self.latency)
+        self.rate_limiter.check()
+        with self._lock:
+            self.upserts += 1
+            stored = self.namespaces.setdefault(namespace or "", {})
+            for vector in vectors:
+                if not isinstance(vector, dict):
+                    vector = dict(zip(("id", "values", "metadata"), vector))
+                stored[vector["id"]] = {"values": list(vector["values"]), "metadata": dict(vector.get("metadata") or {})}
+        result = {"upserted_count": len(vectors)}
+        # PineconeVectorStore.add_texts upserts with async_req=True and calls .get()
+        return SimpleNamespace(get=lambda: result) if kwargs.get("async_req") else result
+
+    def delete(self, ids: List[str] = None, delete_all: bool = False, namespace: str = None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            stored = self.namespaces.get(namespace or "", {})
+            if delete_all:
+                stored.clear()
+            for id in ids or []:
+                stored.pop(id, None)
+            # Like Pinecone, a namespace exists while it holds vectors
+            if not stored:
+                self.namespaces.pop(namespace or "", None)
+        return {}
+
+    def fetch(self, ids: List[str], namespace: str = None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            stored = self.namespaces.get(namespace or "", {})
+            return {"vectors": {id: {"id": id, **stored[id]} for id in ids if id in stored}}
+
+    def list(self, prefix: str = None, limit: int = 100, namespace: str = None, **kwargs):
+        """Pages of vector IDs, like Index.list"""
+        with self._lock:
+            ids = [id for id in self.namespaces.get(namespace or "", {}) if prefix is None or id.startswith(prefix)]
+        for i in range(0, len(ids), limit):
+            time.sleep(self.latency)
+            yield ids[i:i + limit]
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            return {
+                "namespaces": {namespace: {"vector_count": len(vectors)} for namespace, vectors in self.namespaces.items()},
+                "total_vector_count": sum(len(vectors) for vectors in self.namespaces.values()),
+            }
+
+    def query(self, vector: List[float], top_k: int = 4, include_metadata: bool = True, include_values: bool = False,
+              namespace: str = None, filter: dict = None, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.queries += 1
+            items = list(self.namespaces.get(namespace or "", {}).items())
+        scored = []
+        for id, item in items:
+            if filter and not match_filter(item["metadata"], filter):
+                continue
+            scored.append((sum(a * b for a, b in zip(vector, item["values"])), id, item))
+        scored.sort(key=lambda match: match[0], reverse=True)
+        return {"matches": [
+            {"id": id, "score": score, "metadata": dict(item["metadata"]) if include_metadata else {},
+             **({"values": item["values"]} if include_values else {})}
+            for score, id, item in scored[:top_k]
+        ]}
+
+
+class FakeVectorStore(InMemoryVectorStore):
+    """In-memory vector store with injected setup and query latency"""
+
+    def __init__(self, embedding: Embeddings, store: dict = None, setup_latency: float = 0.0, query_latency: float = 0.0):
+        # Simulate index lookup / connection setup
+        time.sleep(setup_latency)
+        super().__init__(embedding)
+        if store is not None:
+            self.store = store
+        self.query_latency = query_latency
+
+    def _similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, _sleep=True):
+        if _sleep:
+            time.sleep(self.query_latency)
+        return super()._similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, filter=None, **kwargs):
+        embedding = await self.embedding.aembed_query(query)
+        await asyncio.sleep(self.query_latency)
+        return [
+            (doc, score)
+            for doc, score, _ in self._similarity_search_with_score_by_vector(embedding, k=k, filter=filter, _sleep=False)
+        ]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning a canned answer with injected latency, streamed word by word"""
+
+    response: str = "Mensagem de CRM gerada a partir dos materiais de referência."
+    latency: float = 0.0
+    token_latency: float = 0.0
+    setup_latency: float = 0.0
+    calls: int = 0
+
+    def model_post_init(self, __context: Any) -> None:
+        # Simulate client construction (TLS handshake, auth)
+        time.sleep(self.setup_latency)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.latency + self.token_latency * len(self.response.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self.response):
+            time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.token_latency * len(self.response.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self.response):
+            await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def synthetic_texts(count: int, seed: int = 0) -> List[str]:
+    """Generate marketing-flavoured synthetic chunk texts"""
+    themes = ["crm", "campanha", "lançamento", "curso", "python", "live", "email", "instagram",
+              "contagem regressiva", "branding", "webinar", "desconto", "inscrições", "público-alvo"]
+    texts = []
+    for i in range(count):
+        picked = [themes[(i * 7 + j * 3 + seed) % len(themes)] for j in range(4)]
+        texts.append(
+            f"Material {i}: mensagem de {picked[0]} para {picked[1]} do {picked[2]} "
+            f"com foco em {picked[3]}. Use tom próximo, chamada para ação clara e datas destacadas."
+        )
+    return texts
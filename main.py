@@ -1,7 +1,18 @@
 # Import required packages
+import os
 import streamlit as st
+from dotenv import load_dotenv
 from streamlit_chat import message
-from app.agent.agent import run_llm
+
+# Light imports only: the agent loads LangChain and the provider SDKs on first use
+from app.agent.agent import get_pipeline, get_registry, get_source_cache, start_warmup, stream_llm
+from app.agent.conversation import ConversationStore
+from app.rag.tracing import get_tracer
+
+load_dotenv()
+
+# Turns rendered per page of the chat history
+HISTORY_PAGE_SIZE = 10
 
 # Page configuration
 st.set_page_config(
@@ -10,6 +21,15 @@ st.set_page_config(
     layout="wide",
 )
 
+# Build the RAG pipeline once per process and share it across sessions
+@st.cache_resource(show_spinner=False)
+def load_pipeline():
+    return get_pipeline()
+
+# Start building it in the background while the page renders (PIPELINE_WARMUP=false disables it)
+if os.getenv("PIPELINE_WARMUP", "true").lower() == "true":
+    start_warmup()
+
 # Header with logo
 col1, col2 = st.columns([1, 5])
 with col1:
@@ -22,68 +42,116 @@ with col2:
 tab1, tab2 = st.tabs(["Chat", "Referências"])
 
 with tab1:
-    # Initialize session state
-    if "chat_prompt_history" not in st.session_state:
-        st.session_state["chat_prompt_history"] = []
-    if "chat_answer_history" not in st.session_state:
-        st.session_state["chat_answer_history"] = []
-    if "chat_history" not in st.session_state:
-        st.session_state["chat_history"] = []
-    if "current_sources" not in st.session_state:
-        st.session_state["current_sources"] = []
+    # Initialize session state: one compact store per session (sources are kept as chunk IDs)
+    if "conversation" not in st.session_state:
+        st.session_state["conversation"] = ConversationStore()
+    conversation = st.session_state["conversation"]
 
     # Chat interface
     st.markdown("### Peça ajuda para gerar qualquer conteúdo!")
-    prompt = st.text_input(
+
+    # Campaign partitions to search (none selected: routed from the request)
+    partition_names = get_registry().names
+    selected_partitions = st.multiselect(
+        "Campanhas",
+        partition_names,
+        key="partitions",
+        placeholder="Escolhidas automaticamente pela solicitação",
+    ) if len(partition_names) > 1 else []
+
+    # Only a submitted request is answered (reruns from the history pager or the sources toggle are not)
+    def submit_prompt():
+        st.session_state["pending_prompt"] = st.session_state["user_input"]
+
+    st.text_input(
         "Sua solicitação:",
         placeholder="e.g. Gere uma mensagem de CRM de contagem regressiva para o curso de programação em Python que começa em uma live no dia 26/01/2025 as 20h00",
-        key="user_input"
+        key="user_input",
+        on_change=submit_prompt
     )
+    prompt = st.session_state.pop("pending_prompt", None)
 
     # Handle user input
     if prompt:
-        with st.spinner("🔎 Buscando Referências"):
-            generated_response = run_llm(
+        pipeline = load_pipeline()
+        source_documents = []
+
+        def answer_tokens():
+            for event in stream_llm(
                 query=prompt,
-                chat_history=st.session_state["chat_history"]
-            )
-            
-            # Store both path and page content
-            sources = [(doc.metadata["file_path"], doc.page_content) for doc in generated_response["source_documents"]]
-            st.session_state["current_sources"] = sources
-            
-            formatted_response = f"{generated_response['result']}"
-            
-            st.session_state["chat_prompt_history"].append(prompt)
-            st.session_state["chat_answer_history"].append(formatted_response)
-            st.session_state["chat_history"].append(("human", prompt))
-            st.session_state["chat_history"].append(("ai", generated_response["result"]))
-
-    # Display chat history
-    if st.session_state["chat_history"]:
+                chat_history=conversation.history(pipeline.history_max_messages),
+                pipeline=pipeline,
+                partitions=selected_partitions or None
+            ):
+                if "source_documents" in event:
+                    source_documents.extend(event["source_documents"])
+                else:
+                    yield event["token"]
+
+        # Render the answer incrementally as tokens arrive, then hand it over to the history
+        tracer = get_tracer()
+        answer_placeholder = st.empty()
+        with tracer.trace("chat_request") as trace, answer_placeholder.container():
+            answer = st.write_stream(answer_tokens())
+        answer_placeholder.empty()
+        if tracer.enabled:
+            st.session_state["last_trace"] = trace.to_dict()
+
+        # Keep the source texts in the shared cache, the session only references them
+        get_source_cache(pipeline).remember(source_documents)
+        conversation.add(prompt, answer, source_documents)
+
+    # Display chat history, one page of turns at a time (keys stay the same as the history grows)
+    if conversation:
         st.markdown("### Histórico de conversars")
-        for generated_response, user_prompt in zip(
-            st.session_state["chat_answer_history"],
-            st.session_state["chat_prompt_history"]
-        ):
-            message(user_prompt, is_user=True, key=str(user_prompt))
-            message(generated_response, key=str(generated_response))
-            
-        # Show sources for the latest response
-        if st.session_state["current_sources"]:
-            with st.expander("View Sources"):
-                for source_path, content in st.session_state["current_sources"]:
-                    st.markdown(f"**Fonte:** {source_path}")
-                    st.markdown(f"{content}")
+        pages = conversation.pages(HISTORY_PAGE_SIZE)
+        page = 0
+        if pages > 1:
+            page = st.number_input("Página do histórico (1 = mais recente)", min_value=1, max_value=pages, value=1, key="history_page") - 1
+        for turn in conversation.page(page, HISTORY_PAGE_SIZE):
+            message(turn.prompt, is_user=True, key=f"u{turn.id}")
+            message(turn.answer, key=f"a{turn.id}")
+
+        # Show sources for the latest response (texts fetched only when asked for)
+        if conversation.latest_sources and st.toggle("Ver fontes", key="show_sources"):
+            source_cache = get_source_cache(load_pipeline())
+            for source in conversation.latest_sources:
+                st.markdown(f"**Fonte:** {source.file_path}")
+                st.markdown(source_cache.text(source))
 
 # Add content for the References tab
 with tab2:
     st.markdown("### Referências utilizadas")
     st.markdown("Aqui estão os documentos e fontes que o assistente utiliza para gerar respostas:")
-    
-    if st.session_state["current_sources"]:
-        for source_path, content in st.session_state["current_sources"]:
-            with st.expander(f"📄 {source_path}"):
-                st.markdown(content)
+
+    sources = st.session_state["conversation"].latest_sources
+    if sources:
+        selected = st.selectbox(
+            "Documento",
+            range(len(sources)),
+            format_func=lambda i: f"📄 {sources[i].file_path}",
+            key="reference"
+        )
+        st.markdown(get_source_cache(load_pipeline()).text(sources[selected]))
     else:
         st.info("Faça uma pergunta no chat para ver as referências utilizadas.")
+
+# Per-stage breakdown of the last request (TRACING=true)
+if get_tracer().enabled:
+    with st.sidebar:
+        st.markdown("### Última requisição")
+        last_trace = st.session_state.get("last_trace")
+        if last_trace:
+            st.metric("Tempo total", f"{last_trace['ms']:.0f} ms")
+            st.table([
+                {
+                    "etapa": "\u2003" * span["depth"] + span["name"],
+                    "ms": f"{span['ms']:.1f}",
+                    "detalhes": ", ".join(
+                        f"{name}={value}" for name, value in span["attributes"].items() if not isinstance(value, dict)
+                    ),
+                }
+                for span in last_trace["spans"]
+            ])
+        else:
+            st.caption("Nenhuma requisição rastreada ainda.")
@@ -0,0 +1,13 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules import each other as app.* and benchmarks.* (run from the repository root)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def index_generation_dir(tmp_path, monkeypatch):
+    """Keep the index generation stamps written by the tests out of the real cache"""
+    monkeypatch.setenv("INDEX_GENERATION_DIR", str(tmp_path / "index_generation"))
@@ -0,0 +1,135 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.agent import agent
+from app.agent import answer_cache as answer_cache_module
+from app.agent.answer_cache import AnswerCache
+from app.rag.index_generation import IndexGeneration
+from benchmarks.fakes import FakeEmbeddings
+
+RESPONSE = {"result": "Faltam 3 dias!", "source_documents": []}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(answer_cache_module, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_exact_hit_ignores_case_and_spacing():
+    cache = AnswerCache()
+    cache.put("Mensagem de CRM para a live", RESPONSE)
+
+    hit = cache.get("  mensagem de crm para a LIVE ")
+
+    assert hit["result"] == RESPONSE["result"]
+    assert hit["rejected"] is False
+
+
+def test_semantic_lookup_is_off_by_default():
+    cache = AnswerCache(embedding=FakeEmbeddings(dimension=64))
+    cache.put("mensagem de crm para a live de python", RESPONSE)
+
+    assert cache.embedding is None
+    assert cache.get("mensagem de crm sobre a live de python") is None
+
+
+def test_semantic_hit_never_crosses_numbers():
+    cache = AnswerCache(embedding=FakeEmbeddings(dimension=256), similarity_threshold=0.8)
+    cache.put("mensagem de crm para a live no dia 26/01 às 20h", RESPONSE)
+
+    assert cache.get("mensagem de crm sobre a live no dia 26/01 às 20h") is not None
+    assert cache.get("mensagem de crm para a live no dia 27/01 às 20h") is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = AnswerCache(ttl=60)
+    cache.put("pedido", RESPONSE)
+
+    clock.value += 59
+    assert cache.get("pedido") is not None
+    clock.value += 2
+    assert cache.get("pedido") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = AnswerCache(max_size=2)
+    cache.put("primeiro", RESPONSE)
+    cache.put("segundo", RESPONSE)
+    cache.get("primeiro")
+
+    cache.put("terceiro", RESPONSE)
+
+    assert cache.get("primeiro") is not None
+    assert cache.get("segundo") is None
+    assert cache.stats()["evicted"] == 1
+
+
+@pytest.mark.parametrize("scope", [
+    {"chat_history": [("user", "fale do curso de Excel"), ("assistant", "O curso de Excel...")]},
+    {"category": "Lançamentos > Python"},
+    {"partitions": ["lancamentos"]},
+])
+def test_scopes_are_kept_apart(scope):
+    cache = AnswerCache()
+    cache.put("gere o email", RESPONSE)
+
+    assert cache.get("gere o email", **scope) is None
+    cache.put("gere o email", {"result": "escopado", "source_documents": []}, **scope)
+    assert cache.get("gere o email", **scope)["result"] == "escopado"
+    assert cache.get("gere o email")["result"] == RESPONSE["result"]
+
+
+def test_index_generation_bump_drops_every_entry():
+    generation = IndexGeneration.for_index("test")
+    cache = AnswerCache(generation=generation)
+    cache.put("pedido", RESPONSE)
+
+    generation.bump()
+
+    assert cache.get("pedido") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+class StubPipeline:
+    """Pipeline answering every request with the same response"""
+
+    embedding = None
+    index_name = "test"
+    history_max_tokens = 1500
+    history_max_messages = 6
+
+    def __init__(self, rejected: bool):
+        self.response = {"result": "mensagem", "source_documents": [], "context_stats": None, "rejected": rejected}
+        self.calls = 0
+
+    def invoke(self, query, chat_history=None, **kwargs):
+        self.calls += 1
+        return {**self.response, "query": query}
+
+    async def ainvoke(self, query, chat_history=None, **kwargs):
+        return self.invoke(query, chat_history)
+
+    def stream(self, query, chat_history=None, **kwargs):
+        self.calls += 1
+        yield {"source_documents": [], "context_stats": None, "rejected": self.response["rejected"]}
+        yield {"token": self.response["result"]}
+
+
+@pytest.mark.parametrize("rejected", [True, False])
+def test_rejected_responses_are_never_cached(monkeypatch, rejected):
+    cache = AnswerCache()
+    monkeypatch.setattr(agent, "_answer_cache", cache)
+    pipeline = StubPipeline(rejected)
+
+    agent.run_llm("qual a capital da frança", pipeline=pipeline)
+    asyncio.run(agent.arun_llm("receita de bolo", pipeline=pipeline))
+    list(agent.stream_llm("quem ganhou o jogo", pipeline=pipeline))
+
+    assert cache.stats()["size"] == (0 if rejected else 3)
+    agent.run_llm("qual a capital da frança", pipeline=pipeline)
+    assert pipeline.calls == (4 if rejected else 3)
@@ -0,0 +1,130 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.rag import vector_store
+from app.rag.vector_store import VectorStoreHandler, is_rate_limit_error, with_backoff
+from benchmarks.fakes import FakeEmbeddings, FakePineconeIndex, RateLimitError
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping (jitter at its maximum)"""
+    delays = []
+    # Only the module's clock: the fakes keep their own (zero) latency sleeps
+    monkeypatch.setattr(vector_store, "time", SimpleNamespace(sleep=delays.append, perf_counter=time.perf_counter))
+    monkeypatch.setattr(vector_store.random, "uniform", lambda low, high: high)
+    return delays
+
+
+class Flaky:
+    def __init__(self, failures, error=RateLimitError("429 Too Many Requests")):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+def test_is_rate_limit_error():
+    class HTTPError(Exception):
+        def __init__(self, status_code):
+            self.response = type("Response", (), {"status_code": status_code})()
+
+    assert is_rate_limit_error(RateLimitError())
+    assert is_rate_limit_error(HTTPError(429))
+    assert not is_rate_limit_error(HTTPError(500))
+    assert not is_rate_limit_error(ValueError("bad request"))
+
+
+def test_retries_rate_limits_with_capped_exponential_delays(sleeps):
+    fn = Flaky(failures=5)
+
+    assert with_backoff(fn, max_retries=5, base_delay=1.0, max_delay=4.0) == "ok"
+    assert fn.calls == 6
+    assert sleeps == [1.0, 2.0, 4.0, 4.0, 4.0]
+
+
+def test_gives_up_after_max_retries(sleeps):
+    fn = Flaky(failures=10)
+
+    with pytest.raises(RateLimitError):
+        with_backoff(fn, max_retries=3)
+    assert fn.calls == 4
+    assert len(sleeps) == 3
+
+
+def test_other_errors_are_not_retried(sleeps):
+    fn = Flaky(failures=1, error=ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        with_backoff(fn)
+    assert fn.calls == 1
+    assert sleeps == []
+
+
+def build_handler(embeddings=None, index=None):
+    return VectorStoreHandler(index_name="test", embeddings=embeddings or FakeEmbeddings(dimension=16),
+                              index=index or FakePineconeIndex())
+
+
+def test_batches_split_by_count_tokens_and_namespace(monkeypatch):
+    handler = build_handler()
+    monkeypatch.setattr(vector_store, "VOYAGE_MAX_BATCH_TOKENS", 100)
+    # ~34 tokens each: at most two fit the token limit
+    long_texts = ["x" * 99] * 5
+
+    assert list(handler._iter_batches(["a"] * 7, batch_size=3)) == [(0, 3), (3, 6), (6, 7)]
+    assert list(handler._iter_batches(long_texts, batch_size=10)) == [(0, 2), (2, 4), (4, 5)]
+    assert list(handler._iter_batches(["a"] * 5, batch_size=10, namespaces=["x", "x", "y", "y", "x"])) == \
+        [(0, 2), (2, 4), (4, 5)]
+    # A text over the token limit still gets its own batch
+    assert list(handler._iter_batches(["x" * 600, "a"], batch_size=10)) == [(0, 1), (1, 2)]
+
+
+def test_add_texts_bulk_writes_each_namespace(sleeps):
+    embeddings = FakeEmbeddings(dimension=16)
+    index = FakePineconeIndex()
+    handler = build_handler(embeddings, index)
+    texts = [f"material {i}" for i in range(10)]
+    namespaces = ["lancamentos"] * 6 + ["perpetuo"] * 4
+    chunks = []
+
+    stats = handler.add_texts_bulk(texts, ids=[f"id-{i}" for i in range(10)], namespaces=namespaces,
+                                   batch_size=4, progress=chunks.append)
+
+    # 4 + 2 texts of lancamentos, then 4 of perpetuo: a batch never crosses the namespace change
+    assert stats["batches"] == 3
+    assert sorted(chunks) == [2, 4, 4]
+    assert embeddings.calls == stats["batches"]
+    assert sorted(index.namespaces["lancamentos"]) == sorted(f"id-{i}" for i in range(6))
+    assert sorted(index.namespaces["perpetuo"]) == sorted(f"id-{i}" for i in range(6, 10))
+    assert index.namespaces["perpetuo"]["id-7"]["metadata"]["text"] == "material 7"
+
+
+def test_add_texts_bulk_retries_rate_limited_calls(sleeps):
+    embeddings = FakeEmbeddings(dimension=16, rate_limit_every=2)
+    index = FakePineconeIndex(rate_limit_every=3)
+    handler = build_handler(embeddings, index)
+    generation = handler.generation.current()
+
+    stats = handler.add_texts_bulk([f"material {i}" for i in range(20)], batch_size=5, max_workers=1)
+
+    assert stats["chunks"] == 20
+    assert len(index.vectors) == 20
+    assert embeddings.rate_limiter.rejected > 0 and index.rate_limiter.rejected > 0
+    assert len(sleeps) == embeddings.rate_limiter.rejected + index.rate_limiter.rejected
+    assert handler.generation.current() != generation
+
+
+def test_add_texts_bulk_raises_once_retries_are_exhausted(sleeps):
+    handler = build_handler(index=FakePineconeIndex(rate_limit_every=1))
+
+    with pytest.raises(RateLimitError):
+        handler.add_texts_bulk(["material"], max_retries=2)
+    assert len(sleeps) == 2
@@ -0,0 +1,50 @@
+from langchain_core.documents import Document
+
+from app.agent.context import assemble_context
+
+
+def chunk(text, file_path="a.md", index=None):
+    metadata = {"file_path": file_path, "chunk_id": f"{file_path}#{index}"}
+    if index is not None:
+        metadata["chunk_index"] = index
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_merges_consecutive_chunks_without_repeating_the_overlap():
+    first = chunk("A campanha de lançamento começa na segunda-feira", index=0)
+    second = chunk("segunda-feira com uma live de abertura às 20h", index=1)
+
+    context, stats = assemble_context([second, first])
+
+    assert [document.page_content for document in context] == [
+        "A campanha de lançamento começa na segunda-feira com uma live de abertura às 20h"
+    ]
+    assert context[0].metadata["merged_chunk_ids"] == ["a.md#0", "a.md#1"]
+    assert (stats["chunks_in"], stats["chunks_out"]) == (2, 1)
+
+
+def test_keeps_non_consecutive_chunks_apart():
+    context, _ = assemble_context([chunk("primeiro trecho do email", index=0), chunk("terceiro trecho do email", index=2)])
+
+    assert len(context) == 2
+
+
+def test_drops_near_duplicates_of_more_relevant_passages():
+    text = "Últimos dias para garantir sua vaga no curso de Python com bônus exclusivo"
+    context, stats = assemble_context([
+        chunk(text, file_path="campanha_2024.md"),
+        chunk(text + " hoje", file_path="campanha_2025.md"),
+        chunk("Roteiro da live de encerramento do curso", file_path="live.md"),
+    ])
+
+    assert [document.metadata["file_path"] for document in context] == ["campanha_2024.md", "live.md"]
+    assert stats["tokens_saved"] > 0
+
+
+def test_cuts_to_the_token_budget():
+    documents = [chunk(" ".join(["palavra"] * 400), file_path=f"{i}.md") for i in range(3)]
+
+    context, stats = assemble_context(documents, max_tokens=150, duplicate_threshold=1.1)
+
+    assert stats["tokens_out"] <= 150
+    assert len(context) == 1
@@ -0,0 +1,98 @@
+import pytest
+from langchain_core.documents import Document
+
+from app.agent.conversation import ConversationStore, Source, SourceCache
+
+
+def build_store(turns):
+    store = ConversationStore()
+    for i in range(turns):
+        store.add(f"pedido {i}", f"resposta {i}")
+    return store
+
+
+def test_history_windows_the_last_messages():
+    store = build_store(4)
+
+    assert store.history() == [message for i in range(4) for message in (("human", f"pedido {i}"), ("ai", f"resposta {i}"))]
+    assert store.history(2) == [("human", "pedido 3"), ("ai", "resposta 3")]
+    # An odd window starts with the answer of the previous turn
+    assert store.history(3) == [("ai", "resposta 2"), ("human", "pedido 3"), ("ai", "resposta 3")]
+    assert store.history(100) == store.history()
+    assert store.history(0) == []
+    assert ConversationStore().history(6) == []
+
+
+@pytest.mark.parametrize("number, expected", [
+    (0, ["pedido 5", "pedido 6"]),
+    (1, ["pedido 3", "pedido 4"]),
+    (3, ["pedido 0"]),
+    (4, []),
+])
+def test_pages_hold_the_most_recent_turns_first(number, expected):
+    store = build_store(7)
+
+    assert [turn.prompt for turn in store.page(number, 2)] == expected
+
+
+def test_page_count():
+    assert ConversationStore().pages(5) == 1
+    assert build_store(5).pages(5) == 1
+    assert build_store(6).pages(5) == 2
+
+
+def test_turn_ids_and_sources():
+    store = ConversationStore()
+    documents = [
+        Document(page_content="a b", metadata={"file_path": "a.md", "merged_chunk_ids": ["a-0", "a-1"]}),
+        Document(page_content="c", metadata={"file_path": "c.md", "chunk_id": "c-0"}),
+        Document(page_content="sem id", metadata={"file_path": "d.md"}),
+    ]
+
+    first = store.add("pedido", "resposta", documents)
+    second = store.add("pedido", "resposta")
+
+    assert (first.id, second.id) == (0, 1)
+    assert [source.key for source in first.sources] == ["a-0+a-1", "c-0", ""]
+    # Only passages without chunk IDs keep their text
+    assert [source.text for source in first.sources] == [None, None, "sem id"]
+    assert store.latest_sources == ()
+
+
+class CountingFetch:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = []
+
+    def __call__(self, ids):
+        self.calls.append(ids)
+        return {id: self.chunks[id] for id in ids if id in self.chunks}
+
+
+def test_source_cache_serves_remembered_passages():
+    fetch = CountingFetch({})
+    cache = SourceCache(fetch)
+    document = Document(page_content="a b", metadata={"merged_chunk_ids": ["a-0", "a-1"]})
+
+    cache.remember([document])
+
+    assert cache.text(Source.from_document(document)) == "a b"
+    assert cache.text(Source("d.md", (), "sem id")) == "sem id"
+    assert fetch.calls == []
+
+
+def test_source_cache_fetches_evicted_passages():
+    fetch = CountingFetch({"a-0": "a", "a-1": "b", "c-0": "c"})
+    cache = SourceCache(fetch, max_size=1)
+    merged = Document(page_content="a\nb", metadata={"merged_chunk_ids": ["a-0", "a-1"]})
+    single = Document(page_content="c", metadata={"chunk_id": "c-0"})
+
+    cache.remember([merged, single])
+
+    assert cache.text(Source.from_document(single)) == "c"
+    # Evicted: the chunks of the merged passage are fetched and joined
+    assert cache.text(Source.from_document(merged)) == "a\nb"
+    assert fetch.calls == [["a-0", "a-1"]]
+    # Fetching it back evicted the other passage
+    assert cache.text(Source.from_document(single)) == "c"
+    assert fetch.calls == [["a-0", "a-1"], ["c-0"]]
@@ -0,0 +1,110 @@
+import pytest
+
+from app.rag.document_processor import DocumentProcessor
+from app.rag.text_utils import estimate_tokens
+
+MARKDOWN = """Introdução antes de qualquer título.
+
+# Lançamento
+
+Visão geral do lançamento do curso de Python.
+
+## Etapa 1
+
+- Enviar email de aquecimento
+- Publicar stories com contagem regressiva
+- Abrir lista de espera
+
+## Etapa 2
+
+{long_paragraph}
+
+```python
+# Não é um título: está dentro do bloco de código
+print("inscrições abertas")
+```
+
+### Mensagens
+
+| Canal | Mensagem |
+| --- | --- |
+| Email | Faltam 3 dias! |
+
+# Perpétuo
+
+## Sem corpo
+
+## Oferta
+
+Desconto para quem já é aluno.
+"""
+
+LONG_PARAGRAPH = " ".join(
+    f"Frase {i} sobre a campanha de lançamento com chamada para ação clara e datas destacadas." for i in range(40)
+)
+
+
+@pytest.fixture
+def chunks():
+    processor = DocumentProcessor(mode="markdown", max_tokens=64)
+    return processor.split_markdown(MARKDOWN.format(long_paragraph=LONG_PARAGRAPH), {"file_path": "lancamento.md"})
+
+
+def test_chunks_fit_the_token_budget(chunks):
+    assert len(chunks) > 5
+    assert all(estimate_tokens(chunk.page_content) <= 64 for chunk in chunks)
+
+
+def test_carried_headings_count_towards_the_budget():
+    processor = DocumentProcessor(mode="markdown", max_tokens=64)
+    # A single sentence, cut at word boundaries
+    chunks = processor.split_markdown("# Lançamento\n\n## Etapa longa\n\n" + " ".join(["palavra"] * 200))
+
+    assert chunks[0].page_content.startswith("# Lançamento\n\n## Etapa longa\n\npalavra")
+    assert all(estimate_tokens(chunk.page_content) <= 64 for chunk in chunks)
+    assert sum(chunk.page_content.count("palavra") for chunk in chunks) == 200
+
+
+def test_chunks_never_mix_sections(chunks):
+    sections = {}
+    for chunk in chunks:
+        sections.setdefault(chunk.metadata["section_path"], []).append(chunk.page_content)
+
+    assert sections[""] == ["Introdução antes de qualquer título."]
+    assert all("Abrir lista de espera" not in text for text in sections["Lançamento > Etapa 2"])
+    assert any("Frase 39" in text for text in sections["Lançamento > Etapa 2"])
+    assert any("print(" in text for text in sections["Lançamento > Etapa 2"])
+    assert sections["Lançamento > Etapa 2 > Mensagens"] == [
+        "### Mensagens\n\n| Canal | Mensagem |\n| --- | --- |\n| Email | Faltam 3 dias! |"
+    ]
+    # A heading without body is carried into the next chunk of its level
+    assert sections["Perpétuo > Oferta"] == ["# Perpétuo\n\n## Oferta\n\nDesconto para quem já é aluno."]
+    assert all(chunk.metadata["file_path"] == "lancamento.md" for chunk in chunks)
+
+
+def test_oversized_blocks_are_cut_without_losing_words(chunks):
+    text = " ".join(chunk.page_content for chunk in chunks if chunk.metadata["section_path"] == "Lançamento > Etapa 2")
+
+    assert all(f"Frase {i} " in text for i in range(40))
+
+
+def test_list_items_stay_together(chunks):
+    etapa_1, = [chunk.page_content for chunk in chunks if chunk.metadata["section_path"] == "Lançamento > Etapa 1"]
+
+    assert etapa_1.startswith("## Etapa 1\n\n- Enviar email")
+    assert etapa_1.endswith("- Abrir lista de espera")
+
+
+def test_iter_chunks_uses_the_mode():
+    processor = DocumentProcessor(mode="markdown", max_tokens=64)
+    documents = [{"content": "# A\n\ntexto a", "metadata": {"file_path": "a.md"}},
+                 {"content": "# B\n\ntexto b", "metadata": {"file_path": "b.md"}}]
+
+    chunks = list(processor.iter_chunks(documents))
+
+    assert [(chunk.metadata["file_path"], chunk.metadata["section_path"]) for chunk in chunks] == [("a.md", "A"), ("b.md", "B")]
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        DocumentProcessor(mode="semantic")
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.rag.embedding_cache import CachedEmbeddings
+from benchmarks.fakes import FakeEmbeddings
+
+
+def test_memory_hits_before_disk_hits(tmp_path):
+    provider = FakeEmbeddings(dimension=16)
+    cache = CachedEmbeddings(provider, model_name="fake", cache_path=str(tmp_path / "embeddings.sqlite"), max_memory_items=2)
+
+    first = cache.embed_documents(["a", "b", "c"])
+    assert provider.texts == 3
+
+    # "c" is still in memory, "a" was evicted from the LRU but is on disk
+    assert cache.embed_documents(["c", "a"]) == [first[2], first[0]]
+    assert provider.texts == 3
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    vector = CachedEmbeddings(FakeEmbeddings(dimension=16), model_name="fake", cache_path=path).embed_query("crm")
+
+    provider = FakeEmbeddings(dimension=16)
+    reopened = CachedEmbeddings(provider, model_name="fake", cache_path=path)
+
+    assert reopened.embed_query("crm") == pytest.approx(vector)
+    assert provider.calls == 0
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_keys_separate_models_and_kinds(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    provider = FakeEmbeddings(dimension=16)
+    cache = CachedEmbeddings(provider, model_name="model-a", cache_path=path)
+
+    cache.embed_documents(["crm"])
+    cache.embed_query("crm")
+    assert provider.texts == 2
+
+    other_model = CachedEmbeddings(provider, model_name="model-b", cache_path=path)
+    other_model.embed_documents(["crm"])
+    assert provider.texts == 3
+
+
+def test_duplicate_misses_share_one_provider_call():
+    provider = FakeEmbeddings(dimension=16)
+    cache = CachedEmbeddings(provider, model_name="fake", cache_path=None)
+
+    vectors = cache.embed_documents(["a", "b", "a"])
+
+    assert provider.calls == 1
+    assert provider.texts == 2
+    assert vectors[0] == vectors[2]
+
+
+def test_concurrent_async_queries_share_one_call():
+    provider = FakeEmbeddings(dimension=16, latency=0.02)
+    cache = CachedEmbeddings(provider, model_name="fake", cache_path=None)
+
+    async def run():
+        return await asyncio.gather(*(cache.aembed_query("crm") for _ in range(5)))
+
+    vectors = asyncio.run(run())
+
+    assert provider.calls == 1
+    assert all(vector == vectors[0] for vector in vectors)
+    assert cache._inflight == {}
+    # Later calls are served from memory
+    asyncio.run(cache.aembed_query("crm"))
+    assert provider.calls == 1
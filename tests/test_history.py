@@ -0,0 +1,92 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agent.history import (
+    MIN_STANDALONE_WORDS, RephraseCache, history_digest, is_standalone, message_parts, trim_history
+)
+
+
+def test_message_parts_of_tuples_and_messages():
+    assert message_parts(("human", "oi")) == ("human", "oi")
+    assert message_parts(["ai", 42]) == ("ai", "42")
+    assert message_parts(HumanMessage(content="oi")) == ("human", "oi")
+    assert message_parts(AIMessage(content="olá")) == ("ai", "olá")
+
+
+def test_trim_history_keeps_the_most_recent_messages():
+    history = [("human", f"mensagem {i}") for i in range(10)]
+
+    assert trim_history(history, max_tokens=1500, max_messages=3) == history[-3:]
+    assert trim_history(None) == []
+    assert trim_history([]) == []
+
+
+def test_trim_history_respects_the_token_budget():
+    # ~34 tokens each (3 characters per token)
+    history = [("human", "x" * 99), ("ai", "y" * 99), ("human", "z" * 99)]
+
+    assert trim_history(history, max_tokens=70, max_messages=6) == history[-2:]
+    # The latest message is kept even when it alone exceeds the budget
+    assert trim_history(history, max_tokens=10, max_messages=6) == history[-1:]
+
+
+@pytest.mark.parametrize("query", [
+    "deixe mais curto",
+    "reescreva com um tom mais formal e com menos emojis",
+    "agora faça uma versão para o público do curso de Python",
+    "use essa mensagem como base para o email de lançamento",
+])
+def test_follow_ups(query):
+    assert not is_standalone(query)
+
+
+@pytest.mark.parametrize("query", [
+    "Gere uma mensagem de CRM de contagem regressiva para o curso de Python",
+    "Crie um email de abertura de carrinho para o lançamento do curso",
+    # Accent folding: "está" is not the follow-up word "esta"
+    "O lançamento está chegando, crie um post para o Instagram",
+])
+def test_standalone_requests(query):
+    assert is_standalone(query)
+
+
+def test_short_requests_are_follow_ups():
+    words = ["mensagem", "crm", "curso", "python", "lançamento", "email", "post"]
+
+    assert not is_standalone(" ".join(words[:MIN_STANDALONE_WORDS - 1]))
+    assert is_standalone(" ".join(words[:MIN_STANDALONE_WORDS]))
+
+
+def test_history_digest_depends_on_roles_and_order():
+    history = [("human", "a"), ("ai", "b")]
+
+    assert history_digest(history) == history_digest([HumanMessage(content="a"), AIMessage(content="b")])
+    assert history_digest(history) != history_digest(history[::-1])
+    assert history_digest(history) != history_digest([("ai", "a"), ("ai", "b")])
+
+
+def test_rephrase_cache():
+    cache = RephraseCache(max_size=2)
+    history = [("human", "mensagem de crm"), ("ai", "...")]
+
+    assert cache.get(history, "deixe mais curto") is None
+    cache.put(history, "deixe mais curto", "mensagem de crm curta")
+
+    # Keyed by the normalized request and the history window
+    assert cache.get(history, "  Deixe mais CURTO ") == "mensagem de crm curta"
+    assert cache.get(history[:1], "deixe mais curto") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_rephrase_cache_evicts_the_least_recently_used():
+    cache = RephraseCache(max_size=2)
+    history = [("human", "mensagem de crm")]
+
+    cache.put(history, "a", "A")
+    cache.put(history, "b", "B")
+    cache.get(history, "a")
+    cache.put(history, "c", "C")
+
+    assert cache.get(history, "b") is None
+    assert cache.get(history, "a") == "A"
+    assert cache.get(history, "c") == "C"
@@ -0,0 +1,82 @@
+from langchain.schema import Document
+
+from app.rag.index_generation import IndexGeneration
+from app.rag.lexical_index import HybridRetriever, LexicalIndex, ReloadingLexicalIndex
+from benchmarks.fakes import FakeEmbeddings, FakeVectorStore
+
+DOCUMENTS = [
+    Document(page_content="Contagem regressiva para o lançamento do curso de Python", metadata={"chunk_id": "python", "partition": "lancamentos"}),
+    Document(page_content="Email de boas-vindas aos alunos do curso de Excel", metadata={"chunk_id": "excel", "partition": "perpetuo"}),
+    Document(page_content="Roteiro da live de abertura da imersão Power BI", metadata={"chunk_id": "powerbi", "partition": "eventos"}),
+]
+
+
+def test_bm25_ranks_matching_terms_first():
+    index = LexicalIndex.build(DOCUMENTS)
+
+    results = index.similarity_search_with_score("lançamentos de Python", k=3)
+
+    assert results[0][0].metadata["chunk_id"] == "python"
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_filter_and_snapshot_round_trip(tmp_path):
+    LexicalIndex.build(DOCUMENTS).save(str(tmp_path))
+    index = LexicalIndex.load(str(tmp_path))
+
+    results = index.similarity_search("curso", k=3, filter={"partition": "perpetuo"})
+
+    assert [doc.metadata["chunk_id"] for doc in results] == ["excel"]
+    assert [doc.page_content for doc in index.documents()] == [doc.page_content for doc in DOCUMENTS]
+
+
+def test_reciprocal_rank_fusion_favors_documents_in_both_rankings():
+    retriever = HybridRetriever(vectorstore=FakeVectorStore(FakeEmbeddings(dimension=16)), lexical_index=LexicalIndex.build(DOCUMENTS), k=2)
+    python, excel, powerbi = DOCUMENTS
+
+    fused = retriever._fuse([python, excel], [powerbi, excel])
+
+    assert [doc.metadata["chunk_id"] for doc in fused] == ["excel", "python"]
+
+
+def test_reloads_the_snapshot_when_the_generation_changes(tmp_path):
+    generation = IndexGeneration.for_index("test")
+    LexicalIndex.build(DOCUMENTS[:1]).save(str(tmp_path))
+    index = ReloadingLexicalIndex(str(tmp_path), generation)
+    assert index.count == 1
+
+    LexicalIndex.build(DOCUMENTS).save(str(tmp_path))
+    assert index.count == 1
+
+    generation.bump()
+    assert index.count == 3
+
+
+CRM_DOCUMENTS = [
+    Document(page_content=text, metadata={"chunk_id": str(i)}) for i, text in enumerate([
+        "Mensagem de CRM para alunos do curso de Python",
+        "Mensagem de CRM de contagem regressiva da imersão Power BI",
+        "Modelo de mensagem para a régua de CRM do lançamento",
+        "Roteiro da live de abertura do curso de Excel em 26/01",
+        "Post de Instagram anunciando a turma de Dados",
+    ])
+]
+
+
+def retriever():
+    return HybridRetriever(vectorstore=FakeVectorStore(FakeEmbeddings(dimension=16)), lexical_index=LexicalIndex.build(CRM_DOCUMENTS))
+
+
+def test_generic_query_does_not_take_the_fast_path():
+    # Several chunks contain every term: each scores about 1.0, none stands out
+    documents, confident = retriever()._lexical("mensagem de CRM")
+
+    assert len(documents) >= 3
+    assert not confident
+
+
+def test_discriminative_query_takes_the_fast_path():
+    documents, confident = retriever()._lexical("live de abertura Excel 26/01")
+
+    assert confident
+    assert documents[0].metadata["chunk_id"] == "3"
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from app.rag.local_index import LocalVectorStore, match_filter
+from benchmarks.fakes import FakeEmbeddings, FakePineconeIndex
+
+
+class VectorEmbeddings:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def build_store(path=None):
+    store = LocalVectorStore(VectorEmbeddings({"q": [1.0, 0.0]}), path=path)
+    # Similarity to "q" decreases with the angle
+    store.upsert([
+        {"id": f"doc-{i}", "values": [np.cos(i / 10), np.sin(i / 10)],
+         "metadata": {"text": f"material {i}", "category": "Lançamentos" if i % 2 else "Perpétuo", "tags": ["crm", str(i)]}}
+        for i in range(10)
+    ])
+    return store
+
+
+def test_top_k_is_ordered_by_similarity():
+    store = build_store()
+
+    scored = store.similarity_search_with_score("q", k=4)
+
+    assert [doc.id for doc, _ in scored] == ["doc-0", "doc-1", "doc-2", "doc-3"]
+    assert [score for _, score in scored] == sorted((score for _, score in scored), reverse=True)
+    assert scored[0][1] == pytest.approx(1.0)
+    assert len(store.similarity_search("q", k=50)) == 10
+
+
+@pytest.mark.parametrize("filter, expected", [
+    ({"category": "Lançamentos"}, ["doc-1", "doc-3"]),
+    ({"category": {"$eq": "Perpétuo"}}, ["doc-0", "doc-2"]),
+    ({"category": {"$in": ["Lançamentos", "Outros"]}}, ["doc-1", "doc-3"]),
+    # List fields match when any element does (the non-vectorized path)
+    ({"tags": {"$in": ["4", "7"]}}, ["doc-4", "doc-7"]),
+    ({"category": "Outros"}, []),
+])
+def test_filters(filter, expected):
+    store = build_store()
+
+    assert [doc.id for doc in store.similarity_search("q", k=2, filter=filter)] == expected
+
+
+def test_filters_match_the_pinecone_semantics():
+    store = build_store()
+    index = FakePineconeIndex()
+    index.upsert([{"id": id, **vector} for id, vector in store.fetch(store.ids)["vectors"].items()])
+    filter = {"category": {"$in": ["Lançamentos"]}, "tags": {"$eq": "crm"}}
+
+    local = [match["id"] for match in store.query([1.0, 0.0], top_k=3, filter=filter)["matches"]]
+    reference = [match["id"] for match in index.query([1.0, 0.0], top_k=3, filter=filter)["matches"]]
+
+    assert local == reference
+    assert match_filter({"category": "Lançamentos"}, {"$or": [{"category": "Perpétuo"}, {"category": {"$ne": "Perpétuo"}}]})
+
+
+def test_save_and_memory_mapped_load(tmp_path):
+    build_store().save(tmp_path / "index")
+
+    loaded = LocalVectorStore(VectorEmbeddings({"q": [1.0, 0.0]}), path=tmp_path / "index")
+
+    assert isinstance(loaded._matrix, np.memmap)
+    assert loaded.count == 10
+    assert [doc.id for doc in loaded.similarity_search("q", k=2, filter={"category": "Lançamentos"})] == ["doc-1", "doc-3"]
+    assert loaded.fetch(["doc-3"])["vectors"]["doc-3"]["metadata"]["text"] == "material 3"
+
+    # The first write copies the read-only map into RAM
+    loaded.upsert([{"id": "doc-new", "values": [1.0, 0.0], "metadata": {"text": "novo"}}])
+    assert loaded.count == 11
+    assert not isinstance(loaded._matrix, np.memmap)
+
+
+def test_upsert_overwrites_and_delete_compacts():
+    store = build_store()
+
+    store.upsert([{"id": "doc-9", "values": [1.0, 0.0], "metadata": {"text": "atualizado"}}])
+    store.delete(ids=["doc-0", "missing"])
+
+    assert store.count == 9
+    top, = store.similarity_search("q", k=1)
+    assert (top.id, top.page_content) == ("doc-9", "atualizado")
+    assert store.describe_index_stats()["total_vector_count"] == 9
+
+
+def test_from_texts():
+    store = LocalVectorStore.from_texts(["mensagem de crm", "receita de bolo"], FakeEmbeddings(), ids=["crm", "bolo"])
+
+    assert store.similarity_search("mensagem de crm", k=1)[0].id == "crm"
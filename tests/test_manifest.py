@@ -0,0 +1,99 @@
+import json
+
+from langchain.schema import Document
+
+from app.rag.manifest import METADATA_VERSION, IndexManifest, assign_chunk_ids, chunk_id
+from app.rag.vector_store import VectorStoreHandler
+from benchmarks.fakes import FakeEmbeddings, FakePineconeIndex
+
+
+def chunks(texts, source="a.md"):
+    return [Document(page_content=text, metadata={"file_path": source}) for text in texts]
+
+
+def handler():
+    return VectorStoreHandler(index_name="test", embeddings=FakeEmbeddings(dimension=16), index=FakePineconeIndex())
+
+
+def test_chunk_id_is_stable():
+    assert chunk_id("a.md", 0, "texto") == chunk_id("a.md", 0, "texto")
+    assert chunk_id("a.md", 0, "texto") != chunk_id("a.md", 1, "texto")
+    assert chunk_id("a.md", 0, "texto") != chunk_id("b.md", 0, "texto")
+    assert chunk_id("a.md", 0, "texto") != chunk_id("a.md", 0, "texto novo")
+
+
+def test_assign_chunk_ids_numbers_positions_per_source():
+    documents = chunks(["um", "dois"]) + chunks(["três"], source="b.md")
+    ids = assign_chunk_ids(documents)
+
+    assert ids == assign_chunk_ids(chunks(["um", "dois"]) + chunks(["três"], source="b.md"))
+    assert [document.metadata["chunk_index"] for document in documents] == [0, 1, 0]
+    assert [document.metadata["chunk_id"] for document in documents] == ids
+
+
+def test_plan_upserts_new_and_deletes_removed(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), "test")
+    manifest.update({"a.md": ["a1", "a2"], "b.md": ["b1"]})
+
+    to_upsert, to_delete = manifest.plan({"a.md": ["a1", "a3"]})
+
+    assert to_upsert == {"a3"}
+    assert to_delete == {"a2", "b1"}
+
+
+def test_plan_scoped_to_sources_leaves_others(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), "test")
+    manifest.update({"a.md": ["a1"], "b.md": ["b1"]}, {"a.md": "x", "b.md": "y"})
+
+    to_upsert, to_delete = manifest.plan({"a.md": ["a2"]}, sources=manifest.sources_in(["x"]))
+
+    assert to_upsert == {"a2"}
+    assert to_delete == {"a1"}
+
+
+def test_manifest_without_metadata_version_upserts_everything(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"index_name": "test", "sources": {"a.md": ["a1"]}, "partitions": {}}))
+    manifest = IndexManifest(str(path), "test")
+
+    assert manifest.stale
+    assert manifest.plan({"a.md": ["a1"]}) == ({"a1"}, set())
+
+    manifest.update({"a.md": ["a1"]})
+    manifest.save()
+    reloaded = IndexManifest(str(path), "test")
+    assert reloaded.metadata_version == METADATA_VERSION
+    assert reloaded.plan({"a.md": ["a1"]}) == (set(), set())
+
+
+def test_sync_documents_is_incremental(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), "test")
+    store = handler()
+
+    first = store.sync_documents(chunks(["um", "dois", "três"]), manifest)
+    second = store.sync_documents(chunks(["um", "dois", "quatro"]), manifest)
+
+    assert (first["added"], first["deleted"]) == (3, 0)
+    assert (second["added"], second["deleted"], second["unchanged"]) == (1, 1, 2)
+    assert store.index.describe_index_stats()["total_vector_count"] == 3
+
+
+def test_delete_all_clears_the_manifest(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), "test")
+    store = handler()
+    store.sync_documents(chunks(["um", "dois"]), manifest)
+
+    store.delete_all(manifest)
+
+    assert IndexManifest(str(tmp_path / "manifest.json"), "test").sources == {}
+    assert store.sync_documents(chunks(["um", "dois"]), manifest)["added"] == 2
+
+
+def test_sync_documents_refills_an_index_emptied_elsewhere(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), "test")
+    store = handler()
+    store.sync_documents(chunks(["um", "dois"]), manifest)
+
+    store.delete_all()
+
+    assert store.sync_documents(chunks(["um", "dois"]), manifest)["added"] == 2
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from langchain_core.vectorstores.utils import maximal_marginal_relevance as reference_mmr
+
+from app.rag.local_index import LocalVectorStore
+from app.rag.mmr import MMRVectorStore, maximal_marginal_relevance
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.5, 1.0])
+def test_matches_the_langchain_reference(lambda_mult):
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(32).astype(np.float32)
+    candidates = rng.standard_normal((50, 32)).astype(np.float32)
+
+    selected = maximal_marginal_relevance(query, candidates, k=8, lambda_mult=lambda_mult)
+
+    assert list(selected) == reference_mmr(query[None], candidates, lambda_mult, 8)
+
+
+def test_k_larger_than_candidates():
+    candidates = np.eye(3, dtype=np.float32)
+
+    assert sorted(maximal_marginal_relevance(candidates[0], candidates, k=10)) == [0, 1, 2]
+    assert len(maximal_marginal_relevance(candidates[0], candidates[:0], k=4)) == 0
+
+
+def test_skips_near_duplicates():
+    # Two copies of the best match and a less relevant, different one
+    candidates = np.array([[1.0, 0.0], [1.0, 0.01], [0.6, 0.8]], dtype=np.float32)
+    query = np.array([1.0, 0.2], dtype=np.float32)
+
+    assert list(maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.5)) == [1, 2]
+
+
+class VectorEmbeddings:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def test_mmr_vector_store_keeps_query_similarity_scores():
+    store = LocalVectorStore(VectorEmbeddings({"q": [1.0, 0.2]}))
+    store.upsert([
+        {"id": "a", "values": [1.0, 0.0], "metadata": {"text": "a"}},
+        {"id": "a-copy", "values": [1.0, 0.01], "metadata": {"text": "a copy"}},
+        {"id": "b", "values": [0.6, 0.8], "metadata": {"text": "b"}},
+    ])
+
+    scored = MMRVectorStore(store, fetch_k=3, lambda_mult=0.5).similarity_search_with_score("q", k=2)
+    plain = dict((doc.id, score) for doc, score in store.similarity_search_with_score("q", k=3))
+
+    assert [doc.id for doc, _ in scored] == ["a-copy", "b"]
+    assert all(score == pytest.approx(plain[doc.id]) for doc, score in scored)
+
+
+def test_from_texts_builds_a_local_index():
+    from benchmarks.fakes import FakeEmbeddings
+
+    store = MMRVectorStore.from_texts(["python", "excel", "power bi"], FakeEmbeddings(dimension=32), fetch_k=3)
+
+    assert isinstance(store.vectorstore, LocalVectorStore)
+    assert store.similarity_search("python", k=1)[0].page_content == "python"
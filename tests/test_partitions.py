@@ -0,0 +1,133 @@
+import pytest
+from langchain.schema import Document
+
+from app.agent import agent
+from app.rag.loader import PARTITION_KEY, partition_filter
+from app.rag.manifest import IndexManifest
+from app.rag.partitioned_store import PartitionedVectorStore
+from app.rag.partitions import PartitionRegistry, PartitionRouter
+from app.rag.vector_store import VectorStoreHandler
+from benchmarks.fakes import FakeEmbeddings, FakePineconeIndex
+
+
+def chunk(text, partition, source=None):
+    return Document(page_content=text, metadata={"file_path": source or f"{partition}/{text}.md", PARTITION_KEY: partition})
+
+
+def partitioned_handler():
+    return VectorStoreHandler(index_name="test", embeddings=FakeEmbeddings(dimension=32), index=FakePineconeIndex(), partitioned=True)
+
+
+@pytest.mark.parametrize("filter, namespaces, rest", [
+    (None, None, None),
+    ({"category": "A"}, None, {"category": "A"}),
+    ({PARTITION_KEY: "lancamentos"}, ["lancamentos"], None),
+    ({PARTITION_KEY: {"$in": ["b", "a"]}, "category": "A"}, ["a", "b"], {"category": "A"}),
+    ({PARTITION_KEY: {"$eq": "a", "$in": ["a", "b"]}}, ["a"], None),
+    ({PARTITION_KEY: {"$ne": "a"}}, None, {PARTITION_KEY: {"$ne": "a"}}),
+])
+def test_split_filter(filter, namespaces, rest):
+    assert PartitionedVectorStore._split_filter(filter) == (namespaces, rest)
+
+
+def test_sync_writes_each_partition_to_its_namespace(tmp_path):
+    handler = partitioned_handler()
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), "test")
+
+    stats = handler.sync_documents([chunk("python", "lancamentos"), chunk("excel", "perpetuo"), chunk("dados", "lancamentos")], manifest)
+
+    assert stats["partitions"] == {"lancamentos": 2, "perpetuo": 1}
+    assert {namespace: len(vectors) for namespace, vectors in handler.index.namespaces.items()} == {"lancamentos": 2, "perpetuo": 1}
+    assert manifest.namespaced
+
+
+def test_search_fans_out_to_selected_namespaces_and_merges_by_score(tmp_path):
+    handler = partitioned_handler()
+    handler.sync_documents(
+        [chunk(text, partition) for partition in ("a", "b", "c") for text in (f"{partition} um", f"{partition} dois")],
+        IndexManifest(str(tmp_path / "manifest.json"), "test"),
+    )
+    store = handler.vectorstore
+
+    everything = store.similarity_search_with_score("a um", k=6)
+    scoped = store.similarity_search_with_score("a um", k=6, filter=partition_filter(["a", "b"]))
+
+    assert {doc.metadata[PARTITION_KEY] for doc, _ in everything} == {"a", "b", "c"}
+    assert {doc.metadata[PARTITION_KEY] for doc, _ in scoped} == {"a", "b"}
+    assert [score for _, score in scoped] == sorted((score for _, score in scoped), reverse=True)
+    assert scoped[0][0].page_content == "a um"
+
+
+def test_reindexing_one_partition_leaves_the_others(tmp_path):
+    handler = partitioned_handler()
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), "test")
+    handler.sync_documents([chunk("python", "a"), chunk("excel", "b")], manifest)
+
+    stats = handler.sync_documents([chunk("python v2", "a", source="a/python.md")], manifest, partitions=["a"])
+
+    assert (stats["added"], stats["deleted"]) == (1, 1)
+    assert sorted(item["metadata"]["text"] for item in handler.index.namespaces["a"].values()) == ["python v2"]
+    assert [item["metadata"]["text"] for item in handler.index.namespaces["b"].values()] == ["excel"]
+    assert set(manifest.sources) == {"a/python.md", "b/excel.md"}
+
+
+def test_scoped_sync_refuses_a_manifest_of_another_layout(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"), "test")
+    VectorStoreHandler(index_name="test", embeddings=FakeEmbeddings(dimension=32), index=FakePineconeIndex()).sync_documents(
+        [chunk("python", "a")], manifest
+    )
+
+    with pytest.raises(ValueError):
+        partitioned_handler().sync_documents([chunk("python", "a")], manifest, partitions=["a"])
+
+
+def test_from_texts_routes_texts_by_partition():
+    index = FakePineconeIndex()
+    store = PartitionedVectorStore.from_texts(
+        ["python", "excel", "sem partição"], FakeEmbeddings(dimension=32),
+        metadatas=[{PARTITION_KEY: "a"}, {PARTITION_KEY: "b"}, {}], index=index,
+    )
+
+    assert {namespace: len(vectors) for namespace, vectors in index.namespaces.items()} == {"a": 1, "b": 1, "": 1}
+    assert store.similarity_search("python", k=1, filter=partition_filter(["a"]))[0].page_content == "python"
+
+
+def test_registry_update_of_one_partition_keeps_the_others_and_keywords(tmp_path):
+    registry = PartitionRegistry(str(tmp_path / "partitions.json"))
+    registry.update([Document(page_content="x", metadata={PARTITION_KEY: "a", "category": "A"}),
+                     Document(page_content="y", metadata={PARTITION_KEY: "b", "category": "B"})])
+    registry.partitions["a"]["keywords"] = ["python"]
+    registry.save()
+
+    registry = PartitionRegistry(str(tmp_path / "partitions.json"))
+    registry.update([Document(page_content="z", metadata={PARTITION_KEY: "a", "category": "A > Nova"})], partitions=["a"])
+
+    assert registry.names == ["a", "b"]
+    assert registry.partitions["a"] == {"categories": ["A > Nova"], "chunks": 1, "keywords": ["python"]}
+
+
+def test_router_picks_the_partitions_of_the_most_specific_keyword():
+    router = PartitionRouter({
+        "lancamentos": ["Lançamentos", "Python", "campanha", "curso"],
+        "perpetuo": ["Perpétuo", "Excel", "campanha", "curso"],
+        "eventos": ["Eventos", "Imersão Power BI", "curso"],
+    })
+
+    assert router.route("Campanha de lançamento do curso de Python") == ["lancamentos"]
+    assert router.route("Roteiro da imersão de power bi") == ["eventos"]
+    assert router.route("Mensagem para a campanha") == ["lancamentos", "perpetuo"]
+    assert router.route("Mensagem sobre o curso") is None  # in every partition: not scoped
+    assert router.route("Bom dia") is None
+    assert router.route("Python", selected=["perpetuo"]) == ["perpetuo"]
+
+
+def test_agent_route_is_opt_in(monkeypatch):
+    monkeypatch.setattr(agent, "_router", PartitionRouter({"lancamentos": ["Python"], "perpetuo": ["Excel"]}))
+    monkeypatch.delenv("PARTITION_ROUTING", raising=False)
+
+    assert agent.route("Email do curso de Python") is None
+    assert agent.route("Email do curso de Python", partitions=["perpetuo"]) == ["perpetuo"]
+
+    monkeypatch.setenv("PARTITION_ROUTING", "true")
+    assert agent.route("Email do curso de Python") == ["lancamentos"]
+    assert agent.route("Email do curso de Python", category="Lançamentos > Python") is None
@@ -0,0 +1,104 @@
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+
+from app.agent.guard.theme_based_guardrail import ThemeBasedGuardrail
+from app.agent.pipeline import RagPipeline
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakeVectorStore, synthetic_texts
+
+QUERY = "Gere uma mensagem de CRM de contagem regressiva para o curso de Python"
+
+
+def build_pipeline(theme_response=None, theme_latency=0.0):
+    embedding = FakeEmbeddings()
+    vectorstore = FakeVectorStore(embedding)
+    vectorstore.add_texts(synthetic_texts(20), metadatas=[{"file_path": f"doc_{i}.md"} for i in range(20)])
+    theme_guardrail = None
+    if theme_response is not None:
+        # Every score falls inside the band, so the LLM fallback always decides
+        theme_guardrail = ThemeBasedGuardrail(
+            embedding=embedding,
+            llm=FakeChatModel(response=theme_response, latency=theme_latency),
+            ambiguity_band=(-2.0, 2.0),
+        )
+    llm = FakeChatModel(response="Contagem regressiva: faltam 3 dias!")
+    return RagPipeline(embedding=embedding, vectorstore=vectorstore, llm=llm, theme_guardrail=theme_guardrail)
+
+
+def test_ainvoke_matches_invoke():
+    pipeline = build_pipeline(theme_response="true")
+
+    response = asyncio.run(pipeline.ainvoke(QUERY))
+
+    assert response["result"] == "Contagem regressiva: faltam 3 dias!"
+    assert response["rejected"] is False
+    assert response["source_documents"]
+    assert [doc.page_content for doc in response["source_documents"]] == \
+        [doc.page_content for doc in pipeline.invoke(QUERY)["source_documents"]]
+
+
+def test_astream_sends_the_sources_before_the_tokens():
+    pipeline = build_pipeline(theme_response="true")
+
+    async def collect():
+        return [event async for event in pipeline.astream(QUERY)]
+
+    events = asyncio.run(collect())
+
+    assert set(events[0]) == {"source_documents", "context_stats", "rejected"}
+    assert events[0]["rejected"] is False
+    assert all(set(event) == {"token"} for event in events[1:])
+    assert "".join(event["token"] for event in events[1:]) == "Contagem regressiva: faltam 3 dias!"
+
+
+def test_astream_of_a_rejected_request_sends_the_guardrail_message():
+    pipeline = build_pipeline(theme_response="false")
+
+    async def collect():
+        return [event async for event in pipeline.astream("receita de bolo de cenoura")]
+
+    events = asyncio.run(collect())
+
+    assert events == [
+        {"source_documents": [], "context_stats": None, "rejected": True},
+        {"token": pipeline.theme_guardrail.default_message["result"]},
+    ]
+    assert pipeline.llm.calls == 0
+
+
+def test_theme_rejection_cancels_the_in_flight_retrieval():
+    pipeline = build_pipeline(theme_response="false", theme_latency=0.01)
+    retrieval = {"started": False, "cancelled": False}
+
+    async def slow_retrieve(inputs, config=None):
+        retrieval["started"] = True
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            retrieval["cancelled"] = True
+            raise
+        return {"relevant": True, "documents": [], "message": None}
+
+    pipeline.history_aware_retriever = RunnableLambda(lambda inputs: None, afunc=slow_retrieve)
+
+    async def run():
+        response = await pipeline.ainvoke("receita de bolo de cenoura")
+        # Let the cancelled stage unwind (asyncio.run would cancel a leftover task on exit)
+        await asyncio.sleep(0)
+        return response, dict(retrieval)
+
+    response, state = asyncio.run(run())
+
+    assert response["rejected"] is True
+    assert response["result"] == pipeline.theme_guardrail.default_message["result"]
+    assert state == {"started": True, "cancelled": True}
+
+
+def test_follow_ups_skip_the_theme_check():
+    pipeline = build_pipeline(theme_response="false")
+    history = [("human", QUERY), ("ai", "Contagem regressiva: faltam 3 dias!")]
+
+    response = asyncio.run(pipeline.ainvoke("deixe mais curto", history))
+
+    assert response["rejected"] is False
+    assert pipeline.theme_guardrail.stats["llm_calls"] == 0
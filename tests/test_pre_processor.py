@@ -0,0 +1,132 @@
+import json
+
+import docx
+import pytest
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from app.pre_processor import MANIFEST_FILE, DataPreProcessor
+
+
+def add_hyperlink(paragraph, text, url):
+    rel_id = paragraph.part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), rel_id)
+    run = OxmlElement("w:r")
+    text_element = OxmlElement("w:t")
+    text_element.text = text
+    run.append(text_element)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+
+def write_docx(path, body="Mensagem de aquecimento."):
+    document = docx.Document()
+    document.add_heading("Lançamento", level=1)
+    paragraph = document.add_paragraph("Envie o ")
+    paragraph.add_run("email").bold = True
+    paragraph.add_run(" de ")
+    paragraph.add_run("abertura").italic = True
+    paragraph.add_run(" e veja o ")
+    add_hyperlink(paragraph, "calendário", "https://example.com/calendario")
+    document.add_heading("Etapas", level=2)
+    document.add_paragraph("Aquecimento", style="List Bullet")
+    document.add_paragraph("Abertura | carrinho", style="List Bullet")
+    document.add_paragraph("Primeiro passo", style="List Number")
+    table = document.add_table(rows=2, cols=2)
+    for cell, text in zip(table._cells, ["Canal", "Mensagem", "Email", "Faltam 3 dias!\nCorra"]):
+        cell.text = text
+    document.add_paragraph(body)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document.save(path)
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    return tmp_path / "raw", tmp_path / "processed"
+
+
+def test_docx_to_markdown(dirs):
+    raw, processed = dirs
+    write_docx(raw / "plano.docx")
+
+    markdown = DataPreProcessor(raw, processed).docx_to_markdown(raw / "plano.docx")
+
+    assert markdown == (
+        "# Lançamento\n\n"
+        "Envie o **email** de *abertura* e veja o [calendário](https://example.com/calendario)\n\n"
+        "## Etapas\n\n"
+        "- Aquecimento\n"
+        "- Abertura | carrinho\n"
+        "1. Primeiro passo\n"
+        "\n"
+        "| Canal | Mensagem |\n"
+        "|---|---|\n"
+        "| Email | Faltam 3 dias!<br>Corra |\n\n"
+        "Mensagem de aquecimento.\n\n"
+    )
+
+
+def test_titles_and_output_layout(dirs):
+    raw, processed = dirs
+    write_docx(raw / "1- Lançamentos" / "2. Plano_do-lancamento.docx")
+
+    files = DataPreProcessor(raw, processed).process_directory()
+
+    assert [(file["title"], file["category"]) for file in files] == [("Plano Do Lancamento", "Lançamentos")]
+    output = (processed / "Lançamentos" / "Plano Do Lancamento.md").read_text(encoding="utf-8")
+    assert output.startswith("---\ntitle: Plano Do Lancamento\ncategory: Lançamentos\n")
+    assert "[Plano Do Lancamento](Lançamentos/Plano Do Lancamento.md)" in (processed / "index.md").read_text(encoding="utf-8")
+
+
+def test_failed_conversion_keeps_the_previous_output(dirs, monkeypatch):
+    raw, processed = dirs
+    source = raw / "Lançamentos" / "plano.docx"
+    write_docx(source)
+    preprocessor = DataPreProcessor(raw, processed)
+    preprocessor.process_directory(incremental=True)
+    output = processed / "Lançamentos" / "Plano.md"
+    previous = output.read_text(encoding="utf-8")
+    previous_entry = json.loads((processed / MANIFEST_FILE).read_text(encoding="utf-8"))["Lançamentos/plano.docx"]
+
+    # Changed source whose conversion fails halfway through
+    write_docx(source, body="Mensagem nova.")
+
+    def failing_markdown(self, docx_path):
+        yield "# Lançamento\n\n"
+        raise ValueError("corrupted document")
+
+    iter_markdown = DataPreProcessor.iter_markdown
+    monkeypatch.setattr(DataPreProcessor, "iter_markdown", failing_markdown)
+    files = preprocessor.process_directory(incremental=True)
+
+    assert output.read_text(encoding="utf-8") == previous
+    assert not output.with_suffix(".md.tmp").exists()
+    assert [file["processed_path"] for file in files] == [str(output)]
+    # The previous (now stale) manifest entry makes the next run retry the file
+    manifest = json.loads((processed / MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert manifest["Lançamentos/plano.docx"] == previous_entry
+
+    monkeypatch.setattr(DataPreProcessor, "iter_markdown", iter_markdown)
+    preprocessor.process_directory(incremental=True)
+    assert "Mensagem nova." in output.read_text(encoding="utf-8")
+
+
+def test_incremental_runs_skip_unchanged_files_and_drop_deleted_ones(dirs, monkeypatch):
+    raw, processed = dirs
+    write_docx(raw / "Lançamentos" / "plano.docx")
+    write_docx(raw / "Perpétuo" / "oferta.docx")
+    preprocessor = DataPreProcessor(raw, processed)
+    preprocessor.process_directory(incremental=True)
+
+    (raw / "Perpétuo" / "oferta.docx").unlink()
+    converted = []
+    process_and_save = DataPreProcessor._process_and_save
+    monkeypatch.setattr(DataPreProcessor, "_process_and_save",
+                        lambda self, path: converted.append(path) or process_and_save(self, path))
+    files = preprocessor.process_directory(incremental=True)
+
+    assert converted == []
+    assert [file["title"] for file in files] == ["Plano"]
+    assert not (processed / "Perpétuo" / "Oferta.md").exists()
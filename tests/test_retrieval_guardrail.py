@@ -0,0 +1,90 @@
+import asyncio
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from app.agent.guard.retrieval_based_guardrail import RetrievalBasedGuardrail
+from app.agent.pipeline import RagPipeline
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings
+
+
+class ScoredStore(InMemoryVectorStore):
+    """Vector store returning fixed (document, score) pairs, counting searches"""
+
+    def __init__(self, scores):
+        super().__init__(FakeEmbeddings())
+        self.scored = [(Document(page_content=f"material {i}", id=str(i)), score) for i, score in enumerate(scores)]
+        self.searches = []
+
+    def similarity_search_with_score(self, query, k=4, filter=None):
+        self.searches.append({"query": query, "k": k, "filter": filter})
+        return self.scored[:k]
+
+    async def asimilarity_search_with_score(self, query, k=4, filter=None):
+        return self.similarity_search_with_score(query, k=k, filter=filter)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        # Plain retrieval (the pipeline retriever) would be a second search
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    async def asimilarity_search(self, query, k=4, **kwargs):
+        return self.similarity_search(query, k=k, **kwargs)
+
+
+def test_threshold_is_inclusive():
+    guardrail = RetrievalBasedGuardrail(similarity_threshold=0.5)
+    scored = ScoredStore([0.8, 0.5, 0.4999]).scored
+
+    verdict = guardrail.evaluate(scored)
+
+    assert verdict["relevant"] is True
+    assert [doc.id for doc in verdict["documents"]] == ["0", "1"]
+
+
+def test_rejects_below_the_threshold_unless_there_is_history():
+    guardrail = RetrievalBasedGuardrail(similarity_threshold=0.5)
+    scored = ScoredStore([0.4999, 0.2]).scored
+
+    assert guardrail.evaluate(scored) == {"relevant": False, "documents": [], "message": guardrail.no_docs_message}
+    # Follow-ups rely on the conversation and keep every retrieved document
+    verdict = guardrail.evaluate(scored, [("human", "mensagem de crm"), ("ai", "...")])
+    assert verdict["relevant"] is True
+    assert len(verdict["documents"]) == 2
+
+
+def test_min_relevant_docs():
+    guardrail = RetrievalBasedGuardrail(similarity_threshold=0.5, min_relevant_docs=2)
+
+    assert guardrail.evaluate(ScoredStore([0.9, 0.1]).scored)["relevant"] is False
+    assert guardrail.evaluate(ScoredStore([0.9, 0.6]).scored)["relevant"] is True
+
+
+def build_pipeline(store, threshold):
+    guardrail = RetrievalBasedGuardrail(similarity_threshold=threshold, k=3)
+    return RagPipeline(embedding=FakeEmbeddings(), vectorstore=store, llm=FakeChatModel(), guardrail=guardrail,
+                       context_max_tokens=None)
+
+
+def test_one_scored_search_serves_the_decision_and_the_context():
+    store = ScoredStore([0.9, 0.7, 0.3, 0.2])
+    pipeline = build_pipeline(store, threshold=0.5)
+
+    response = pipeline.invoke("mensagem de crm", category="Lançamentos")
+
+    assert len(store.searches) == 1
+    assert store.searches[0]["k"] == 3
+    assert store.searches[0]["filter"]
+    assert response["rejected"] is False
+    assert [doc.id for doc in response["source_documents"]] == ["0", "1"]
+
+
+def test_async_search_is_also_single_and_rejections_skip_the_llm():
+    store = ScoredStore([0.4, 0.3])
+    pipeline = build_pipeline(store, threshold=0.5)
+
+    response = asyncio.run(pipeline.ainvoke("receita de bolo"))
+
+    assert len(store.searches) == 1
+    assert response["rejected"] is True
+    assert response["result"] == pipeline.guardrail.no_docs_message
+    assert pipeline.llm.calls == 0
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agent.scheduler import ProviderLimiter, TokenBucket
+from benchmarks.fakes import RateLimitError
+
+
+def test_bucket_paces_calls_beyond_the_burst():
+    async def run():
+        bucket = TokenBucket(rate_per_minute=600)  # 10 per second, burst of 600
+        bucket.level = 0.0
+        start = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire(1)
+        return time.monotonic() - start
+
+    assert run_time(run) == pytest.approx(0.3, abs=0.1)
+
+
+def test_refund_wakes_a_waiting_call():
+    async def run():
+        bucket = TokenBucket(rate_per_minute=60)  # 1 per second
+        bucket.level = 0.0
+
+        async def refund():
+            await asyncio.sleep(0.05)
+            bucket.adjust(-5)
+
+        start = time.monotonic()
+        await asyncio.gather(bucket.acquire(3), refund())
+        return time.monotonic() - start
+
+    assert run_time(run) < 0.5
+
+
+def test_limiter_retries_rate_limit_errors():
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError("429")
+        return "ok"
+
+    limiter = ProviderLimiter("test", requests_per_minute=6000)
+    result = asyncio.run(limiter.call(call, tokens=10, base_delay=0.001))
+
+    assert result == "ok"
+    assert limiter.stats()["retries"] == 2
+    assert limiter.stats()["requests"] == 3
+
+
+def run_time(coroutine) -> float:
+    return asyncio.run(coroutine())
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from app.rag.snapshot import dequantize, quantize
+
+
+@pytest.mark.parametrize("quantization, tolerance", [("int8", 1 / 127), ("float16", 1e-3), ("float32", 0.0)])
+def test_quantize_round_trip(quantization, tolerance):
+    vectors = np.random.default_rng(0).standard_normal((20, 64)).astype(np.float32)
+
+    stored, scales = quantize(vectors, quantization)
+    restored = dequantize(stored, scales)
+
+    assert restored.dtype == np.float32
+    # Error relative to the largest component of each row
+    error = np.abs(restored - vectors).max(axis=1) / np.abs(vectors).max(axis=1)
+    assert error.max() <= tolerance
+
+
+def test_int8_keeps_cosine_similarity():
+    vectors = np.random.default_rng(1).standard_normal((50, 256)).astype(np.float32)
+    restored = dequantize(*quantize(vectors, "int8"))
+
+    cosine = (restored * vectors).sum(axis=1) / np.linalg.norm(restored, axis=1) / np.linalg.norm(vectors, axis=1)
+    assert cosine.min() > 0.999
+
+
+def test_zero_rows_and_unknown_quantization():
+    stored, scales = quantize(np.zeros((2, 4), dtype=np.float32), "int8")
+    assert not dequantize(stored, scales).any()
+
+    with pytest.raises(ValueError):
+        quantize(np.zeros((1, 4), dtype=np.float32), "int4")
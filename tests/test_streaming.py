@@ -0,0 +1,75 @@
+import pytest
+
+from app.agent import agent
+from app.agent.answer_cache import AnswerCache
+from app.agent.guard.theme_based_guardrail import ThemeBasedGuardrail
+from app.agent.pipeline import RagPipeline
+from benchmarks.fakes import FakeChatModel, FakeEmbeddings, FakeVectorStore, synthetic_texts
+
+QUERY = "Gere uma mensagem de CRM de contagem regressiva para o curso de Python"
+ANSWER = "Contagem regressiva: faltam 3 dias para o curso!"
+
+
+@pytest.fixture
+def answer_cache(monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(agent, "_answer_cache", cache)
+    return cache
+
+
+def build_pipeline(theme_response="true"):
+    embedding = FakeEmbeddings()
+    vectorstore = FakeVectorStore(embedding)
+    vectorstore.add_texts(synthetic_texts(20), metadatas=[{"file_path": f"doc_{i}.md"} for i in range(20)])
+    theme_guardrail = ThemeBasedGuardrail(
+        embedding=embedding, llm=FakeChatModel(response=theme_response), ambiguity_band=(-2.0, 2.0)
+    )
+    return RagPipeline(embedding=embedding, vectorstore=vectorstore, llm=FakeChatModel(response=ANSWER),
+                       theme_guardrail=theme_guardrail)
+
+
+def test_sources_come_before_the_streamed_tokens(answer_cache):
+    pipeline = build_pipeline()
+
+    events = list(agent.stream_llm(QUERY, pipeline=pipeline))
+
+    assert events[0]["rejected"] is False
+    assert events[0]["source_documents"]
+    tokens = [event["token"] for event in events[1:]]
+    # Streamed word by word, not as a single answer
+    assert len(tokens) > 1
+    assert "".join(tokens) == ANSWER
+
+
+def test_rejected_stream_sends_the_default_message_and_is_not_cached(answer_cache):
+    pipeline = build_pipeline(theme_response="false")
+
+    events = list(agent.stream_llm("receita de bolo de cenoura", pipeline=pipeline))
+
+    assert events == [
+        {"source_documents": [], "context_stats": None, "rejected": True},
+        {"token": pipeline.theme_guardrail.default_message["result"]},
+    ]
+    assert pipeline.llm.calls == 0
+    assert answer_cache.stats()["size"] == 0
+
+
+def test_only_fully_streamed_answers_are_cached(answer_cache):
+    pipeline = build_pipeline()
+
+    # Interrupted after the first token (e.g. the user left the page)
+    stream = agent.stream_llm(QUERY, pipeline=pipeline)
+    next(stream)
+    next(stream)
+    stream.close()
+    assert answer_cache.stats()["size"] == 0
+
+    list(agent.stream_llm(QUERY, pipeline=pipeline))
+    assert answer_cache.stats()["size"] == 1
+
+    # Replayed from the cache as a single chunk, without calling the LLM again
+    calls = pipeline.llm.calls
+    events = list(agent.stream_llm(QUERY, pipeline=pipeline))
+    assert events[0]["rejected"] is False
+    assert events[1:] == [{"token": ANSWER}]
+    assert pipeline.llm.calls == calls
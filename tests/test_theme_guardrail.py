@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.agent.guard.theme_based_guardrail import OFF_TOPIC, ThemeBasedGuardrail
+from benchmarks.fakes import FakeChatModel
+
+# Marketing themes embed on the first axis, off-topic examples on the second
+ON_TOPIC = [1.0, 0.0, 0.0]
+OFF = [0.0, 1.0, 0.0]
+QUERIES = {
+    "mensagem de crm": ON_TOPIC,            # score 1 - 0 = 1
+    "receita de bolo": OFF,                 # score 0 - 1 = -1
+    "mensagem sobre bolo": [1.0, 1.0, 0.0],  # score 0.707 - 0.707 = 0
+    "assunto novo": [0.0, 0.0, 1.0],        # score 0 - 0 = 0
+}
+
+
+class KeyedEmbeddings:
+    """Fixed vectors per text (themes default to the on-topic axis), counting calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _embed(self, text):
+        if text.startswith("exemplo fora"):
+            return OFF
+        return QUERIES.get(text, ON_TOPIC)
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def build_guardrail(llm_response="true", band=(-0.5, 0.5)):
+    return ThemeBasedGuardrail(
+        embedding=KeyedEmbeddings(),
+        llm=FakeChatModel(response=llm_response),
+        examples={OFF_TOPIC: ["exemplo fora do tema 1", "exemplo fora do tema 2"]},
+        ambiguity_band=band,
+    )
+
+
+def test_score_is_best_theme_minus_best_off_topic():
+    guardrail = build_guardrail()
+
+    assert guardrail.score("mensagem de crm") == pytest.approx(1.0)
+    assert guardrail.score("receita de bolo") == pytest.approx(-1.0)
+    assert guardrail.score("mensagem sobre bolo") == pytest.approx(0.0, abs=1e-6)
+
+
+def test_band_decides_locally_outside_and_asks_the_llm_inside():
+    guardrail = build_guardrail(llm_response="false")
+
+    assert guardrail.validate_query("mensagem de crm") is True
+    assert guardrail.validate_query("receita de bolo") is False
+    assert guardrail.stats["llm_calls"] == 0
+
+    # Inside the band the LLM answer ("false") decides
+    assert guardrail.validate_query("mensagem sobre bolo") is False
+    assert guardrail.stats["llm_calls"] == 1
+    assert guardrail.llm.calls == 1
+
+
+def test_upper_bound_accepts_and_lower_bound_asks():
+    # Scores of 0 sit on the bounds: [lower, upper) is ambiguous
+    assert build_guardrail(llm_response="false", band=(-0.5, 0.0)).validate_query("assunto novo") is True
+    guardrail = build_guardrail(llm_response="false", band=(0.0, 0.5))
+    assert guardrail.validate_query("assunto novo") is False
+    assert guardrail.stats["llm_calls"] == 1
+
+
+def test_decisions_are_memoized_per_normalized_query():
+    guardrail = build_guardrail(llm_response="true")
+
+    assert guardrail.validate_query("mensagem sobre bolo") is True
+    embedding_calls = guardrail.embedding.calls
+    assert guardrail.validate_query("  Mensagem sobre BOLO ") is True
+    assert asyncio.run(guardrail.avalidate_query("mensagem sobre bolo")) is True
+
+    assert guardrail.embedding.calls == embedding_calls
+    assert guardrail.llm.calls == 1
+    assert guardrail.stats == {"cached": 2, "accepted": 1, "rejected": 0, "llm_calls": 1}
+
+
+def test_memoized_decisions_are_bounded():
+    guardrail = build_guardrail()
+    guardrail.cache_size = 1
+
+    guardrail.validate_query("mensagem de crm")
+    guardrail.validate_query("receita de bolo")
+    guardrail.validate_query("mensagem de crm")
+
+    assert guardrail.stats["cached"] == 0
+
+
+def test_band_is_required(monkeypatch):
+    monkeypatch.delenv("THEME_GUARDRAIL_BAND", raising=False)
+    with pytest.raises(ValueError, match="THEME_GUARDRAIL_BAND"):
+        ThemeBasedGuardrail(embedding=KeyedEmbeddings(), llm=FakeChatModel())
+
+    monkeypatch.setenv("THEME_GUARDRAIL_BAND", "-0.1,0.2")
+    guardrail = ThemeBasedGuardrail(embedding=KeyedEmbeddings(), llm=FakeChatModel())
+    assert (guardrail.lower, guardrail.upper) == (-0.1, 0.2)